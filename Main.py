@@ -1,22 +1,68 @@
+import time
+INICIO = time.perf_counter()  # Referência para medir o tempo de inicialização
+
+import multiprocessing
+# No executável, os processos da busca paralela (varredura.py) param aqui, antes da interface
+multiprocessing.freeze_support()
+
 import pandas as pd
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 import os
-import textwrap
 import sys
-from datetime import datetime
+import queue
+import shutil
+import threading
 from pathlib import Path
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 
+import consulta
+import medicoes
+import motor
+import vigia
+from motor import formatar_inventario
+
 # --- CONFIGURAÇÃO INICIAL ---
 CSV_ORIGINAL = 'Dados.csv'  # Nome do arquivo CSV original (embutido no executável)
 BACKUP_DIR = 'backups'  # Diretório para backups
 
-ULTIMA_MODIFICACAO = None
 ultimos_resultados = pd.DataFrame()
+rotulos_filtro = {}  # Por coluna: texto exibido no combobox ("Carro (12)") -> valor real
+# Faixa de ultimos_resultados inserida na tabela: [inicio_exibido, fim_exibido)
+inicio_exibido = fim_exibido = 0
+pagina_agendada = False  # Já há uma página para carregar na próxima volta do laço do Tk
+recarga_em_andamento = False
+compactacao_em_andamento = False
+compactacao_agendada = None  # id do janela.after da próxima compactação do diário
+importacao_em_andamento = False  # Edições ficam bloqueadas enquanto uma planilha é importada
+mudanca_detectada = threading.Event()  # Marcado pelo vigia quando o arquivo de dados muda em disco
+
+busca_agendada = None  # id do janela.after da próxima busca incremental
+busca_em_andamento = None  # threading.Event que cancela a busca em andamento
+ultimo_termo = ''  # Último termo buscado pela digitação
+
+INTERVALO_COMPACTACAO = 10000  # ms sem novas edições antes de gravar o diário no CSV
+INTERVALO_MUDANCAS = 200  # ms entre as consultas ao aviso do vigia (só olha um Event, não o disco)
+ATRASO_BUSCA = 250  # ms sem digitar antes de buscar
+MIN_CARACTERES_BUSCA = 2  # Termos mais curtos só são buscados com Enter ou pelo botão
+
+# Com CONSULTADOR_MEDIR_INICIALIZACAO=1 o programa informa os tempos de
+# inicialização e fecha sozinho após a primeira carga (ver medir_inicializacao.py)
+MEDIR_INICIALIZACAO = os.environ.get('CONSULTADOR_MEDIR_INICIALIZACAO') == '1'
+
+TAMANHO_PAGINA = 200  # Linhas materializadas na tabela a cada rolagem
+# Máximo de linhas na tabela: as páginas longe da vista saem e voltam quando a rolagem chega nelas
+MAX_LINHAS_TABELA = 5 * TAMANHO_PAGINA
+COLUNAS_RESULTADO = [
+    # (coluna no CSV, título na tabela, largura)
+    (None, "Índice", 60),
+    ('Número de inventário', "Patrimônio", 100),
+    ('Nome', "Nome", 220),
+    ('Tipo', "Tipo", 140),
+    ('Grupo encarregado', "Grupo", 140),
+    ('Localização', "Localização", 160),
+]
 
 def caminho_dados():
     base_path = Path(sys.executable).parent if getattr(sys, 'frozen', False) else Path(__file__).parent
@@ -28,212 +74,678 @@ def caminho_recurso(relativo):
         return os.path.join(sys._MEIPASS, relativo)
     return os.path.join(os.path.abspath("."), relativo)
 
-def criar_backup():
-    """Cria um backup do arquivo CSV antes de edições"""
-    backup_dir = Path(caminho_dados()).parent / BACKUP_DIR
-    if not backup_dir.exists():
-        backup_dir.mkdir(parents=True, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = backup_dir / f"backup_{timestamp}.csv"
-    
-    try:
-        df.to_csv(backup_path, sep=';', index=False, encoding='ISO-8859-1')
-        print(f"Backup criado: {backup_path}")
-    except Exception as e:
-        print(f"Erro ao criar backup: {e}")
-
 # Carregar o arquivo CSV
 caminho_csv = caminho_dados()
 caminho_csv_original = caminho_recurso(CSV_ORIGINAL)
 
+# Os dados em si são lidos uma única vez, pela primeira recarga na inicialização
+base = motor.BaseDados(caminho_csv, Path(caminho_csv).parent / BACKUP_DIR)
+
 try:
-    if caminho_csv.exists():
-        # Carrega o CSV editável se existir
-        df = pd.read_csv(caminho_csv, encoding='ISO-8859-1', sep=';', on_bad_lines='skip')
-    else:
-        # Se não existir, carrega o CSV original e cria uma cópia editável
-        df = pd.read_csv(caminho_csv_original, encoding='ISO-8859-1', sep=';', on_bad_lines='skip')
-        df.to_csv(caminho_csv, sep=';', index=False, encoding='ISO-8859-1')
+    if not base.armazenamento.caminho.exists():
+        # Se não existir (nem o CSV nem o banco SQLite), cria uma cópia editável do CSV original
+        shutil.copyfile(caminho_csv_original, caminho_csv)
 except Exception as e:
     messagebox.showerror("Erro", f"Não foi possível carregar o arquivo CSV:\n{e}")
-    df = pd.DataFrame()
 
 # --- CARREGAR DADOS ---
-def carregar_dados():
-    global df, ULTIMA_MODIFICACAO
+def aplicar_snapshot(snapshot):
+    """Troca os dados em uso pelos do snapshot (sempre na thread da interface)"""
+    base.aplicar(snapshot)
+    print("📁 Planilha atualizada.")
+
+def executar_em_segundo_plano(tarefa, ao_concluir):
+    """Executa tarefa() em uma thread e chama ao_concluir(resultado, erro) na thread da interface"""
+    fila = queue.Queue(maxsize=1)
+
+    def executar():
+        try:
+            fila.put((tarefa(), None))
+        except Exception as e:
+            fila.put((None, e))
+
+    def verificar():
+        try:
+            resultado, erro = fila.get_nowait()
+        except queue.Empty:
+            janela.after(100, verificar)
+            return
+        ao_concluir(resultado, erro)
+
+    threading.Thread(target=executar, daemon=True).start()
+    janela.after(100, verificar)
+
+def executar_com_progresso(titulo, tarefa, ao_concluir):
+    """Executa tarefa(progresso, cancelado) em uma thread, com barra de progresso e botão Cancelar.
+
+    A tarefa informa o andamento chamando progresso(feitos, total) e deve
+    consultar cancelado() para parar cedo. ao_concluir(resultado, erro) é
+    chamado na thread da interface depois que a janela de progresso fecha.
+    """
+    cancelar = threading.Event()
+    andamento = {'feitos': 0, 'total': 0}
+
+    def progresso(feitos, total):
+        andamento['feitos'], andamento['total'] = feitos, total
+
+    dialogo = tb.Toplevel(janela)
+    dialogo.title(titulo)
+    dialogo.geometry("380x140")
+    dialogo.transient(janela)
+    dialogo.protocol("WM_DELETE_WINDOW", cancelar.set)
+
+    frame = tb.Frame(dialogo)
+    frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
+    rotulo = tb.Label(frame, text=f"{titulo}...", bootstyle="primary")
+    rotulo.pack(anchor=tk.W)
+    barra = tb.Progressbar(frame, maximum=1, value=0, bootstyle="info-striped")
+    barra.pack(fill=tk.X, pady=10)
+    botao = tb.Button(frame, text="Cancelar", bootstyle="danger")
+    botao.config(command=lambda: (cancelar.set(), botao.config(state=tk.DISABLED, text="Cancelando...")))
+    botao.pack()
+
+    def atualizar():
+        if not dialogo.winfo_exists():
+            return
+        feitos, total = andamento['feitos'], andamento['total']
+        if total:
+            barra.config(maximum=total, value=feitos)
+            rotulo.config(text=f"{titulo}... {feitos} de {total} itens")
+        dialogo.after(100, atualizar)
+
+    def concluir(resultado, erro):
+        dialogo.destroy()
+        ao_concluir(resultado, erro)
+
+    atualizar()
+    executar_em_segundo_plano(lambda: tarefa(progresso, cancelar.is_set), concluir)
+
+def recarregar_em_segundo_plano():
+    """Dispara a leitura do CSV em uma thread, se o arquivo mudou.
+
+    Enquanto a thread trabalha, buscas e filtros continuam usando o snapshot
+    anterior; a troca acontece em concluir_recarga, via janela.after. Depois
+    da primeira carga, a thread só traz as linhas que mudaram.
+    """
+    global recarga_em_andamento
+    if recarga_em_andamento or (base.carregado and not base.mudou()):
+        return
+
+    recarga_em_andamento = True
+    executar_em_segundo_plano(base.montar_atualizacao, concluir_recarga)
+
+def concluir_recarga(snapshot, erro):
+    """Aplica o snapshot (ou só as linhas alteradas) produzido pela thread de recarga"""
+    global recarga_em_andamento
+    recarga_em_andamento = False
+    primeira_carga = not base.carregado
+    if erro is not None:
+        print(f"Erro ao carregar CSV: {erro}")
+        if primeira_carga:
+            status_dados.config(text="❌ Falha ao carregar a planilha")
+            messagebox.showerror("Erro", f"Não foi possível carregar o arquivo CSV:\n{erro}")
+        return
+
+    try:
+        # Descarta o snapshot se o arquivo mudou de novo ou já foi recarregado
+        # de forma síncrona (ex.: após uma edição) enquanto a thread lia
+        if snapshot.modificacao == base.modificacao or base.armazenamento.versao() != snapshot.modificacao:
+            return
+    except OSError:
+        return
+
+    if isinstance(snapshot, motor.Atualizacao):
+        if not base.aplicar_atualizacao(snapshot):
+            mudanca_detectada.set()  # Houve edição durante a comparação: comparar de novo
+            return
+        print(f"📁 Planilha atualizada: {len(snapshot.linhas)} itens alterados.")
+        atualizar_resultados_exibidos(snapshot.linhas.index)
+    else:
+        aplicar_snapshot(snapshot)
+    atualizar_combos()
+    status_dados.config(text=f"📁 {len(base.dados)} itens carregados ({base.armazenamento.nome})")
+
+    if primeira_carga:
+        informar_inicializacao("dados")
+        if base.pendencias():
+            # Edições de uma sessão interrompida já foram reaplicadas; gravá-las no CSV
+            agendar_compactacao()
+        if MEDIR_INICIALIZACAO:
+            janela.destroy()
+
+def atualizar_resultados_exibidos(rotulos):
+    """Troca na tabela os valores dos itens exibidos que mudaram no arquivo, sem refazer a busca"""
+    global ultimos_resultados
+    if ultimos_resultados.empty or ultimos_resultados.index.intersection(rotulos).empty:
+        return
+    ultimos_resultados = base.dados.loc[ultimos_resultados.index]
+    posicoes = ultimos_resultados.index.get_indexer(rotulos)
+    posicoes = posicoes[(posicoes >= inicio_exibido) & (posicoes < fim_exibido)]  # Só as linhas na tabela
+    pagina = ultimos_resultados.iloc[posicoes]
+    colunas = [motor.valores_para_exibicao(pagina, coluna) for coluna, _, _ in COLUNAS_RESULTADO[1:]]
+    for pos, valores in zip(posicoes, zip(*colunas)):
+        tabela_resultados.item(str(pos), values=(pos + 1, *valores))
+
+def verificar_mudancas():
+    """Recarrega assim que o vigia avisar que o arquivo de dados mudou"""
+    if mudanca_detectada.is_set() and not recarga_em_andamento:
+        mudanca_detectada.clear()
+        try:
+            recarregar_em_segundo_plano()
+        except OSError as e:
+            # Arquivo sendo substituído por outro programa: tenta de novo na próxima volta
+            print(f"Erro ao verificar a planilha: {e}")
+            mudanca_detectada.set()
+    janela.after(INTERVALO_MUDANCAS, verificar_mudancas)
+
+def informar_inicializacao(etapa):
+    """Mostra quanto tempo se passou desde o início do programa até a etapa"""
+    print(f"⏱ Inicialização ({etapa}): {time.perf_counter() - INICIO:.3f} s")
+
+def dados_prontos():
+    """Avisa o usuário e retorna False enquanto a primeira carga não terminou"""
+    if not base.carregado:
+        messagebox.showinfo("Aguarde", "A planilha ainda está sendo carregada.")
+        return False
+    return True
+
+# --- DIÁRIO DE EDIÇÕES ---
+def registrar_edicao(rotulo, inventario, campos):
+    """Aplica a edição na hora (via diário) e agenda a gravação no CSV"""
+    if importacao_em_andamento:
+        raise RuntimeError("Aguarde o fim da importação da planilha.")
+    if compactacao_em_andamento:
+        # A compactação segura a trava do diário enquanto regrava o CSV
+        raise RuntimeError("Aguarde: as edições anteriores estão sendo gravadas na planilha.")
+    base.editar(rotulo, inventario, campos)
+    agendar_compactacao()
+
+def agendar_compactacao():
+    """(Re)agenda a gravação do diário no CSV para depois de um intervalo sem edições"""
+    global compactacao_agendada
+    if compactacao_agendada is not None:
+        janela.after_cancel(compactacao_agendada)
+    compactacao_agendada = janela.after(INTERVALO_COMPACTACAO, compactar_diario)
+
+def compactar_diario():
+    """Grava em segundo plano as edições do diário no CSV e limpa o diário"""
+    global compactacao_agendada, compactacao_em_andamento
+    compactacao_agendada = None
+    if compactacao_em_andamento or importacao_em_andamento or not base.carregado:
+        # Ainda gravando, ou os dados (com o diário reaplicado) ainda não foram carregados
+        agendar_compactacao()
+        return
+
+    # A thread regrava o CSV a partir do disco e confere o resultado com esta cópia;
+    # novas edições seguem para o diário
+    copia = base.preparar_compactacao()
+    if copia is None:
+        return
+
+    compactacao_em_andamento = True
+    executar_em_segundo_plano(lambda: base.gravar_compactacao(copia), concluir_compactacao)
+
+def concluir_compactacao(versao, erro):
+    global compactacao_em_andamento
+    compactacao_em_andamento = False
+    if erro is not None:
+        # As edições continuam no diário; tenta de novo mais tarde
+        print(f"Erro ao gravar edições no CSV: {erro}")
+        agendar_compactacao()
+        return
+
+    base.concluir_compactacao(versao)
+    print("💾 Edições gravadas na planilha.")
+
+def ao_fechar():
+    """Grava as edições pendentes do diário antes de fechar o programa"""
     try:
-        mod = os.path.getmtime(caminho_csv) 
-        if ULTIMA_MODIFICACAO is None or mod != ULTIMA_MODIFICACAO:
-            df = pd.read_csv(caminho_csv, encoding='ISO-8859-1', sep=';', on_bad_lines='skip')
-            ULTIMA_MODIFICACAO = mod
-            print("📁 Planilha atualizada.")
+        if compactacao_agendada is not None:
+            janela.after_cancel(compactacao_agendada)
+        base.compactar()
     except Exception as e:
-        print(f"Erro ao carregar CSV: {e}")
+        # O diário é mantido e será reaplicado na próxima abertura
+        print(f"Erro ao gravar edições no CSV: {e}")
+    janela.destroy()
 
 # --- FUNÇÕES DE INTERFACE ---
 def buscar_texto():
-    termo = entrada.get().strip().lower()
+    global busca_agendada
+    if busca_agendada is not None:
+        janela.after_cancel(busca_agendada)
+        busca_agendada = None
+    if not dados_prontos():
+        return
+    termo = entrada.get().strip()
     if not termo:
         messagebox.showinfo("Atenção", "Digite algo para buscar.")
         return
-    
-    try:
-        resultado = df[df.apply(lambda row: termo in str(row.values).lower(), axis=1)]
-        exibir_resultados(resultado)
-    except Exception as e:
-        messagebox.showerror("Erro", f"Ocorreu um erro na busca:\n{e}")
+    iniciar_busca(termo)
+
+def agendar_busca(event=None):
+    """Busca enquanto o usuário digita, depois de uma pausa de ATRASO_BUSCA ms"""
+    global busca_agendada
+    if entrada.get().strip() == ultimo_termo:
+        return  # Teclas que não mudam o texto (setas, Shift...)
+    if busca_agendada is not None:
+        janela.after_cancel(busca_agendada)
+    busca_agendada = janela.after(ATRASO_BUSCA, busca_incremental)
+
+def busca_incremental():
+    global busca_agendada
+    busca_agendada = None
+    termo = entrada.get().strip()
+    if base.carregado and len(termo) >= MIN_CARACTERES_BUSCA:
+        iniciar_busca(termo, avisar=False)
+
+def iniciar_busca(termo, avisar=True):
+    """Busca o termo em uma thread, cancelando a busca anterior se ainda estiver rodando.
+
+    Termos já buscados vêm do cache na hora; um termo que contém um anterior
+    só examina as linhas que o anterior encontrou. Com a busca aproximada
+    ligada, mostra os itens mais parecidos, do mais para o menos parecido.
+    """
+    global busca_em_andamento, ultimo_termo
+    if busca_em_andamento is not None:
+        busca_em_andamento.set()
+        busca_em_andamento = None
+    ultimo_termo = termo
+
+    if busca_aproximada.get():
+        # Itens mais parecidos, já ordenados pela nota; não passam pelo cache de termos
+        normalizado, posicoes = None, None
+        tarefa = lambda cancelado: base.posicoes_aproximadas(termo, cancelado=cancelado)[0]
+    else:
+        try:
+            normalizado, posicoes, candidatas = base.planejar_busca(termo)
+        except consulta.ErroConsulta as e:
+            # Enquanto o usuário digita a consulta costuma estar pela metade: só indicar
+            if avisar:
+                messagebox.showwarning("Consulta inválida", str(e))
+            contador_resultados.config(text=f"⚠️ {e}")
+            return
+        except Exception as e:
+            messagebox.showerror("Erro", f"Ocorreu um erro na busca:\n{e}")
+            return
+        tarefa = lambda cancelado: base.posicoes_busca(normalizado, candidatas, cancelado)
+    if posicoes is not None:
+        exibir_resultados(base.dados.iloc[posicoes])
+        return
+
+    cancelar = threading.Event()
+    busca_em_andamento = cancelar
+    geracao = base.geracao
+
+    def concluir(posicoes, erro):
+        global busca_em_andamento
+        if cancelar.is_set():
+            return  # Substituída por uma busca mais nova
+        busca_em_andamento = None
+        if erro is not None:
+            messagebox.showerror("Erro", f"Ocorreu um erro na busca:\n{erro}")
+        elif geracao != base.geracao:
+            iniciar_busca(termo)  # Os dados mudaram durante a busca
+        else:
+            if normalizado is not None:
+                base.guardar_busca(normalizado, posicoes, geracao)
+            exibir_resultados(base.dados.iloc[posicoes])
+
+    contador_resultados.config(text="⏳ Buscando...")
+    executar_em_segundo_plano(lambda: tarefa(cancelar.is_set), concluir)
+
+def refazer_busca():
+    """Repete a busca do texto digitado (ex.: ao ligar ou desligar a busca aproximada)"""
+    termo = entrada.get().strip()
+    if base.carregado and termo:
+        iniciar_busca(termo, avisar=False)
 
 def aplicar_filtros():
-    tipo = tipo_combo.get()
-    grupo = grupo_combo.get()
-    local = local_combo.get()
+    if not dados_prontos():
+        return
+    selecao = selecao_filtros()
 
     try:
-        filtro = df.copy()
-        if tipo:
-            filtro = filtro[filtro['Tipo'] == tipo]
-        if grupo:
-            filtro = filtro[filtro['Grupo encarregado'] == grupo]
-        if local:
-            filtro = filtro[filtro['Localização'] == local]
-
-        exibir_resultados(filtro)
+        exibir_resultados(base.filtrar(
+            selecao['Tipo'], selecao['Grupo encarregado'], selecao['Localização']
+        ))
     except Exception as e:
         messagebox.showerror("Erro", f"Ocorreu um erro ao filtrar:\n{e}")
 
 def limpar_tudo():
+    global busca_agendada, busca_em_andamento, ultimo_termo
+    if busca_agendada is not None:
+        janela.after_cancel(busca_agendada)
+        busca_agendada = None
+    if busca_em_andamento is not None:
+        busca_em_andamento.set()
+        busca_em_andamento = None
+    ultimo_termo = ''
     entrada.delete(0, tk.END)
     tipo_combo.set('')
     grupo_combo.set('')
     local_combo.set('')
-    resultado_texto.delete('1.0', tk.END)
-
-def formatar_inventario(valor):
-    """Formata o número de inventário corretamente, removendo .0 se existir"""
-    try:
-        if pd.isna(valor):
-            return 'Não encontrado'
-        if isinstance(valor, (int, float)):
-            # Remove .0 de números inteiros
-            return str(int(valor)) if valor == int(valor) else str(valor)
-        # Se for string, tenta converter para número primeiro
-        try:
-            num = float(valor)
-            return str(int(num)) if num == int(num) else str(num)
-        except ValueError:
-            return str(valor)
-    except:
-        return 'Inválido'
+    atualizar_combos()
+    exibir_resultados(pd.DataFrame())
+    contador_resultados.config(text="")
 
 def exibir_resultados(resultados):
-    global ultimos_resultados
+    """Mostra os resultados na tabela, materializando apenas a primeira página"""
+    global ultimos_resultados, inicio_exibido, fim_exibido
     ultimos_resultados = resultados
+    inicio_exibido = fim_exibido = 0
+
+    tabela_resultados.delete(*tabela_resultados.get_children())
 
-    resultado_texto.config(state=tk.NORMAL)
-    resultado_texto.delete('1.0', tk.END)
-    
     if resultados.empty:
-        resultado_texto.insert(tk.END, "❌ Nenhum item encontrado.\n")
-    else:
-        for idx, (_, row) in enumerate(resultados.iterrows(), 1):
-            inventario = formatar_inventario(row.get('Número de inventário', ''))
-            nome = row.get('Nome', 'Não encontrado') if pd.notna(row.get('Nome')) else 'Não encontrado'
-            tipo = row.get('Tipo', 'Não encontrado') if pd.notna(row.get('Tipo')) else 'Não encontrado'
-            grupo = row.get('Grupo encarregado', 'Não encontrado') if pd.notna(row.get('Grupo encarregado')) else 'Não encontrado'
-            local = row.get('Localização', 'Não encontrado') if pd.notna(row.get('Localização')) else 'Não encontrado'
-
-            resultado_texto.insert(tk.END,
-                f"🔢 Índice: {idx}\n"
-                f"🆔 Patrimônio: {inventario}\n"
-                f"📄 Nome: {nome}\n"
-                f"🛠 Tipo: {tipo}\n"
-                f"👥 Grupo: {grupo}\n"
-                f"📍 Localização: {local}\n"
-                f"{'-' * 50}\n"
-            )
-    
-    resultado_texto.config(state=tk.DISABLED)
+        contador_resultados.config(text="❌ Nenhum item encontrado.")
+        return
 
-def exportar_excel():
-    if ultimos_resultados.empty:
+    carregar_proxima_pagina()
+    tabela_resultados.yview_moveto(0)
+
+def inserir_linhas(inicio, fim, no_topo=False):
+    """Insere na tabela as linhas inicio:fim de ultimos_resultados, no fim ou no topo.
+
+    O iid de cada linha é sua posição em ultimos_resultados, o que permite
+    recuperar o item selecionado sem depender do texto exibido.
+    """
+    with medicoes.medir('renderizacao', linhas=fim - inicio):
+        pagina = ultimos_resultados.iloc[inicio:fim]
+        colunas = [motor.valores_para_exibicao(pagina, coluna) for coluna, _, _ in COLUNAS_RESULTADO[1:]]
+
+        for i, (pos, valores) in enumerate(zip(range(inicio, fim), zip(*colunas))):
+            tabela_resultados.insert('', i if no_topo else tk.END, iid=str(pos), values=(pos + 1, *valores))
+
+def linha_no_topo():
+    """Posição, em ultimos_resultados, da primeira linha visível da tabela"""
+    return inicio_exibido + int(tabela_resultados.yview()[0] * (fim_exibido - inicio_exibido) + 0.5)
+
+def manter_no_topo(posicao):
+    """Rola a tabela para `posicao` continuar no topo depois que linhas entraram ou saíram acima dela"""
+    tabela_resultados.yview_moveto((posicao - inicio_exibido) / max(fim_exibido - inicio_exibido, 1))
+
+def carregar_proxima_pagina():
+    """Insere a página seguinte no fim da tabela e tira do topo o que passar de MAX_LINHAS_TABELA"""
+    global inicio_exibido, fim_exibido
+    fim = min(fim_exibido + TAMANHO_PAGINA, len(ultimos_resultados))
+    if fim <= fim_exibido:
+        return
+
+    topo = linha_no_topo()
+    inserir_linhas(fim_exibido, fim)
+    fim_exibido = fim
+    if fim_exibido - inicio_exibido > MAX_LINHAS_TABELA:
+        inicio = fim_exibido - MAX_LINHAS_TABELA
+        tabela_resultados.delete(*map(str, range(inicio_exibido, inicio)))
+        inicio_exibido = inicio
+        manter_no_topo(topo)
+    atualizar_contador_resultados()
+
+def carregar_pagina_anterior():
+    """Devolve ao topo da tabela a página anterior e tira do fim o que passar de MAX_LINHAS_TABELA"""
+    global inicio_exibido, fim_exibido
+    inicio = max(inicio_exibido - TAMANHO_PAGINA, 0)
+    if inicio >= inicio_exibido:
+        return
+
+    topo = linha_no_topo()
+    inserir_linhas(inicio, inicio_exibido, no_topo=True)
+    inicio_exibido = inicio
+    if fim_exibido - inicio_exibido > MAX_LINHAS_TABELA:
+        fim = inicio_exibido + MAX_LINHAS_TABELA
+        tabela_resultados.delete(*map(str, range(fim, fim_exibido)))
+        fim_exibido = fim
+    manter_no_topo(topo)
+    atualizar_contador_resultados()
+
+def atualizar_contador_resultados():
+    contador_resultados.config(
+        text=f"🔎 {len(ultimos_resultados)} itens encontrados (exibindo {inicio_exibido + 1} a {fim_exibido})"
+    )
+
+def ao_rolar_resultados(primeiro, ultimo):
+    """Atualiza a barra de rolagem e carrega mais linhas ao se aproximar do fim (ou do topo)"""
+    scroll_resultados.set(primeiro, ultimo)
+    if float(ultimo) > 0.9 and fim_exibido < len(ultimos_resultados):
+        agendar_pagina(carregar_proxima_pagina)
+    elif float(primeiro) < 0.1 and inicio_exibido > 0:
+        agendar_pagina(carregar_pagina_anterior)
+
+def agendar_pagina(carregar):
+    """Carrega a página na próxima volta do laço do Tk, uma de cada vez"""
+    global pagina_agendada
+    if pagina_agendada:
+        return
+    pagina_agendada = True
+
+    def executar():
+        global pagina_agendada
+        pagina_agendada = False
+        carregar()
+
+    janela.after_idle(executar)
+
+def exportar(formato, tipos_arquivo, gravar, resultados=None):
+    """Pergunta onde salvar e grava os resultados (padrão: ultimos_resultados) em segundo plano, com progresso.
+
+    gravar(resultados, caminho, progresso, cancelado) é uma das funções de
+    exportação do motor.
+    """
+    if resultados is None:
+        resultados = ultimos_resultados
+    if resultados.empty:
         messagebox.showwarning("Nada para exportar", "Realize uma busca primeiro.")
         return
     
     try:
         path = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel", "*.xlsx"), ("Todos os arquivos", "*.*")],
-            title="Salvar como Excel"
+            defaultextension=tipos_arquivo[0][1][1:],
+            filetypes=tipos_arquivo + [("Todos os arquivos", "*.*")],
+            title=f"Salvar como {formato}"
+        )
+        if not path:
+            return
+
+        def concluir(_, erro):
+            if isinstance(erro, motor.OperacaoCancelada):
+                messagebox.showinfo("Cancelado", f"Exportação para {formato} cancelada.")
+            elif erro is not None:
+                messagebox.showerror("Erro", f"Falha ao exportar para {formato}:\n{erro}")
+            else:
+                messagebox.showinfo("Sucesso", f"Exportado para {formato}:\n{os.path.basename(path)}")
+
+        executar_com_progresso(
+            f"Exportando para {formato}",
+            lambda progresso, cancelado: gravar(resultados, path, progresso, cancelado),
+            concluir
         )
-        if path:
-            ultimos_resultados.to_excel(path, index=False)
-            messagebox.showinfo("Sucesso", f"Exportado para Excel:\n{os.path.basename(path)}")
     except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao exportar para Excel:\n{e}")
+        messagebox.showerror("Erro", f"Falha ao exportar para {formato}:\n{e}")
+
+def exportar_excel():
+    exportar("Excel", [("Excel", "*.xlsx")], motor.gravar_excel)
 
 def exportar_pdf():
-    if ultimos_resultados.empty:
-        messagebox.showwarning("Nada para exportar", "Realize uma busca primeiro.")
+    exportar("PDF", [("PDF files", "*.pdf")], motor.gravar_pdf)
+
+def exportar_dados():
+    """Exporta em CSV ou JSON Lines, conforme a extensão escolhida"""
+    exportar(
+        "CSV/JSON",
+        [("CSV", "*.csv"), ("JSON Lines", "*.jsonl")],
+        lambda resultados, path, progresso, cancelado: motor.gravar_texto(resultados, path, None, progresso, cancelado)
+    )
+
+def importar_planilha():
+    """Mescla na base uma planilha de inventário (CSV ou Excel), atualizando pelo número de inventário"""
+    global importacao_em_andamento, compactacao_agendada
+    if not dados_prontos():
+        return
+    if compactacao_em_andamento or importacao_em_andamento:
+        messagebox.showinfo("Aguarde", "Há uma gravação em andamento.")
         return
 
-    try:
-        path = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF files", "*.pdf"), ("Todos os arquivos", "*.*")],
-            title="Salvar como PDF"
-        )
-        if not path:
+    path = filedialog.askopenfilename(
+        filetypes=[("Planilhas", "*.csv *.xlsx *.xlsm"), ("Todos os arquivos", "*.*")],
+        title="Importar planilha"
+    )
+    if not path:
+        return
+    if not messagebox.askyesno(
+        "Confirmar",
+        f"Importar {os.path.basename(path)}?\n\n"
+        "Itens já cadastrados recebem os valores preenchidos na planilha; os novos são acrescentados."
+    ):
+        return
+
+    def concluir(resultado, erro):
+        global importacao_em_andamento
+        importacao_em_andamento = False
+        if isinstance(erro, motor.OperacaoCancelada):
+            messagebox.showinfo("Cancelado", "Importação cancelada; a base não foi alterada.")
+            return
+        if erro is not None:
+            messagebox.showerror("Erro", f"Falha ao importar a planilha:\n{erro}")
             return
 
-        c = canvas.Canvas(path, pagesize=A4)
-        width, height = A4
-        y = height - 40
-        c.setFont("Helvetica", 9)
-
-        # Cabeçalho
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, "Relatório de Patrimônio - " + datetime.now().strftime("%d/%m/%Y %H:%M"))
-        y -= 20
-        c.setFont("Helvetica", 9)
-        c.line(40, y, width-40, y)
-        y -= 20
-
-        for _, row in ultimos_resultados.iterrows():
-            inventario = formatar_inventario(row.get('Número de inventário', ''))
-            nome = row.get('Nome', 'Não encontrado') if pd.notna(row.get('Nome')) else 'Não encontrado'
-            tipo = row.get('Tipo', 'Não encontrado') if pd.notna(row.get('Tipo')) else 'Não encontrado'
-            grupo = row.get('Grupo encarregado', 'Não encontrado') if pd.notna(row.get('Grupo encarregado')) else 'Não encontrado'
-            local = row.get('Localização', 'Não encontrado') if pd.notna(row.get('Localização')) else 'Não encontrado'
-
-            linha = f"Patrimônio: {inventario} | Nome: {nome} | Tipo: {tipo} | Grupo: {grupo} | Local: {local}"
-
-            for sublinha in textwrap.wrap(linha, width=110):
-                c.drawString(40, y, sublinha)
-                y -= 15
-
-            y -= 10  # Espaço entre itens
-
-            if y < 60:  # Nova página se necessário
-                c.showPage()
-                y = height - 40
-                c.setFont("Helvetica", 9)
-
-        c.save()
-        messagebox.showinfo("Sucesso", f"PDF salvo como:\n{os.path.basename(path)}")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao exportar para PDF:\n{e}")
+        snapshot, resumo = resultado
+        base.aplicar(snapshot)
+        atualizar_combos()
+        status_dados.config(text=f"📁 {len(base.dados)} itens carregados ({base.armazenamento.nome})")
+        if entrada.get().strip():
+            buscar_texto()
+        else:
+            aplicar_filtros()
+
+        texto = (f"{resumo['lidas']} linhas lidas\n"
+                 f"{resumo['inseridos']} itens novos\n"
+                 f"{resumo['atualizados']} itens atualizados\n"
+                 f"{resumo['rejeitados']} linhas rejeitadas (sem número de inventário válido)")
+        if resumo['ignoradas']:
+            texto += f"\n\nColunas ignoradas: {', '.join(resumo['ignoradas'])}"
+        messagebox.showinfo("Importação concluída", texto)
+
+    # Tudo o que está no diário é gravado junto com a importação
+    if compactacao_agendada is not None:
+        janela.after_cancel(compactacao_agendada)
+        compactacao_agendada = None
+    importacao_em_andamento = True
+    executar_com_progresso(
+        "Importando planilha",
+        lambda progresso, cancelado: base.mesclar_planilha(path, progresso, cancelado),
+        concluir
+    )
+
+# --- RESUMO ---
+def tabela_resumo_atual():
+    """Contagens do resumo agrupadas pelas colunas marcadas (vêm do resumo mantido pelo motor)"""
+    colunas = [coluna for coluna, marcada in dimensoes_resumo.items() if marcada.get()]
+    return base.resumo.tabela(colunas)
+
+def meses_desatualizados():
+    """Meses digitados na aba de resumo (12 se o campo não tiver um número)"""
+    try:
+        return max(int(meses_resumo.get()), 0)
+    except (tk.TclError, ValueError):
+        return 12
+
+def atualizar_resumo():
+    """Preenche a aba de resumo com as contagens e a quantidade de itens desatualizados"""
+    if not base.carregado:
+        return
+    tabela = tabela_resumo_atual()
+    tabela_resumo.delete(*tabela_resumo.get_children())
+    tabela_resumo.config(columns=list(tabela.columns))
+    for coluna in tabela.columns:
+        tabela_resumo.heading(coluna, text=coluna, anchor=tk.W)
+        tabela_resumo.column(coluna, width=80 if coluna == 'Itens' else 180, anchor=tk.W, stretch=coluna != 'Itens')
+    for linha in tabela.itertuples(index=False, name=None):
+        tabela_resumo.insert('', tk.END, values=linha)
+
+    meses = meses_desatualizados()
+    desatualizados = len(base.resumo.desatualizados(meses))
+    total_resumo.config(
+        text=f"📊 {len(base.dados)} itens em {len(tabela)} grupos | "
+             f"{desatualizados} sem atualização há {meses} meses ou mais"
+    )
+
+def acompanhar_resumo(geracao_exibida=None):
+    """Refaz a aba de resumo quando os dados mudam (edição, recarga ou importação) e ela está visível"""
+    if base.carregado and base.geracao != geracao_exibida and abas.select() == str(frame_resumo):
+        atualizar_resumo()
+        geracao_exibida = base.geracao
+    janela.after(500, lambda: acompanhar_resumo(geracao_exibida))
+
+def listar_desatualizados():
+    """Mostra na aba de resultados os itens sem atualização há N meses, dos mais antigos aos sem data"""
+    if not dados_prontos():
+        return
+    exibir_resultados(base.dados.iloc[base.resumo.desatualizados(meses_desatualizados())])
+    abas.select(frame_resultado)
+
+def exportar_resumo_excel():
+    exportar(
+        "Excel", [("Excel", "*.xlsx")],
+        lambda resultados, path, progresso, cancelado: motor.gravar_excel(
+            resultados, path, progresso, cancelado, nome_folha="Resumo"),
+        tabela_resumo_atual()
+    )
+
+def exportar_resumo_pdf():
+    exportar(
+        "PDF", [("PDF files", "*.pdf")],
+        lambda resultados, path, progresso, cancelado: motor.gravar_pdf(
+            resultados, path, progresso, cancelado, formatar=motor.linhas_resumo, titulo="Resumo do Patrimônio"),
+        tabela_resumo_atual()
+    )
+
+def combos_filtro():
+    return [('Tipo', tipo_combo), ('Grupo encarregado', grupo_combo), ('Localização', local_combo)]
+
+def selecao_filtros():
+    """Valor real escolhido em cada combobox de filtro ('' se nenhum)"""
+    return {
+        coluna: rotulos_filtro.get(coluna, {}).get(combo.get(), '')
+        for coluna, combo in combos_filtro()
+    }
+
+def atualizar_combos():
+    """Preenche os comboboxes com os valores e quantos itens cada um teria.
+
+    As contagens de cada combobox levam em conta o que está escolhido nos
+    outros, e vêm do índice de facetas, sem percorrer os dados.
+    """
+    selecao = selecao_filtros()
+    for coluna, combo in combos_filtro():
+        contagens = base.facetas.contagens(coluna, selecao)
+        rotulos = {f"{valor} ({quantidade})": valor for valor, quantidade in contagens.items()}
+
+        atual = selecao[coluna]
+        texto_atual = next((texto for texto, valor in rotulos.items() if valor == atual), f"{atual} (0)")
+        if atual:
+            rotulos.setdefault(texto_atual, atual)
+
+        rotulos_filtro[coluna] = rotulos
+        combo['values'] = list(rotulos)
+        combo.set(texto_atual if atual else '')
+
+def mostrar_ultima_medicao(exibida=None):
+    """Mostra na barra de status o tempo da última operação (medida em qualquer thread)"""
+    ultima = medicoes.ultima
+    if ultima is not None and ultima is not exibida:
+        status_operacao.config(text=f"⏱ {ultima}")
+    janela.after(500, lambda: mostrar_ultima_medicao(ultima))
 
 def atualizar_interface():
+    """Faz a primeira carga e passa a vigiar o arquivo de dados, recarregando quando ele mudar"""
     try:
-        carregar_dados()
-        tipo_combo['values'] = sorted(df['Tipo'].dropna().unique().tolist())
-        grupo_combo['values'] = sorted(df['Grupo encarregado'].dropna().unique().tolist())
-        local_combo['values'] = sorted(df['Localização'].dropna().unique().tolist())
+        recarregar_em_segundo_plano()
+        observador = vigia.Vigia([base.armazenamento.caminho], mudanca_detectada.set).iniciar()
+        print(f"👁 Vigiando {base.armazenamento.caminho.name} ({observador.modo})")
     except Exception as e:
         print(f"Erro ao atualizar interface: {e}")
-    
-    janela.after(30000, atualizar_interface)  # Atualiza a cada 30 segundos
+
+    verificar_mudancas()
 
 def selecionar_item_para_edicao():
     """Permite selecionar um item diretamente da lista de resultados para edição"""
@@ -241,24 +753,14 @@ def selecionar_item_para_edicao():
         messagebox.showinfo("Atenção", "Nenhum resultado para editar.")
         return
     
-    try:
-        # Obter a seleção atual no widget de texto
-        sel_start = resultado_texto.index(tk.SEL_FIRST)
-        sel_end = resultado_texto.index(tk.SEL_LAST)
-        selected_text = resultado_texto.get(sel_start, sel_end)
-        
-        # Extrair o número do índice da linha selecionada
-        for line in selected_text.split('\n'):
-            if line.startswith("🔢 Índice:"):
-                idx = int(line.split(":")[1].strip())
-                abrir_janela_edicao(idx)
-                return
-                
-        messagebox.showinfo("Atenção", "Selecione uma linha que comece com 'Índice:' para editar.")
-        
-    except tk.TclError:
+    selecao = tabela_resultados.selection()
+    if not selecao:
         # Se não houver seleção, perguntar pelo índice
         perguntar_indice_edicao()
+        return
+
+    # O iid da linha é a posição do item em ultimos_resultados
+    abrir_janela_edicao(int(selecao[0]) + 1)
 
 def perguntar_indice_edicao():
     """Abre uma janela para perguntar qual item editar pelo índice"""
@@ -322,7 +824,7 @@ def validar_indice_edicao(indice_str, janela_indice):
 
 def abrir_janela_edicao(idx):
     """Abre a janela de edição para o item selecionado"""
-    global df, ultimos_resultados
+    global ultimos_resultados
     
     try:
         # Ajuste para índice baseado em 0
@@ -331,65 +833,56 @@ def abrir_janela_edicao(idx):
             messagebox.showerror("Erro", "Índice inválido.")
             return
 
-        # Recarregar os dados para garantir sincronia
-        carregar_dados()
+        # Usa os dados em memória, que o vigia mantém atualizados; se o arquivo mudou
+        # e a recarga ainda não foi disparada, ela roda em segundo plano
+        try:
+            recarregar_em_segundo_plano()
+        except OSError as e:
+            print(f"Erro ao verificar a planilha: {e}")
         
         # Obter a linha dos resultados filtrados
         linha_filtrada = ultimos_resultados.iloc[idx]
         inventario = formatar_inventario(linha_filtrada["Número de inventário"])
         
-        # Remover .0 se existir no número do patrimônio
-        inventario_busca = str(inventario).replace('.0', '') if '.0' in str(inventario) else str(inventario)
-        
-        # Encontrar a linha correspondente no DataFrame
-        # Converter ambos os lados para string e remover .0 para comparação
-        mascara = df["Número de inventário"].astype(str).str.replace('.0', '') == inventario_busca
-        linha_df = df[mascara]
+        # Encontrar a linha correspondente no DataFrame pelo índice de inventário
+        idx_original = base.localizar(inventario)
         
-        if linha_df.empty:
-            # Debug detalhado para ajudar a identificar o problema
-            print("\nDEBUG - Falha ao localizar item:")
-            print(f"Patrimônio buscado: '{inventario_busca}'")
-            print("Valores de patrimônio no DataFrame (amostra):")
-            print(df["Número de inventário"].astype(str).unique()[:10])
-            
+        if idx_original is None:
             messagebox.showerror(
                 "Erro", 
                 f"Item não encontrado na base de dados.\n\n"
-                f"Patrimônio: {inventario_busca}"
+                f"Patrimônio: {inventario}"
             )
             return
 
-        # Obter o índice no DataFrame
-        idx_original = linha_df.index[0]
+        linha_df = base.dados.loc[[idx_original]]
         
         def salvar_edicao():
-            """Salva as alterações no arquivo CSV"""
-            global df
+            """Registra as alterações no diário; o CSV é atualizado na compactação"""
             try:
-                criar_backup()  # Sempre criar backup antes de editar
-                
-                # Atualizar os valores no DataFrame
-                df.at[idx_original, "Nome"] = entrada_nome.get()
-                df.at[idx_original, "Tipo"] = entrada_tipo.get()
-                df.at[idx_original, "Grupo encarregado"] = entrada_grupo.get()
-                df.at[idx_original, "Localização"] = entrada_local.get()
-
-                # Salvar no arquivo CSV editável
-                df.to_csv(caminho_csv, sep=';', index=False, encoding='ISO-8859-1')
+                # Uma recarga em segundo plano pode ter trocado os dados com a janela aberta
+                rotulo = base.localizar(inventario)
+                if rotulo is None:
+                    raise LookupError(f"O patrimônio {inventario} não está mais na base de dados.")
+                registrar_edicao(rotulo, inventario, {
+                    "Nome": entrada_nome.get(),
+                    "Tipo": entrada_tipo.get(),
+                    "Grupo encarregado": entrada_grupo.get(),
+                    "Localização": entrada_local.get(),
+                })
                 
                 messagebox.showinfo("Sucesso", "Alterações salvas com sucesso!")
                 janela_edicao.destroy()
                 
                 # Atualizar a interface
-                carregar_dados()
+                atualizar_combos()
                 if entrada.get().strip():  # Se havia uma busca ativa
                     buscar_texto()
                 else:
                     aplicar_filtros()
                     
             except Exception as e:
-                messagebox.showerror("Erro", f"Falha ao salvar alterações:\n{e}")
+                messagebox.showerror("Erro", f"Falha ao salvar alterações:\n{e}", parent=janela_edicao)
 
         # Criar janela de edição
         janela_edicao = tb.Toplevel(janela)
@@ -465,6 +958,105 @@ def abrir_janela_edicao(idx):
     except Exception as e:
         messagebox.showerror("Erro", f"Falha ao editar item:\n{e}")
 
+def abrir_edicao_em_lote():
+    """Aplica os mesmos valores aos itens selecionados (ou a todos os resultados) de uma vez"""
+    if ultimos_resultados.empty:
+        messagebox.showinfo("Atenção", "Nenhum resultado para editar.")
+        return
+    if compactacao_em_andamento or importacao_em_andamento:
+        messagebox.showinfo("Aguarde", "As edições anteriores ainda estão sendo gravadas.")
+        return
+
+    # O iid de cada linha da tabela é a posição do item em ultimos_resultados
+    selecionados = [int(iid) for iid in tabela_resultados.selection()]
+
+    janela_lote = tb.Toplevel(janela)
+    janela_lote.title("Editar em Lote")
+    janela_lote.geometry("500x330")
+
+    main_edit_frame = tb.Frame(janela_lote)
+    main_edit_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    tb.Label(
+        main_edit_frame,
+        text="Campos deixados em branco não são alterados",
+        bootstyle="secondary"
+    ).pack(pady=(0, 10))
+
+    alcance = tk.StringVar(value="selecionados" if len(selecionados) > 1 else "todos")
+    if selecionados:
+        tb.Radiobutton(
+            main_edit_frame, text=f"Itens selecionados ({len(selecionados)})",
+            variable=alcance, value="selecionados"
+        ).pack(anchor=tk.W)
+    tb.Radiobutton(
+        main_edit_frame, text=f"Todos os resultados ({len(ultimos_resultados)})",
+        variable=alcance, value="todos"
+    ).pack(anchor=tk.W)
+
+    edit_fields = tb.Frame(main_edit_frame)
+    edit_fields.pack(fill=tk.X, pady=10)
+
+    widgets = {}
+    for row, (label, coluna) in enumerate([
+        ("Tipo:", "Tipo"),
+        ("Grupo encarregado:", "Grupo encarregado"),
+        ("Localização:", "Localização"),
+        ("Status:", "Status"),
+    ]):
+        tb.Label(edit_fields, text=label).grid(row=row, column=0, sticky=tk.W, pady=5, padx=5)
+        combo = tb.Combobox(edit_fields, values=base.facetas.distintos(coluna), width=38)
+        combo.grid(row=row, column=1, pady=5, padx=5)
+        widgets[coluna] = combo
+
+    def salvar_lote():
+        global compactacao_agendada
+        campos = {coluna: combo.get().strip() for coluna, combo in widgets.items() if combo.get().strip()}
+        if not campos:
+            messagebox.showinfo("Atenção", "Preencha ao menos um campo.", parent=janela_lote)
+            return
+        linhas = ultimos_resultados.iloc[selecionados] if alcance.get() == "selecionados" else ultimos_resultados
+        if not messagebox.askyesno(
+            "Confirmar",
+            f"Alterar {len(linhas)} itens?\n\n" + "\n".join(f"{c}: {v}" for c, v in campos.items()),
+            parent=janela_lote
+        ):
+            return
+
+        if compactacao_em_andamento:
+            messagebox.showinfo("Aguarde", "As edições anteriores estão sendo gravadas na planilha.", parent=janela_lote)
+            return
+        try:
+            # Tudo o que havia no diário é gravado junto: a compactação agendada não é mais necessária
+            if compactacao_agendada is not None:
+                janela.after_cancel(compactacao_agendada)
+                compactacao_agendada = None
+            alterados = base.editar_em_lote(linhas.index, campos)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Falha ao salvar alterações:\n{e}", parent=janela_lote)
+            return
+
+        janela_lote.destroy()
+        messagebox.showinfo("Sucesso", f"{alterados} itens alterados.")
+        atualizar_combos()
+        if entrada.get().strip():
+            buscar_texto()
+        else:
+            aplicar_filtros()
+
+    button_frame = tb.Frame(main_edit_frame)
+    button_frame.pack(pady=10)
+    tb.Button(button_frame, text="Aplicar", command=salvar_lote, bootstyle="success").pack(side=tk.LEFT, padx=10)
+    tb.Button(button_frame, text="Cancelar", command=janela_lote.destroy, bootstyle="danger").pack(side=tk.LEFT, padx=10)
+
+    # Centralizar janela
+    janela_lote.update_idletasks()
+    width = janela_lote.winfo_width()
+    height = janela_lote.winfo_height()
+    x = (janela_lote.winfo_screenwidth() // 2) - (width // 2)
+    y = (janela_lote.winfo_screenheight() // 2) - (height // 2)
+    janela_lote.geometry(f'+{x}+{y}')
+
 # --- INTERFACE PRINCIPAL ---
 janela = tb.Window(themename="flatly")
 janela.title("Consulta de Patrimônio")
@@ -485,7 +1077,11 @@ title_label = tb.Label(
 title_label.pack(pady=(0, 15))
 
 # Frame de busca
-frame_busca = tb.LabelFrame(main_frame, text="Busca Textual", bootstyle="primary")
+frame_busca = tb.LabelFrame(
+    main_frame,
+    text='Busca Textual (ex.: cadeira | local:sotão tipo:carro | nome:cad* | "frase" | OR, NOT)',
+    bootstyle="primary"
+)
 frame_busca.pack(fill=tk.X, pady=5)
 
 entrada = tb.Entry(
@@ -504,6 +1100,16 @@ search_btn = tb.Button(
 )
 search_btn.pack(side=tk.LEFT, padx=5)
 
+# Busca tolerante a erros de digitação em Nome, Modelo, Fabricante e Localização
+busca_aproximada = tk.BooleanVar(value=False)
+tb.Checkbutton(
+    frame_busca,
+    text="Aproximada",
+    variable=busca_aproximada,
+    command=refazer_busca,
+    bootstyle="primary-round-toggle"
+).pack(side=tk.LEFT, padx=5)
+
 # Separador
 tb.Separator(main_frame, bootstyle="primary").pack(fill=tk.X, pady=10)
 
@@ -524,6 +1130,9 @@ tb.Label(frame_filtros, text="Localização:").grid(row=0, column=4, padx=5, pad
 local_combo = tb.Combobox(frame_filtros, state="readonly", width=25, bootstyle="primary")
 local_combo.grid(row=0, column=5, padx=5, pady=5)
 
+for _, combo in combos_filtro():
+    combo.bind("<<ComboboxSelected>>", lambda e: atualizar_combos())
+
 # Botões de ação
 filter_btn = tb.Button(
     frame_filtros,
@@ -564,6 +1173,15 @@ export_pdf_btn = tb.Button(
 )
 export_pdf_btn.pack(side=tk.LEFT, padx=5)
 
+export_dados_btn = tb.Button(
+    action_frame,
+    text="Exportar CSV/JSON",
+    command=exportar_dados,
+    bootstyle="secondary",
+    width=18
+)
+export_dados_btn.pack(side=tk.LEFT, padx=5)
+
 edit_btn = tb.Button(
     action_frame,
     text="Editar Item",
@@ -573,22 +1191,95 @@ edit_btn = tb.Button(
 )
 edit_btn.pack(side=tk.LEFT, padx=5)
 
+edit_lote_btn = tb.Button(
+    action_frame,
+    text="Editar em Lote",
+    command=abrir_edicao_em_lote,
+    bootstyle="warning-outline",
+    width=15
+)
+edit_lote_btn.pack(side=tk.LEFT, padx=5)
+
+importar_btn = tb.Button(
+    action_frame,
+    text="Importar Planilha",
+    command=importar_planilha,
+    bootstyle="secondary-outline",
+    width=16
+)
+importar_btn.pack(side=tk.LEFT, padx=5)
+
+# Abas: resultados da busca e resumo do inventário
+abas = tb.Notebook(main_frame, bootstyle="primary")
+abas.pack(fill=tk.BOTH, expand=True, pady=10)
+
 # Frame de resultados
-frame_resultado = tb.Frame(main_frame, bootstyle="default")
-frame_resultado.pack(fill=tk.BOTH, expand=True, pady=10)
+frame_resultado = tb.Frame(abas, bootstyle="default")
+abas.add(frame_resultado, text="Resultados")
+
+contador_resultados = tb.Label(frame_resultado, text="", bootstyle="secondary")
+contador_resultados.pack(anchor=tk.W, pady=(0, 5))
 
-# Área de texto com scrollbar
-text_scroll = tb.Scrollbar(frame_resultado)
-text_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+# Tabela de resultados com scrollbar (linhas carregadas sob demanda na rolagem)
+scroll_resultados = tb.Scrollbar(frame_resultado)
+scroll_resultados.pack(side=tk.RIGHT, fill=tk.Y)
 
-resultado_texto = tb.Text(
+tabela_resultados = tb.Treeview(
     frame_resultado,
-    wrap="word",
-    height=10,
-    width=50
+    columns=[titulo for _, titulo, _ in COLUNAS_RESULTADO],
+    show="headings",
+    selectmode="extended",  # Vários itens podem ser selecionados para a edição em lote
+    bootstyle="primary"
 )
-resultado_texto.pack(fill=tk.BOTH, expand=True)
-text_scroll.config(command=resultado_texto.yview)
+for _, titulo, largura in COLUNAS_RESULTADO:
+    tabela_resultados.heading(titulo, text=titulo, anchor=tk.W)
+    tabela_resultados.column(titulo, width=largura, anchor=tk.W, stretch=titulo != "Índice")
+tabela_resultados.pack(fill=tk.BOTH, expand=True)
+tabela_resultados.config(yscrollcommand=ao_rolar_resultados)
+scroll_resultados.config(command=tabela_resultados.yview)
+
+# Aba de resumo: contagens por Localização × Grupo × Tipo × Status e itens desatualizados
+frame_resumo = tb.Frame(abas, bootstyle="default")
+abas.add(frame_resumo, text="Resumo")
+
+controles_resumo = tb.Frame(frame_resumo)
+controles_resumo.pack(fill=tk.X, pady=5)
+tb.Label(controles_resumo, text="Agrupar por:").pack(side=tk.LEFT, padx=5)
+dimensoes_resumo = {coluna: tk.BooleanVar(value=True) for coluna in motor.COLUNAS_RESUMO}
+for coluna, marcada in dimensoes_resumo.items():
+    tb.Checkbutton(
+        controles_resumo,
+        text=coluna,
+        variable=marcada,
+        command=atualizar_resumo,
+        bootstyle="primary-round-toggle"
+    ).pack(side=tk.LEFT, padx=5)
+tb.Button(controles_resumo, text="Exportar PDF", command=exportar_resumo_pdf, bootstyle="info").pack(side=tk.RIGHT, padx=5)
+tb.Button(controles_resumo, text="Exportar Excel", command=exportar_resumo_excel, bootstyle="success").pack(side=tk.RIGHT, padx=5)
+
+desatualizados_frame = tb.Frame(frame_resumo)
+desatualizados_frame.pack(fill=tk.X, pady=5)
+tb.Label(desatualizados_frame, text="Sem atualização há").pack(side=tk.LEFT, padx=5)
+meses_resumo = tk.IntVar(value=12)
+spin_meses = tb.Spinbox(
+    desatualizados_frame, from_=1, to=120, width=5, textvariable=meses_resumo, command=atualizar_resumo
+)
+spin_meses.pack(side=tk.LEFT)
+spin_meses.bind("<Return>", lambda e: atualizar_resumo())
+tb.Label(desatualizados_frame, text="meses ou mais").pack(side=tk.LEFT, padx=5)
+tb.Button(
+    desatualizados_frame, text="Listar itens", command=listar_desatualizados, bootstyle="warning"
+).pack(side=tk.LEFT, padx=5)
+
+total_resumo = tb.Label(frame_resumo, text="", bootstyle="secondary")
+total_resumo.pack(anchor=tk.W, pady=(0, 5))
+
+scroll_resumo = tb.Scrollbar(frame_resumo)
+scroll_resumo.pack(side=tk.RIGHT, fill=tk.Y)
+tabela_resumo = tb.Treeview(frame_resumo, show="headings", bootstyle="primary")
+tabela_resumo.pack(fill=tk.BOTH, expand=True)
+tabela_resumo.config(yscrollcommand=scroll_resumo.set)
+scroll_resumo.config(command=tabela_resumo.yview)
 
 style = ttk.Style()
 style.configure("Custom.TButton", font=("Arial", 12), background="black")
@@ -599,23 +1290,42 @@ status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
 tb.Label(
     status_bar,
-    text="🕒 Atualização automática a cada 30 segundos | Ctrl+E para editar item selecionado",
+    text="🕒 Atualização automática quando a planilha muda | Duplo clique ou Ctrl+E para editar item selecionado",
     bootstyle="inverse-secondary",
     font=("Segoe UI", 9)
 ).pack(side=tk.LEFT, padx=10, pady=3)
 
+status_dados = tb.Label(
+    status_bar,
+    text="⏳ Carregando planilha...",
+    bootstyle="inverse-secondary",
+    font=("Segoe UI", 9)
+)
+status_dados.pack(side=tk.RIGHT, padx=10, pady=3)
+
+status_operacao = tb.Label(status_bar, text="", bootstyle="inverse-secondary", font=("Segoe UI", 9))
+status_operacao.pack(side=tk.RIGHT, padx=10, pady=3)
+
 # Configuração de atalhos
 entrada.bind("<Return>", lambda event: buscar_texto())
+entrada.bind("<KeyRelease>", agendar_busca)
 janela.bind('<Control-e>', lambda e: selecionar_item_para_edicao())
+janela.protocol("WM_DELETE_WINDOW", ao_fechar)
+tabela_resultados.bind(
+    '<Double-1>',
+    lambda e: selecionar_item_para_edicao() if tabela_resultados.identify_region(e.x, e.y) == "cell" else None
+)
 
 # --- INICIALIZAÇÃO ---
 if __name__ == "__main__":
-    # Verificar se o arquivo CSV existe
-    if not os.path.exists(caminho_csv):
-        messagebox.showerror("Erro", f"Arquivo CSV não encontrado em:\n{caminho_csv}")
+    # Verificar se o arquivo de dados (CSV ou banco SQLite) existe
+    if not base.armazenamento.caminho.exists():
+        messagebox.showerror("Erro", f"Arquivo de dados não encontrado em:\n{base.armazenamento.caminho}")
         janela.destroy()
     else:
-        # Iniciar interface
-        carregar_dados()
+        # Iniciar interface: a janela aparece primeiro e a planilha é lida em segundo plano
+        janela.after_idle(lambda: informar_inicializacao("janela"))
         atualizar_interface()
+        mostrar_ultima_medicao()
+        acompanhar_resumo()
         janela.mainloop()
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""Armazenamento de backups do Dados.csv com deltas, deduplicação e retenção.
+
+Os arquivos seguem o padrão de nomes já usado na pasta backups/:
+
+    backup_AAAAMMDD_HHMMSS.csv        cópia completa (formato antigo)
+    backup_AAAAMMDD_HHMMSS.csv.gz     base: cópia completa compactada
+    backup_AAAAMMDD_HHMMSS.delta.gz   delta: linhas que mudaram em relação à base
+
+Um segundo backup no mesmo segundo ganha um número no fim do horário
+(backup_AAAAMMDD_HHMMSS_2.delta.gz). Cada delta é relativo à sua base (e não ao delta anterior), então qualquer
+ponto no tempo é reconstruído lendo no máximo dois arquivos.
+
+Uso pela linha de comando:
+
+    python backup.py listar
+    python backup.py restaurar 20250505_141218 --destino Dados.csv
+    python backup.py restaurar 20250505_141218_2 --destino Dados.csv
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import diario
+
+PREFIXO = 'backup_'
+FORMATO_DATA = '%Y%m%d_%H%M%S'
+EXT_LEGADA = '.csv'
+EXT_BASE = '.csv.gz'
+EXT_DELTA = '.delta.gz'
+
+MAX_DELTAS_POR_BASE = 50  # Depois disso, grava uma nova base
+FRACAO_MAX_DELTA = 0.2  # Delta com mais linhas alteradas que isso vira uma nova base
+RETENCAO_DIAS = 90  # Cadeias (base + deltas) mais antigas que isso são apagadas
+MIN_CADEIAS = 10  # Cadeias mais recentes mantidas, seja qual for a idade
+
+# O CSV é tratado como texto ISO-8859-1, que representa qualquer byte sem perdas
+ENCODING = 'ISO-8859-1'
+
+_PADRAO_NOME = re.compile(r'^backup_(\d{8}_\d{6})(?:_(\d+))?(\.csv|\.csv\.gz|\.delta\.gz)$')
+_PADRAO_INSTANTE = re.compile(r'^(\d{8}_\d{6})(?:_(\d+))?$')
+
+# Última base lida e hash do último backup, para não reler a pasta a cada edição
+_cache = {'base': None, 'linhas': None, 'ultimo': None, 'hash': None}
+
+def listar(diretorio):
+    """Lista os backups da pasta em ordem cronológica: [(data, caminho, tipo)].
+
+    tipo é 'base' (inclusive as cópias .csv antigas) ou 'delta'.
+    """
+    diretorio = Path(diretorio)
+    if not diretorio.exists():
+        return []
+
+    entradas = []
+    for caminho in diretorio.iterdir():
+        m = _PADRAO_NOME.match(caminho.name)
+        if not m:
+            continue
+        data = datetime.strptime(m.group(1), FORMATO_DATA)
+        tipo = 'delta' if m.group(3) == EXT_DELTA else 'base'
+        entradas.append((data, caminho, tipo))
+    return sorted(entradas, key=lambda e: (e[0], _numero(e[1])))
+
+def _numero(caminho):
+    """Ordem do backup dentro do seu segundo (1 para o primeiro)"""
+    return int(_PADRAO_NOME.match(caminho.name).group(2) or 1)
+
+def _ler_texto(caminho):
+    caminho = Path(caminho)
+    if caminho.name.endswith('.gz'):
+        with gzip.open(caminho, 'rb') as f:
+            return f.read().decode(ENCODING)
+    return caminho.read_bytes().decode(ENCODING)
+
+def _hash(texto):
+    return hashlib.sha256(texto.encode(ENCODING)).hexdigest()
+
+def _gravar(caminho, conteudo):
+    """Grava bytes compactados com gzip, via arquivo temporário + rename"""
+    caminho = Path(caminho)
+    fd, temporario = tempfile.mkstemp(prefix=f".{caminho.name}.", suffix='.tmp', dir=caminho.parent)
+    try:
+        with os.fdopen(fd, 'wb') as bruto, gzip.GzipFile(fileobj=bruto, mode='wb', mtime=0) as f:
+            f.write(conteudo)
+        diario.copiar_permissoes(temporario, caminho)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+def _linhas_da_base(caminho):
+    if _cache['base'] != caminho:
+        _cache['base'] = caminho
+        _cache['linhas'] = _ler_texto(caminho).splitlines(keepends=True)
+    return _cache['linhas']
+
+def reconstruir(caminho):
+    """Devolve o conteúdo completo do CSV guardado em um backup (base ou delta)"""
+    caminho = Path(caminho)
+    if not caminho.name.endswith(EXT_DELTA):
+        return _ler_texto(caminho)
+
+    delta = json.loads(_ler_texto(caminho))
+    linhas = list(_linhas_da_base(caminho.with_name(delta['base'])))
+    del linhas[delta['total']:]
+    linhas.extend([''] * (delta['total'] - len(linhas)))
+    for posicao, linha in delta['alteradas'].items():
+        linhas[int(posicao)] = linha
+    return ''.join(linhas)
+
+def registrar(caminho_csv, diretorio, agora=None):
+    """Guarda o estado atual do CSV na pasta de backups.
+
+    Grava um delta em relação à última base sempre que possível, e uma nova
+    base quando não há base, quando a base já tem deltas demais ou quando a
+    mudança é grande. Retorna o caminho do backup criado, ou None quando o
+    conteúdo é idêntico ao do último backup (o único caso em que nada é
+    gravado).
+    """
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    agora = agora or datetime.now()
+
+    texto = Path(caminho_csv).read_bytes().decode(ENCODING)
+    hash_atual = _hash(texto)
+
+    entradas = listar(diretorio)
+    if entradas:
+        ultimo = entradas[-1][1]
+        if _cache['ultimo'] != ultimo:
+            _cache['ultimo'] = ultimo
+            _cache['hash'] = _hash(reconstruir(ultimo))
+        if _cache['hash'] == hash_atual:
+            return None
+
+    nome = prefixo = PREFIXO + agora.strftime(FORMATO_DATA)
+    nomes = {e[1].name for e in entradas}
+    numero = 1
+    while any(n.startswith(nome + '.') for n in nomes):  # Já existe um backup neste mesmo segundo
+        numero += 1
+        nome = f"{prefixo}_{numero}"
+
+    linhas = texto.splitlines(keepends=True)
+    caminho = None
+
+    bases = [i for i, e in enumerate(entradas) if e[2] == 'base']
+    if bases and len(entradas) - 1 - bases[-1] < MAX_DELTAS_POR_BASE:
+        base = entradas[bases[-1]][1]
+        linhas_base = _linhas_da_base(base)
+        alteradas = {
+            posicao: linha
+            for posicao, linha in enumerate(linhas)
+            if posicao >= len(linhas_base) or linha != linhas_base[posicao]
+        }
+        if len(alteradas) <= FRACAO_MAX_DELTA * max(len(linhas), 1):
+            caminho = diretorio / (nome + EXT_DELTA)
+            delta = {'base': base.name, 'total': len(linhas), 'sha256': hash_atual, 'alteradas': alteradas}
+            _gravar(caminho, json.dumps(delta, ensure_ascii=False).encode(ENCODING))
+
+    if caminho is None:
+        caminho = diretorio / (nome + EXT_BASE)
+        _gravar(caminho, texto.encode(ENCODING))
+        _cache['base'] = caminho
+        _cache['linhas'] = linhas
+
+    _cache['ultimo'] = caminho
+    _cache['hash'] = hash_atual
+
+    aplicar_retencao(diretorio, agora=agora)
+    return caminho
+
+def aplicar_retencao(diretorio, dias=RETENCAO_DIAS, agora=None, manter=MIN_CADEIAS):
+    """Apaga as cadeias (base + seus deltas) cujo backup mais novo passou do prazo.
+
+    Só são apagadas as cadeias gravadas por este módulo (base .csv.gz): as
+    cópias .csv do formato antigo, e os deltas feitos sobre elas, ficam. As
+    `manter` cadeias mais recentes (pelo menos uma) também ficam, seja qual
+    for a idade. Retorna a lista de arquivos apagados.
+    """
+    limite = (agora or datetime.now()) - timedelta(days=dias)
+
+    cadeias = []
+    for entrada in listar(diretorio):
+        if entrada[2] == 'base' or not cadeias:
+            cadeias.append([])
+        cadeias[-1].append(entrada)
+
+    apagados = []
+    for cadeia in cadeias[:-max(manter, 1)]:
+        if cadeia[0][1].name.endswith(EXT_BASE) and cadeia[-1][0] < limite:
+            for _, caminho, _ in cadeia:
+                caminho.unlink()
+                apagados.append(caminho)
+    return apagados
+
+def restaurar(diretorio, instante, destino):
+    """Grava em `destino` o CSV como estava no instante informado.
+
+    Usa o backup mais recente feito até `instante` (datetime ou texto no
+    formato AAAAMMDD_HHMMSS dos nomes dos arquivos). Com o número de ordem
+    (AAAAMMDD_HHMMSS_2), para naquele backup do segundo; sem ele, usa o
+    último do segundo.
+    """
+    numero = float('inf')
+    if isinstance(instante, str):
+        m = _PADRAO_INSTANTE.match(instante)
+        if not m:
+            raise ValueError(f"Instante inválido: {instante} (use AAAAMMDD_HHMMSS)")
+        instante = datetime.strptime(m.group(1), FORMATO_DATA)
+        if m.group(2):
+            numero = int(m.group(2))
+
+    anteriores = [e for e in listar(diretorio) if (e[0], _numero(e[1])) <= (instante, numero)]
+    if not anteriores:
+        raise ValueError(f"Nenhum backup até {instante:%d/%m/%Y %H:%M:%S}")
+
+    data, caminho, _ = anteriores[-1]
+    texto = reconstruir(caminho)
+
+    destino = Path(destino)
+    fd, temporario = tempfile.mkstemp(prefix=f".{destino.name}.", suffix='.tmp', dir=destino.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(texto.encode(ENCODING))
+        diario.copiar_permissoes(temporario, destino)
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return data, caminho
+
+def main():
+    pasta_padrao = Path(__file__).parent / 'backups'
+
+    parser = argparse.ArgumentParser(description="Backups do Consultador de Patrimônio")
+    parser.add_argument('--pasta', default=pasta_padrao, help="pasta dos backups")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('listar', help="lista os backups disponíveis")
+    p_restaurar = sub.add_parser('restaurar', help="restaura o CSV de um ponto no tempo")
+    p_restaurar.add_argument('instante', help="data no formato AAAAMMDD_HHMMSS")
+    p_restaurar.add_argument('--destino', default='Dados_restaurado.csv', help="arquivo CSV a gravar")
+    args = parser.parse_args()
+
+    if args.comando == 'listar':
+        for data, caminho, tipo in listar(args.pasta):
+            print(f"{data:%d/%m/%Y %H:%M:%S}  {tipo:5}  {caminho.name}")
+    else:
+        data, caminho = restaurar(args.pasta, args.instante, args.destino)
+        print(f"Restaurado {caminho.name} ({data:%d/%m/%Y %H:%M:%S}) em {args.destino}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Armazenamento do inventário em SQLite, alternativa ao Dados.csv.
+
+O banco fica ao lado do CSV (ex.: Dados.sqlite) e tem duas tabelas:
+
+    itens        uma linha por item, com as mesmas colunas do CSV; a chave
+                 `posicao` é a ordem do item na planilha. Índices em Número
+                 de inventário, Tipo, Grupo encarregado e Localização.
+    itens_busca  tabela FTS5 (tokenizador trigram) com o texto normalizado de
+                 cada item, no mesmo rowid: qualquer trecho de 3 letras ou
+                 mais é encontrado pelo índice, sem percorrer as linhas.
+
+Cada edição é um UPDATE de uma linha, em uma transação. Quando o banco
+existe, o programa passa a usá-lo no lugar do CSV (ver motor.abrir_armazenamento).
+
+Uso pela linha de comando:
+
+    python banco.py importar [--csv Dados.csv] [--banco Dados.sqlite]
+    python banco.py exportar [--banco Dados.sqlite] [--csv Dados_exportado.csv]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import diario
+
+EXTENSAO = '.sqlite'
+TABELA = 'itens'
+TABELA_BUSCA = 'itens_busca'
+COLUNAS_INDEXADAS = ['Número de inventário', 'Tipo', 'Grupo encarregado', 'Localização']
+MIN_CARACTERES_INDICE = 3  # O tokenizador trigram só encontra trechos a partir de 3 letras
+INTERVALO_CANCELAMENTO = 10000  # Instruções da máquina virtual do SQLite entre checagens de cancelamento
+
+class BuscaInterrompida(Exception):
+    """A consulta ao banco foi interrompida porque cancelado() retornou True"""
+
+def caminho_banco(caminho_csv):
+    """Banco correspondente a um CSV (Dados.csv -> Dados.sqlite)"""
+    return Path(caminho_csv).with_suffix(EXTENSAO)
+
+def _nome(coluna):
+    return '"' + str(coluna).replace('"', '""') + '"'
+
+def _valor(valor):
+    """Converte para um tipo aceito pelo sqlite3 (vazios viram NULL)"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+def conectar(caminho):
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(caminho)
+    return sqlite3.connect(caminho)
+
+def tem_busca_indexada(caminho):
+    with closing(conectar(caminho)) as conexao:
+        return conexao.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (TABELA_BUSCA,)
+        ).fetchone() is not None
+
+def criar(caminho, dados, busca=None):
+    """Grava os dados em um banco novo, que substitui o arquivo de uma só vez.
+
+    `busca` é o texto normalizado de cada linha; sem ele (ou se o SQLite não
+    tiver FTS5 com trigram), o banco é criado sem a tabela de busca.
+    """
+    caminho = Path(caminho)
+    fd, temporario = tempfile.mkstemp(prefix=f".{caminho.name}.", suffix='.tmp', dir=caminho.parent)
+    os.close(fd)
+    try:
+        with closing(sqlite3.connect(temporario)) as conexao, conexao:
+            colunas = ', '.join(_nome(coluna) for coluna in dados.columns)
+            conexao.execute(f"CREATE TABLE {TABELA} (posicao INTEGER PRIMARY KEY, {colunas})")
+            marcadores = ', '.join('?' * (len(dados.columns) + 1))
+            conexao.executemany(
+                f"INSERT INTO {TABELA} VALUES ({marcadores})",
+                ((posicao, *map(_valor, linha)) for posicao, linha in enumerate(dados.itertuples(index=False, name=None)))
+            )
+            for coluna in COLUNAS_INDEXADAS:
+                if coluna in dados.columns:
+                    conexao.execute(f"CREATE INDEX {_nome('idx_' + coluna)} ON {TABELA} ({_nome(coluna)})")
+
+            if busca is not None:
+                try:
+                    conexao.execute(f"CREATE VIRTUAL TABLE {TABELA_BUSCA} USING fts5(texto, tokenize='trigram')")
+                except sqlite3.OperationalError as e:
+                    print(f"Banco criado sem índice de busca (SQLite sem FTS5/trigram): {e}")
+                else:
+                    conexao.executemany(
+                        f"INSERT INTO {TABELA_BUSCA} (rowid, texto) VALUES (?, ?)",
+                        enumerate(busca.tolist())
+                    )
+        diario.copiar_permissoes(temporario, caminho)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+def ler(caminho, com_busca=True):
+    """Devolve (dados, texto da busca) na ordem da planilha; o texto é None se o banco não o tiver"""
+    with closing(conectar(caminho)) as conexao:
+        dados = pd.read_sql_query(f"SELECT * FROM {TABELA} ORDER BY posicao", conexao)
+        busca = None
+        if com_busca and tem_busca_indexada(caminho):
+            busca = pd.read_sql_query(f"SELECT texto FROM {TABELA_BUSCA} ORDER BY rowid", conexao)['texto']
+            busca = busca.astype(object)
+    dados = dados.drop(columns='posicao')
+    return dados, busca
+
+def atualizar(caminho, posicao, campos, texto=None):
+    """Grava a edição de uma linha (e seu texto da busca) em uma única transação"""
+    atualizar_lote(caminho, [posicao], campos, None if texto is None else [texto])
+
+def atualizar_lote(caminho, posicoes, campos, textos=None):
+    """Grava os mesmos valores em várias linhas (e o texto da busca de cada uma) em uma única transação"""
+    with closing(conectar(caminho)) as conexao, conexao:
+        existentes = {linha[1] for linha in conexao.execute(f"PRAGMA table_info({TABELA})")}
+        for coluna in campos:
+            if coluna not in existentes:
+                conexao.execute(f"ALTER TABLE {TABELA} ADD COLUMN {_nome(coluna)}")
+
+        atribuicoes = ', '.join(f"{_nome(coluna)} = ?" for coluna in campos)
+        valores = [_valor(valor) for valor in campos.values()]
+        conexao.executemany(
+            f"UPDATE {TABELA} SET {atribuicoes} WHERE posicao = ?",
+            ([*valores, int(posicao)] for posicao in posicoes)
+        )
+        if textos is not None and tem_busca_indexada(caminho):
+            conexao.executemany(
+                f"UPDATE {TABELA_BUSCA} SET texto = ? WHERE rowid = ?",
+                zip(textos, map(int, posicoes))
+            )
+
+def buscar(caminho, termo, cancelado=None):
+    """Posições (ordenadas) das linhas cujo texto normalizado contém `termo`, pelo índice FTS5.
+
+    Retorna None se o termo é curto demais para o índice ou se o banco não o tem.
+    """
+    if len(termo) < MIN_CARACTERES_INDICE or not tem_busca_indexada(caminho):
+        return None
+    frase = '"' + termo.replace('"', '""') + '"'
+    with closing(conectar(caminho)) as conexao:
+        if cancelado is not None:
+            conexao.set_progress_handler(lambda: 1 if cancelado() else 0, INTERVALO_CANCELAMENTO)
+        try:
+            linhas = conexao.execute(
+                f"SELECT rowid FROM {TABELA_BUSCA} WHERE texto MATCH ? ORDER BY rowid", (frase,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            if cancelado is not None and cancelado():
+                raise BuscaInterrompida() from None
+            raise
+    return np.fromiter((linha[0] for linha in linhas), dtype=np.int64, count=len(linhas))
+
+def main():
+    # Importado aqui: o motor usa este módulo e faz o tratamento dos dados
+    import motor
+
+    pasta = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Banco SQLite do Consultador de Patrimônio")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_importar = sub.add_parser('importar', help="cria o banco a partir do CSV (com as edições pendentes do diário)")
+    p_importar.add_argument('--csv', default=pasta / 'Dados.csv', help="planilha de origem")
+    p_importar.add_argument('--banco', help="banco a criar (padrão: ao lado do CSV)")
+    p_exportar = sub.add_parser('exportar', help="grava o conteúdo do banco no formato do Dados.csv")
+    p_exportar.add_argument('--banco', default=caminho_banco(pasta / 'Dados.csv'), help="banco de origem")
+    p_exportar.add_argument('--csv', default=pasta / 'Dados_exportado.csv', help="CSV a gravar")
+    args = parser.parse_args()
+
+    if args.comando == 'importar':
+        dados, busca = motor.ArmazenamentoCSV(args.csv).ler()
+        destino = args.banco or caminho_banco(args.csv)
+        criar(destino, dados, busca)
+        print(f"{len(dados)} itens importados para {destino}")
+    else:
+        dados, _ = ler(args.banco)
+        motor.normalizar_inventarios(dados)
+        diario.salvar_csv_atomico(dados, args.csv)
+        print(f"{len(dados)} itens exportados para {args.csv}")
+
+if __name__ == "__main__":
+    main()
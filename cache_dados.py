@@ -0,0 +1,215 @@
+"""Cache binário do Dados.csv, para não reinterpretar o texto a cada abertura.
+
+O DataFrame já tratado (e o texto normalizado da busca) é gravado ao lado
+do CSV, em Feather quando o pyarrow está instalado (lido com memory map) ou
+em .npz caso contrário: um array numpy por coluna, lido sem pickle. O cache
+fica na pasta compartilhada, onde outras pessoas podem gravar; por isso
+nenhum dos dois formatos pode executar código ao ser lido (nada de pickle).
+
+Um arquivo .json guarda a chave do CSV de origem: data de modificação,
+tamanho e hash SHA-256. Se a data e o tamanho batem, o cache é usado direto;
+se só o tamanho bate, o hash decide. No .npz, o .json também descreve as
+colunas (nome e tipo).
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import diario
+
+VERSAO = 3  # Aumentar quando mudar o tratamento feito antes de gravar o cache
+COLUNA_BUSCA = '__busca__'
+
+class TipoNaoSuportado(ValueError):
+    """Coluna que o formato .npz não representa (ex.: tipos misturados); o cache não é gravado"""
+
+def _feather():
+    """Módulo pyarrow.feather, importado só na primeira leitura/gravação (ou None)"""
+    try:
+        from pyarrow import feather
+    except ImportError:
+        return None
+    return feather
+
+def caminhos(caminho_csv):
+    """Caminhos do arquivo de dados e do arquivo de chave do cache"""
+    caminho_csv = Path(caminho_csv)
+    dados = caminho_csv.with_name(caminho_csv.name + '.cache')
+    return dados, dados.with_name(dados.name + '.json')
+
+def calcular_hash(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def chave(caminho_csv):
+    """Identifica o conteúdo atual do CSV (o hash só é calculado quando preciso)"""
+    info = os.stat(caminho_csv)
+    return {'versao': VERSAO, 'mtime': info.st_mtime, 'tamanho': info.st_size, 'sha256': None}
+
+def _confere(caminho_csv, atual, salva):
+    if salva.get('versao') != atual['versao'] or salva.get('tamanho') != atual['tamanho']:
+        return False
+    if salva.get('mtime') == atual['mtime']:
+        return True
+    # Mesmo tamanho mas outra data (arquivo copiado ou "tocado"): comparar o conteúdo
+    if atual['sha256'] is None:
+        atual['sha256'] = calcular_hash(caminho_csv)
+    return salva.get('sha256') == atual['sha256']
+
+# --- FORMATO .NPZ ---
+# Cada coluna vira um ou mais arrays "c<i>_<parte>" e uma descrição no .json:
+#   'numeros'    array numpy comum (float, int, bool, datetime64): parte 'valores'
+#   'inteiros'   Int64 com vazios: 'valores' e 'vazios'
+#   'textos'     textos com vazios (object ou str): 'utf8' (todos juntos), 'tamanhos' (em
+#                caracteres) e 'vazios'
+#   'categorias' categórica: 'codigos' e as categorias, descritas como outra coluna
+
+def _textos_para_arrays(valores):
+    vazios = pd.isna(valores)
+    textos = ['' if vazio else valor for valor, vazio in zip(valores.tolist(), vazios.tolist())]
+    if not all(isinstance(texto, str) for texto in textos):
+        raise TipoNaoSuportado("coluna com textos e outros tipos misturados")
+    return {
+        'utf8': np.frombuffer(''.join(textos).encode('utf-8'), dtype=np.uint8),
+        'tamanhos': np.fromiter(map(len, textos), dtype=np.int64, count=len(textos)),
+        'vazios': np.asarray(vazios, dtype=bool),
+    }
+
+def _arrays_para_textos(partes):
+    texto = partes['utf8'].tobytes().decode('utf-8')
+    fins = np.cumsum(partes['tamanhos']).tolist()
+    valores = np.empty(len(fins), dtype=object)
+    valores[:] = [texto[inicio:fim] for inicio, fim in zip([0] + fins[:-1], fins)]
+    valores[partes['vazios']] = np.nan
+    return valores
+
+def _descrever(serie, prefixo, arrays):
+    """Guarda a coluna em `arrays` e devolve a descrição dela para o .json"""
+    tipo = serie.dtype
+    if isinstance(tipo, pd.CategoricalDtype):
+        arrays[prefixo + 'codigos'] = serie.cat.codes.to_numpy()
+        categorias = _descrever(pd.Series(serie.cat.categories), prefixo + 'k', arrays)
+        return {'tipo': 'categorias', 'categorias': categorias, 'ordenada': bool(tipo.ordered)}
+    if isinstance(tipo, pd.Int64Dtype):
+        arrays[prefixo + 'valores'] = serie.to_numpy(dtype=np.int64, na_value=0)
+        arrays[prefixo + 'vazios'] = serie.isna().to_numpy()
+        return {'tipo': 'inteiros'}
+    if tipo == object or isinstance(tipo, pd.StringDtype):
+        for parte, array in _textos_para_arrays(serie.to_numpy(dtype=object)).items():
+            arrays[prefixo + parte] = array
+        return {'tipo': 'textos', 'dtype': str(tipo)}
+    if isinstance(tipo, np.dtype) and tipo.kind in 'biufmM':
+        arrays[prefixo + 'valores'] = serie.to_numpy()
+        return {'tipo': 'numeros'}
+    raise TipoNaoSuportado(f"tipo {tipo}")
+
+def _montar(descricao, prefixo, arquivo):
+    tipo = descricao['tipo']
+    if tipo == 'categorias':
+        categorias = _montar(descricao['categorias'], prefixo + 'k', arquivo)
+        return pd.Categorical.from_codes(arquivo[prefixo + 'codigos'], categories=categorias,
+                                         ordered=descricao['ordenada'])
+    if tipo == 'inteiros':
+        return pd.arrays.IntegerArray(arquivo[prefixo + 'valores'], arquivo[prefixo + 'vazios'])
+    if tipo == 'textos':
+        valores = _arrays_para_textos({parte: arquivo[prefixo + parte] for parte in ('utf8', 'tamanhos', 'vazios')})
+        return valores if descricao['dtype'] == 'object' else pd.array(valores, dtype=descricao['dtype'])
+    if tipo == 'numeros':
+        return arquivo[prefixo + 'valores']
+    raise ValueError(f"Tipo de coluna desconhecido no cache: {tipo}")
+
+def _gravar_npz(tabela, caminho):
+    """Grava a tabela em .npz e devolve a descrição das colunas"""
+    arrays = {}
+    colunas = []
+    for i, nome in enumerate(tabela.columns):
+        colunas.append(dict(_descrever(tabela[nome], f'c{i}_', arrays), nome=nome))
+    with open(caminho, 'wb') as f:
+        np.savez(f, **arrays)
+    return colunas
+
+def _ler_npz(caminho, colunas):
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        return pd.DataFrame({
+            descricao['nome']: _montar(descricao, f'c{i}_', arquivo)
+            for i, descricao in enumerate(colunas)
+        })
+
+def ler(caminho_csv, chave_atual):
+    """Devolve (dados, texto_busca) do cache, ou None se ele não corresponde ao CSV"""
+    caminho_dados, caminho_chave = caminhos(caminho_csv)
+    try:
+        with open(caminho_chave, 'r', encoding='utf-8') as f:
+            salva = json.load(f)
+        if not _confere(caminho_csv, chave_atual, salva):
+            return None
+
+        formato = salva.get('formato')
+        if formato == 'feather':
+            feather = _feather()
+            if feather is None:
+                return None
+            dados = feather.read_table(caminho_dados, memory_map=True).to_pandas()
+        elif formato == 'npz':
+            dados = _ler_npz(caminho_dados, salva['colunas'])
+        else:
+            return None  # Formato antigo (pickle) ou desconhecido: nunca é lido
+    except (OSError, ValueError, KeyError, EOFError):
+        return None
+    except Exception as e:
+        print(f"Cache ignorado: {e}")
+        return None
+
+    busca = dados.pop(COLUNA_BUSCA).astype(object)
+    return dados, busca
+
+def gravar(caminho_csv, chave_csv, dados, busca):
+    """Grava o cache correspondente ao CSV identificado por `chave_csv`.
+
+    Falhas não são fatais: o programa apenas volta a ler o CSV na próxima vez.
+    """
+    caminho_dados, caminho_chave = caminhos(caminho_csv)
+    try:
+        if chave(caminho_csv)['mtime'] != chave_csv['mtime']:
+            return  # O CSV mudou depois de lido; este conteúdo já não corresponde a ele
+    except OSError:
+        return
+
+    fd, temporario = tempfile.mkstemp(prefix=f".{caminho_dados.name}.", suffix='.tmp', dir=caminho_dados.parent)
+    os.close(fd)
+    temporario = Path(temporario)
+    tabela = dados.assign(**{COLUNA_BUSCA: busca})
+    try:
+        if chave_csv['sha256'] is None:
+            chave_csv['sha256'] = calcular_hash(caminho_csv)
+
+        extras = None
+        feather = _feather()
+        if feather is not None:
+            try:
+                feather.write_feather(tabela, temporario, compression='uncompressed')
+                extras = {'formato': 'feather'}
+            except Exception:
+                pass  # Ex.: coluna com tipos misturados; o .npz ainda pode aceitar
+        if extras is None:
+            extras = {'formato': 'npz', 'colunas': _gravar_npz(tabela, temporario)}
+
+        # A chave é removida antes de trocar os dados, para um cache pela metade nunca ser aceito
+        if caminho_chave.exists():
+            caminho_chave.unlink()
+        diario.copiar_permissoes(temporario, caminho_dados)
+        os.replace(temporario, caminho_dados)
+        with open(caminho_chave, 'w', encoding='utf-8') as f:
+            json.dump(dict(chave_csv, **extras), f)
+    except Exception as e:
+        print(f"Erro ao gravar cache: {e}")
+        if temporario.exists():
+            temporario.unlink()
@@ -0,0 +1,175 @@
+"""Linguagem de consulta da busca textual.
+
+Exemplos:
+
+    cadeira                             texto em qualquer coluna (como sempre foi)
+    local:sotao tipo:carro              campo:valor; condições lado a lado valem todas
+    nome:cad*                           começa com "cad" (*cad* = contém "cad")
+    "cadeira azul"                      frase exata; local:"sala 2" também vale
+    tipo:carro OR tipo:moto             OU; NOT nega; parênteses agrupam
+    atualizacao:01/01/2025..31/03/2025  intervalo de datas (um dos extremos pode faltar)
+    inventario:100..200                 intervalo de números
+
+Maiúsculas, minúsculas e acentos não fazem diferença nos campos e valores;
+os operadores AND, OR e NOT precisam estar em maiúsculas. Este módulo só
+faz a análise do texto: quem resolve os campos e avalia a árvore é o
+motor (BaseDados.compilar_consulta). O motor informa, por e_campo(nome),
+quais nomes são campos: uma palavra como 09:20, cujo começo não é campo,
+é procurada como trecho de texto, como antes da linguagem de consulta.
+"""
+import re
+from datetime import datetime
+
+OPERADORES = {'AND', 'OR', 'NOT'}
+_ESPECIAIS = set('"():*')
+
+# Apelidos dos campos (já sem acentos e em minúsculas) -> coluna do Dados.csv
+APELIDOS = {
+    'patrimonio': 'Número de inventário',
+    'inventario': 'Número de inventário',
+    'numero': 'Número de inventário',
+    'grupo': 'Grupo encarregado',
+    'local': 'Localização',
+    'atualizacao': 'Última atualização',
+    'data': 'Última atualização',
+}
+
+FORMATOS_DATA = ['%d/%m/%Y', '%Y-%m-%d', '%d/%m/%Y %H:%M']
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<abre>\() | (?P<fecha>\)) |
+    (?P<campo>[^\s()":]+):"(?P<valor>[^"]*)" |
+    "(?P<frase>[^"]*)" |
+    (?P<palavra>[^\s()"]+)
+)''', re.X)
+
+# Nós da árvore:
+#   ('e', [nós])   ('ou', [nós])   ('nao', nó)
+#   ('termo', campo ou None, modo, valor)    modo: 'igual', 'prefixo' ou 'contem'
+#   ('intervalo', campo, início, fim)        extremos em texto ('' = aberto)
+
+class ErroConsulta(ValueError):
+    """Consulta com sintaxe inválida"""
+
+def e_simples(texto, e_campo=None):
+    """Indica se o texto é uma busca comum (um trecho procurado na linha inteira)"""
+    especiais = _ESPECIAIS & set(texto)
+    if especiais == {':'} and e_campo is not None and not any(
+            separador and campo and e_campo(campo)
+            for campo, separador, _ in (palavra.partition(':') for palavra in texto.split())):
+        especiais = set()  # Só dois-pontos fora de campos, como em "25/03/2025 09:20"
+    return not especiais and not (OPERADORES & set(texto.split()))
+
+def tokenizar(texto, e_campo=None):
+    texto = texto.strip()
+    if texto.count('"') % 2:
+        raise ErroConsulta("Aspas sem fechamento")
+    tokens = []
+    posicao = 0
+    while posicao < len(texto):
+        m = _TOKEN.match(texto, posicao)
+        if not m:
+            raise ErroConsulta("Aspas sem fechamento")
+        posicao = m.end()
+        if m.group('abre'):
+            tokens.append(('(', None))
+        elif m.group('fecha'):
+            tokens.append((')', None))
+        elif m.group('campo') is not None:
+            tokens.append(('termo', termo_de_campo(m.group('campo'), m.group('valor'), frase=True)))
+        elif m.group('frase') is not None:
+            tokens.append(('termo', ('termo', None, 'contem', m.group('frase'))))
+        elif m.group('palavra') in OPERADORES:
+            tokens.append((m.group('palavra'), None))
+        else:
+            tokens.append(('termo', termo_de_palavra(m.group('palavra'), e_campo)))
+    return tokens
+
+def termo_de_palavra(palavra, e_campo=None):
+    campo, separador, valor = palavra.partition(':')
+    if separador and campo and (e_campo is None or e_campo(campo)):
+        return termo_de_campo(campo, valor)
+
+    valor = palavra.strip('*')
+    if not valor:
+        raise ErroConsulta(f"Termo vazio: {palavra}")
+    prefixo = palavra.endswith('*') and not palavra.startswith('*')  # *cad* = contém, como nos campos
+    return ('termo', None, 'prefixo' if prefixo else 'contem', valor)
+
+def termo_de_campo(campo, valor, frase=False):
+    if frase:
+        return ('termo', campo, 'igual', valor)
+    if not valor:
+        raise ErroConsulta(f"Falta o valor depois de {campo}:")
+    if '..' in valor:
+        inicio, _, fim = valor.partition('..')
+        return ('intervalo', campo, inicio, fim)
+
+    limpo = valor.strip('*')
+    if not limpo:
+        raise ErroConsulta(f"Falta o valor depois de {campo}:")
+    if valor.startswith('*'):
+        return ('termo', campo, 'contem', limpo)
+    return ('termo', campo, 'prefixo' if valor.endswith('*') else 'igual', limpo)
+
+def analisar(texto, e_campo=None):
+    """Converte o texto da consulta na árvore descrita acima"""
+    tokens = tokenizar(texto, e_campo)
+    if not tokens:
+        raise ErroConsulta("Consulta vazia")
+    posicao = [0]
+
+    def atual():
+        return tokens[posicao[0]][0] if posicao[0] < len(tokens) else None
+
+    def consumir():
+        token = tokens[posicao[0]]
+        posicao[0] += 1
+        return token
+
+    def ou():
+        filhos = [e()]
+        while atual() == 'OR':
+            consumir()
+            filhos.append(e())
+        return filhos[0] if len(filhos) == 1 else ('ou', filhos)
+
+    def e():
+        filhos = [nao()]
+        while atual() not in (None, ')', 'OR'):
+            if atual() == 'AND':
+                consumir()
+            filhos.append(nao())
+        return filhos[0] if len(filhos) == 1 else ('e', filhos)
+
+    def nao():
+        if atual() == 'NOT':
+            consumir()
+            return ('nao', nao())
+        return primario()
+
+    def primario():
+        tipo = atual()
+        if tipo == '(':
+            consumir()
+            no = ou()
+            if atual() != ')':
+                raise ErroConsulta("Parêntese sem fechamento")
+            consumir()
+            return no
+        if tipo == 'termo':
+            return consumir()[1]
+        raise ErroConsulta("Consulta incompleta" if tipo is None else f"{tipo} fora do lugar")
+
+    arvore = ou()
+    if atual() is not None:
+        raise ErroConsulta("Parêntese sem abertura")
+    return arvore
+
+def interpretar_data(texto):
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    raise ErroConsulta(f"Data inválida: {texto} (use DD/MM/AAAA)")
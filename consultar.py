@@ -0,0 +1,87 @@
+"""Consulta do inventário pela linha de comando, sem abrir a janela.
+
+Os resultados saem em fluxo na saída padrão, em CSV (mesmo formato do
+Dados.csv) ou JSON Lines, ou são gravados em PDF/Excel.
+
+Exemplos:
+    python consultar.py cadeira
+    python consultar.py --tipo Carro --local Casa --formato jsonl
+    python consultar.py sotão --pdf relatorio.pdf
+    python consultar.py cadeira --contagens
+"""
+import argparse
+import contextlib
+import sys
+from pathlib import Path
+
+import consulta
+import motor
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta de Patrimônio pela linha de comando")
+    parser.add_argument('termo', nargs='?', default='', help="texto a buscar em todas as colunas, ou consulta com campos (ex.: 'local:sotao tipo:carro')")
+    parser.add_argument('--aproximada', action='store_true',
+                        help="busca tolerante a erros de digitação (itens mais parecidos primeiro)")
+    parser.add_argument('--tipo', default='', help="filtra pelo Tipo")
+    parser.add_argument('--grupo', default='', help="filtra pelo Grupo encarregado")
+    parser.add_argument('--local', default='', help="filtra pela Localização")
+    parser.add_argument('--formato', choices=['csv', 'jsonl'], default='csv', help="formato da saída padrão")
+    parser.add_argument('--arquivo', default=Path(__file__).parent / 'Dados.csv', help="planilha a consultar")
+    parser.add_argument('--pdf', help="grava os resultados neste PDF em vez da saída padrão")
+    parser.add_argument('--excel', help="grava os resultados nesta planilha Excel em vez da saída padrão")
+    parser.add_argument('--memoria', action='store_true', help="mostra a memória ocupada pelos dados e sai")
+    parser.add_argument('--contagens', action='store_true',
+                        help="em vez dos itens, mostra quantos há por Tipo, Grupo e Localização (coluna;valor;itens)")
+    args = parser.parse_args()
+
+    base = motor.BaseDados(args.arquivo)
+    try:
+        # Mensagens da carga vão para a saída de erro, para não misturar com os resultados
+        with contextlib.redirect_stdout(sys.stderr):
+            base.carregar()
+    except Exception as e:
+        print(f"Erro ao carregar CSV: {e}", file=sys.stderr)
+        return 2
+
+    if args.memoria:
+        print(motor.relatorio_memoria(base.dados))
+        return 0
+
+    if args.contagens:
+        try:
+            for coluna in motor.COLUNAS_FILTRO:
+                for valor, quantidade in base.contar(coluna, args.termo, args.tipo, args.grupo, args.local).items():
+                    print(f"{coluna};{valor};{quantidade}")
+        except consulta.ErroConsulta as e:
+            print(f"Consulta inválida: {e}", file=sys.stderr)
+            return 2
+        return 0
+
+    try:
+        if args.aproximada:
+            posicoes, _ = base.posicoes_aproximadas(args.termo)
+            posicoes = posicoes[base.mascara_filtros(args.tipo, args.grupo, args.local)[posicoes]]
+            resultados = base.dados.iloc[posicoes]
+        else:
+            resultados = base.consultar(args.termo, args.tipo, args.grupo, args.local)
+    except consulta.ErroConsulta as e:
+        print(f"Consulta inválida: {e}", file=sys.stderr)
+        return 2
+
+    if args.pdf:
+        motor.gravar_pdf(resultados, args.pdf)
+    if args.excel:
+        motor.gravar_excel(resultados, args.excel)
+    if args.pdf or args.excel:
+        print(f"{len(resultados)} itens exportados.", file=sys.stderr)
+        return 0
+
+    try:
+        motor.escrever_em_fluxo(resultados, sys.stdout, args.formato)
+    except BrokenPipeError:
+        # Saída fechada antes do fim (ex.: "| head"); não é um erro
+        sys.stderr.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
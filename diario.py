@@ -0,0 +1,192 @@
+"""Diário de edições do Consultador de Patrimônio.
+
+Cada edição é acrescentada como uma linha JSON em um arquivo ao lado do
+Dados.csv (ex.: Dados.csv.diario). O CSV só é regravado na compactação,
+sempre de forma atômica (arquivo temporário + rename), e as entradas do
+diário são reaplicadas ao carregar os dados, o que recupera edições feitas
+antes de uma queda do programa.
+
+Vários programas abertos sobre o mesmo Dados.csv (pasta compartilhada)
+acrescentam ao mesmo diário. Gravar no diário e regravar o CSV acontecem
+sob uma trava (um arquivo .trava criado com O_EXCL ao lado do diário), e a
+compactação parte sempre do CSV em disco com o diário reaplicado, nunca
+dos dados em memória de um dos programas.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+SUFIXO_DIARIO = '.diario'
+SUFIXO_TRAVA = '.trava'
+ESPERA_TRAVA = 30  # Segundos esperando outro programa soltar a trava
+ESPERA_EDICAO = 0.5  # Na gravação de uma edição (thread da interface), uma tentativa curta
+TRAVA_VENCIDA = 120  # Trava não renovada há mais que isso é de um programa que caiu: é removida
+RENOVAR_TRAVA = 20  # Segundos entre as renovações da data da trava enquanto ela está em uso
+
+# Máscara de permissões do processo, para os arquivos novos gravados por temporário + rename
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def caminho_diario(caminho_csv):
+    """Caminho do diário correspondente a um CSV"""
+    caminho_csv = Path(caminho_csv)
+    return caminho_csv.with_name(caminho_csv.name + SUFIXO_DIARIO)
+
+@contextmanager
+def travar(caminho, espera=ESPERA_TRAVA):
+    """Trava o diário (e o CSV dele) para este programa enquanto o bloco roda.
+
+    Não é reentrante: dentro do bloco, use as funções que não travam.
+    Levanta TimeoutError se a trava não for solta em `espera` segundos.
+    Enquanto o bloco roda, uma thread renova a data do arquivo da trava, para
+    uma gravação longa (CSV grande, pasta de rede lenta) não ser tomada por
+    uma trava vencida.
+    """
+    trava = Path(str(caminho) + SUFIXO_TRAVA)
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            fd = os.open(trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(trava) > TRAVA_VENCIDA:
+                    os.remove(trava)
+                    continue
+            except FileNotFoundError:
+                continue  # Acabou de ser solta
+            if time.monotonic() > limite:
+                raise TimeoutError("Os dados estão sendo gravados; aguarde alguns segundos e tente de novo.") from None
+            time.sleep(0.05)
+    parar = threading.Event()
+    renovacao = threading.Thread(target=_renovar, args=(trava, parar), daemon=True)
+    try:
+        os.write(fd, f"{os.getpid()}\n".encode())
+        os.close(fd)
+        renovacao.start()
+        yield
+    finally:
+        parar.set()
+        if renovacao.is_alive():
+            renovacao.join()
+        os.remove(trava)
+
+def _renovar(trava, parar):
+    while not parar.wait(RENOVAR_TRAVA):
+        try:
+            os.utime(trava)
+        except OSError:
+            pass
+
+def registrar(caminho, inventario, campos, espera=ESPERA_EDICAO):
+    """Acrescenta uma edição ao diário e força a gravação em disco. Retorna os bytes gravados.
+
+    A trava é esperada só por `espera` segundos (TimeoutError depois disso):
+    quem chama está na thread da interface, que não pode ficar parada
+    enquanto uma compactação regrava o CSV.
+    """
+    entrada = {
+        "data": datetime.now().isoformat(timespec='seconds'),
+        "inventario": inventario,
+        "campos": campos,
+    }
+    linha = (json.dumps(entrada, ensure_ascii=False) + '\n').encode('utf-8')
+    with travar(caminho, espera), open(caminho, 'a+b') as f:
+        # Se uma gravação anterior foi interrompida, começa em uma nova linha
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                linha = b'\n' + linha
+        f.write(linha)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(linha)
+
+def ler_entradas(caminho, ate=None):
+    """Lê as entradas do diário (só os primeiros `ate` bytes, se informado), na ordem em que foram gravadas.
+
+    Uma última linha incompleta (queda no meio da gravação) é ignorada.
+    """
+    if not os.path.exists(caminho):
+        return []
+
+    entradas = []
+    with open(caminho, 'rb') as f:
+        conteudo = f.read() if ate is None else f.read(ate)
+    *completas, _ = conteudo.split(b'\n')  # O que vem depois da última quebra está incompleto
+    for linha in completas:
+        if not linha.strip():
+            continue
+        try:
+            entradas.append(json.loads(linha.decode('utf-8')))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            print(f"Entrada inválida ignorada no diário: {linha.decode('utf-8', 'replace').strip()}")
+    return entradas
+
+def tamanho(caminho):
+    """Tamanho atual do diário em bytes (0 se não existir)"""
+    try:
+        return os.path.getsize(caminho)
+    except OSError:
+        return 0
+
+def copiar_permissoes(temporario, caminho):
+    """Dá ao temporário as permissões do arquivo que ele vai substituir.
+
+    O mkstemp cria o temporário só para o dono (0600) e o os.replace mantém
+    isso: sem o ajuste, o Dados.csv compartilhado deixaria de ser lido pelos
+    outros usuários. Arquivo novo fica como um criado por open() (0666 menos
+    a umask).
+    """
+    try:
+        shutil.copymode(caminho, temporario)
+    except FileNotFoundError:
+        os.chmod(temporario, 0o666 & ~UMASK)
+
+def gravar_atomico(caminho, escrever, encoding):
+    """Grava um arquivo por meio de um temporário no mesmo diretório seguido de rename.
+
+    `escrever` recebe o arquivo temporário aberto e escreve o conteúdo nele.
+    """
+    caminho = Path(caminho)
+    fd, temporario = tempfile.mkstemp(prefix=f".{caminho.name}.", suffix='.tmp', dir=caminho.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='') as f:
+            escrever(f)
+            f.flush()
+            os.fsync(f.fileno())
+        copiar_permissoes(temporario, caminho)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+def salvar_csv_atomico(dados, caminho):
+    """Salva o DataFrame no formato do Dados.csv sem nunca deixar o arquivo pela metade"""
+    gravar_atomico(caminho, lambda f: dados.to_csv(f, sep=';', index=False), 'ISO-8859-1')
+
+def descartar_ate(caminho, posicao):
+    """Remove do diário as entradas já compactadas no CSV.
+
+    `posicao` é o tamanho do diário no momento em que a compactação começou;
+    entradas gravadas depois disso são preservadas. Deve ser chamada com o
+    diário travado (ver travar), senão uma edição acrescentada no meio se perde.
+    """
+    if not os.path.exists(caminho):
+        return
+
+    with open(caminho, 'rb') as f:
+        f.seek(posicao)
+        restante = f.read().decode('utf-8')
+
+    if restante:
+        gravar_atomico(caminho, lambda f: f.write(restante), 'utf-8')
+    else:
+        os.remove(caminho)
@@ -0,0 +1,121 @@
+"""Medição do tempo de cada operação do Consultador de Patrimônio.
+
+As operações do motor e da janela são envolvidas por `medir`, que registra
+a duração, quantas linhas foram processadas e quantos bytes foram lidos ou
+gravados. A última medição fica em `ultima` (a janela a mostra na barra de
+status) e as mais recentes em `historico`.
+
+Para investigar lentidão, a variável de ambiente CONSULTADOR_PERFIL ativa
+um perfil por operação, gravado na pasta CONSULTADOR_PERFIL_PASTA (padrão
+"perfis"):
+
+    CONSULTADOR_PERFIL=cprofile     um .prof por operação (abrir com pstats ou snakeviz)
+    CONSULTADOR_PERFIL=tracemalloc  um .txt com as linhas que mais alocaram memória
+
+Com o perfil ativo, cada medição também é impressa na saída de erro.
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PERFIL = os.environ.get('CONSULTADOR_PERFIL', '').lower()  # '', 'cprofile' ou 'tracemalloc'
+PASTA_PERFIL = Path(os.environ.get('CONSULTADOR_PERFIL_PASTA', 'perfis'))
+LINHAS_TRACEMALLOC = 30  # Linhas de código listadas no relatório de memória
+
+historico = deque(maxlen=200)
+ultima = None
+
+# O cProfile e o tracemalloc não aceitam duas medições ao mesmo tempo; uma
+# operação que começa enquanto outra está sendo perfilada só é cronometrada
+_trava_perfil = threading.Lock()
+
+class Medicao:
+    """Resultado de uma operação; linhas e bytes podem ser preenchidos dentro do bloco"""
+
+    def __init__(self, operacao, linhas=None, bytes=None):
+        self.operacao = operacao
+        self.linhas = linhas
+        self.bytes = bytes
+        self.segundos = None
+        self.erro = None  # Nome da exceção, se a operação falhou ou foi cancelada
+        self.momento = datetime.now()
+
+    def __str__(self):
+        partes = [f"{self.operacao}: {formatar_duracao(self.segundos)}"]
+        if self.linhas is not None:
+            partes.append(f"{self.linhas:,} linhas".replace(',', '.'))
+        if self.bytes is not None:
+            partes.append(formatar_bytes(self.bytes))
+        if self.erro:
+            partes.append(self.erro)
+        return ' · '.join(partes)
+
+def formatar_duracao(segundos):
+    return f"{segundos * 1000:.0f} ms" if segundos < 1 else f"{segundos:.2f} s"
+
+def formatar_bytes(quantidade):
+    for unidade in ('B', 'KB', 'MB'):
+        if quantidade < 1024:
+            return f"{quantidade:.0f} {unidade}" if unidade == 'B' else f"{quantidade:.1f} {unidade}"
+        quantidade /= 1024
+    return f"{quantidade:.1f} GB"
+
+@contextmanager
+def medir(operacao, linhas=None, bytes=None):
+    """Cronometra o bloco e registra a medição (também quando ele levanta exceção)"""
+    global ultima
+    medicao = Medicao(operacao, linhas, bytes)
+    perfilando = bool(PERFIL) and _trava_perfil.acquire(blocking=False)
+    perfil = _iniciar_perfil() if perfilando else None
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    except BaseException as e:
+        medicao.erro = type(e).__name__
+        raise
+    finally:
+        medicao.segundos = time.perf_counter() - inicio
+        if perfilando:
+            try:
+                _gravar_perfil(perfil, medicao)
+            except Exception as e:
+                print(f"Erro ao gravar perfil de {operacao}: {e}")
+            finally:
+                _trava_perfil.release()
+        historico.append(medicao)
+        ultima = medicao
+        if PERFIL:
+            print(f"⏱ {medicao}", file=sys.stderr)  # Fora da saída padrão, que o consultar.py usa para os dados
+
+def _iniciar_perfil():
+    if PERFIL == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start()
+        return None
+    import cProfile
+    perfil = cProfile.Profile()
+    perfil.enable()
+    return perfil
+
+def _gravar_perfil(perfil, medicao):
+    PASTA_PERFIL.mkdir(parents=True, exist_ok=True)
+    nome = PASTA_PERFIL / f"{medicao.momento:%Y%m%d_%H%M%S_%f}_{medicao.operacao}"
+
+    if PERFIL == 'tracemalloc':
+        import tracemalloc
+        atual, pico = tracemalloc.get_traced_memory()
+        estatisticas = tracemalloc.take_snapshot().statistics('lineno')
+        tracemalloc.stop()
+        with open(f"{nome}.txt", 'w', encoding='utf-8') as f:
+            f.write(f"{medicao}\nMemória alocada ao final: {formatar_bytes(atual)} | pico: {formatar_bytes(pico)}\n\n")
+            for estatistica in estatisticas[:LINHAS_TRACEMALLOC]:
+                f.write(f"{estatistica}\n")
+        return
+
+    perfil.disable()
+    perfil.dump_stats(f"{nome}.prof")
@@ -0,0 +1,324 @@
+"""Mede o desempenho do motor de consulta com planilhas sintéticas de vários tamanhos.
+
+Gera CSVs no formato do Dados.csv (separados por ';', em ISO-8859-1) com o
+número de linhas e de valores distintos pedidos, e cronometra, sem abrir a
+janela, as operações do programa:
+
+- carga (sem cache e com cache), busca, consulta com campos, busca aproximada;
+- filtros, edição seguida da gravação no CSV, backup (base e delta);
+- formatação das linhas da tabela de resultados;
+- exportação para PDF e Excel.
+
+Os tempos são gravados em JSON; com --comparar, a execução é comparada com
+um JSON anterior e o programa sai com código 1 se algo ficou mais lento que
+a tolerância.
+
+Uso:
+    python medir_desempenho.py [--linhas 10000 100000 1000000] [--saida desempenho.json]
+                               [--nomes 2000] [--tipos 40] [--grupos 25] [--locais 150]
+                               [--semente 0] [--comparar anterior.json] [--tolerancia 0.2]
+
+As quantidades de valores distintos (e a semente) vão para o JSON; a
+comparação avisa quando as duas execuções usaram planilhas diferentes.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import backup
+import cache_dados
+import motor
+import varredura
+
+COLUNAS = ['Nome', 'Número de inventário', 'Status', 'Fabricante', 'Grupo encarregado',
+           'Localização', 'Tipo', 'Modelo', 'Última atualização']
+
+NOMES = ['Cadeira', 'Mesa', 'Armário', 'Computador', 'Monitor', 'Impressora', 'Ventilador',
+         'Estante', 'Notebook', 'Projetor', 'Bebedouro', 'Balcão']
+COMPLEMENTOS = ['giratória', 'de escritório', 'com rodas', 'azul', 'preto', 'de reunião',
+                'portátil', 'de aço', 'de madeira', 'grande', 'pequeno', 'usado']
+LOCAIS = ['Sotão', 'Almoxarifado', 'Recepção', 'Escritório', 'Laboratório', 'Auditório',
+          'Depósito', 'Garagem', 'Cozinha', 'Sala de reunião']
+STATUS = ['Ativo', 'Inativo', 'Em manutenção', 'Baixado']
+FABRICANTES = ['Dell', 'HP', 'Lenovo', 'Positivo', 'Epson', 'Flexform', 'Tok&Stok', 'Cavaletti']
+
+TERMOS_BUSCA = ['cadeira', 'sotao', 'notebook dell', 'xyz inexistente']
+CONSULTAS = ['local:sotao* tipo:"Tipo 1"', 'nome:cad* NOT status:baixado',
+             'atualizacao:01/01/2024..30/06/2024']
+TERMOS_APROXIMADA = ['cadera', 'almoxarifdo', 'projetr epson']
+EDICOES = 20  # Edições feitas antes de cada gravação
+
+# --- GERADOR ---
+def _rotulos(base, quantidade):
+    """`quantidade` valores distintos, a partir das palavras de `base`"""
+    return [f"{base[i % len(base)]} {i // len(base) + 1}" if i >= len(base) else base[i] for i in range(quantidade)]
+
+def gerar_planilha(caminho, linhas, nomes=2000, tipos=40, grupos=25, locais=150, semente=0):
+    """Grava um CSV sintético no formato do Dados.csv e devolve o caminho"""
+    rng = np.random.default_rng(semente)
+
+    pool_nomes = np.array([
+        f"{NOMES[i % len(NOMES)]} {COMPLEMENTOS[(i // len(NOMES)) % len(COMPLEMENTOS)]}"
+        + (f" {i}" if i >= len(NOMES) * len(COMPLEMENTOS) else '')
+        for i in range(nomes)
+    ], dtype=object)
+    pool_tipos = np.array([f"Tipo {i + 1}" for i in range(tipos)], dtype=object)
+    pool_grupos = np.array([chr(ord('A') + i) if i < 26 else f"Grupo {i + 1}" for i in range(grupos)], dtype=object)
+    pool_locais = np.array(_rotulos(LOCAIS, locais), dtype=object)
+
+    # Distribuições desiguais, como nas planilhas reais (poucos valores muito comuns)
+    def sortear(pool):
+        pesos = 1 / np.arange(1, len(pool) + 1)
+        return pool[rng.choice(len(pool), size=linhas, p=pesos / pesos.sum())]
+
+    inicio = np.datetime64('2022-01-01T00:00')
+    minutos = rng.integers(0, 3 * 365 * 24 * 60, size=linhas)
+    datas = pd.Series(inicio + minutos.astype('timedelta64[m]')).dt.strftime('%d/%m/%Y %H:%M')
+
+    fabricantes = pd.Series(np.array(FABRICANTES, dtype=object)[rng.integers(0, len(FABRICANTES), size=linhas)])
+    modelos = pd.Series([f"M-{n}" for n in rng.integers(100, 999, size=linhas)], dtype=object)
+
+    dados = pd.DataFrame({
+        'Nome': sortear(pool_nomes),
+        'Número de inventário': np.arange(1, linhas + 1, dtype=float),  # Sai como "1.0", igual ao Dados.csv
+        'Status': np.array(STATUS, dtype=object)[rng.choice(len(STATUS), size=linhas, p=[0.85, 0.08, 0.04, 0.03])],
+        'Fabricante': fabricantes.where(rng.random(linhas) < 0.6),
+        'Grupo encarregado': sortear(pool_grupos),
+        'Localização': sortear(pool_locais),
+        'Tipo': sortear(pool_tipos),
+        'Modelo': modelos.where(rng.random(linhas) < 0.4),
+        'Última atualização': datas,
+    }, columns=COLUNAS)
+    dados.to_csv(caminho, sep=';', index=False, encoding='ISO-8859-1')
+    return Path(caminho)
+
+# --- MEDIÇÃO ---
+def cronometrar(funcao, repeticoes, preparar=None):
+    """Executa funcao() `repeticoes` vezes e devolve o menor e o tempo mediano, em segundos"""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {'minimo': round(min(tempos), 6), 'mediana': round(statistics.median(tempos), 6)}
+
+def _sem_cache(caminho):
+    for arquivo in cache_dados.caminhos(caminho):
+        if arquivo.exists():
+            arquivo.unlink()
+
+def medir_tamanho(pasta, linhas, repeticoes, max_exportacao, cardinalidades=None):
+    """Gera uma planilha com `linhas` linhas e mede todas as operações sobre ela.
+
+    `cardinalidades` são os argumentos nomes, tipos, grupos, locais e semente
+    de gerar_planilha (os que faltarem ficam com o padrão).
+    """
+    caminho = gerar_planilha(pasta / f"Dados_{linhas}.csv", linhas, **(cardinalidades or {}))
+    pasta_backup = pasta / f"backups_{linhas}"
+    tempos = {'bytes_csv': caminho.stat().st_size}
+
+    def carregar():
+        base = motor.BaseDados(caminho, pasta_backup)
+        base.carregar()
+        return base
+
+    tempos['carga_sem_cache'] = cronometrar(carregar, repeticoes, preparar=lambda: _sem_cache(caminho))
+    carregar()  # Garante o cache para a próxima medição
+    tempos['carga_com_cache'] = cronometrar(carregar, repeticoes)
+    base = carregar()
+
+    # O cache de termos é esvaziado antes de cada repetição: mede sempre a varredura
+    for termo in TERMOS_BUSCA:
+        tempos[f"busca[{termo}]"] = cronometrar(lambda: base.mascara_busca(termo), repeticoes, base.invalidar_buscas)
+    # Busca simples e paralela lado a lado (a paralela só com mais de um processo; ver varredura.py)
+    tempos['processos'] = varredura.PROCESSOS
+    for termo in TERMOS_BUSCA:
+        teste = lambda textos: textos.str.contains(motor.normalizar_texto(termo), regex=False)
+        tempos[f"busca_simples[{termo}]"] = cronometrar(lambda: base.percorrer(base.busca, None, teste), repeticoes)
+        if varredura.PROCESSOS > 1:
+            base.varredura_paralela(termo)  # Copia o texto para a memória compartilhada e sobe o pool
+            tempos[f"busca_paralela[{termo}]"] = cronometrar(
+                lambda: base.varredura_paralela(motor.normalizar_texto(termo)), repeticoes
+            )
+    base.invalidar_buscas()
+    tempos['consulta_indices_frios'] = cronometrar(lambda: base.mascara_busca(CONSULTAS[0]), 1)
+    for texto in CONSULTAS:  # Já com os índices da consulta montados
+        tempos[f"consulta[{texto}]"] = cronometrar(lambda: base.posicoes_busca(texto), repeticoes)
+    base.invalidar_buscas()
+    tempos['aproximada_indice_frio'] = cronometrar(lambda: base.posicoes_aproximadas(TERMOS_APROXIMADA[0]), 1)
+    for termo in TERMOS_APROXIMADA:
+        tempos[f"aproximada[{termo}]"] = cronometrar(lambda: base.posicoes_aproximadas(termo), repeticoes)
+    # Primeira busca depois de editar uma linha: os índices são atualizados, não refeitos
+    primeiro = base.dados.index[0]
+    editar_um = lambda: base.editar(primeiro, motor.formatar_inventario(base.dados.at[primeiro, 'Número de inventário']),
+                                    {'Nome': f"Item editado {time.perf_counter()}"})
+    tempos['aproximada_apos_edicao'] = cronometrar(lambda: base.posicoes_aproximadas(TERMOS_APROXIMADA[0]),
+                                                   repeticoes, editar_um)
+    tempos['consulta_apos_edicao'] = cronometrar(lambda: base.posicoes_busca(CONSULTAS[1]), repeticoes, editar_um)
+
+    tipo = base.facetas.distintos('Tipo')[0]
+    local = base.facetas.distintos('Localização')[0]
+    tempos['filtro[tipo]'] = cronometrar(lambda: base.filtrar(tipo), repeticoes)
+    tempos['filtro[tipo+local]'] = cronometrar(lambda: base.filtrar(tipo, '', local), repeticoes)
+    tempos['contagens_facetas'] = cronometrar(
+        lambda: [base.facetas.contagens(coluna, {'Tipo': tipo}) for coluna in motor.COLUNAS_FILTRO], repeticoes
+    )
+
+    tempos['resumo_tabela'] = cronometrar(lambda: base.resumo.tabela(), repeticoes)
+    tempos['resumo_desatualizados'] = cronometrar(lambda: base.resumo.desatualizados(12), repeticoes)
+
+    # Formatação da primeira página da tabela e de todas as linhas de um resultado grande
+    resultados = base.filtrar(tipo)
+    tempos['linhas_resultado'] = len(resultados)
+    tempos['renderizar_pagina'] = cronometrar(lambda: formatar_linhas(resultados.iloc[:200]), repeticoes)
+    tempos['renderizar_tudo'] = cronometrar(lambda: formatar_linhas(resultados), 1)
+
+    rotulos = base.dados.index[np.linspace(0, len(base.dados) - 1, EDICOES).astype(int)]
+    inventarios = [motor.formatar_inventario(base.dados.at[r, 'Número de inventário']) for r in rotulos]
+    contador = iter(range(1_000_000))
+
+    def editar_e_gravar():
+        rodada = next(contador)
+        for rotulo, inventario in zip(rotulos, inventarios):
+            base.editar(rotulo, inventario, {'Nome': f"Item editado {rodada}"})
+        base.compactar()
+    tempos['editar_e_gravar'] = cronometrar(editar_e_gravar, repeticoes)
+
+    # Pasta própria e horários fixos: nenhum dos dois backups é pulado como repetido
+    pasta_nova = pasta / f"backups_medicao_{linhas}"
+    agora = datetime.now()
+    tempos['backup_base'] = cronometrar(lambda: backup.registrar(caminho, pasta_nova, agora), 1)
+    base.editar(rotulos[0], inventarios[0], {'Nome': "Item para o delta"})
+    base.compactar()
+    tempos['backup_delta'] = cronometrar(
+        lambda: backup.registrar(caminho, pasta_nova, agora + timedelta(seconds=1)), 1
+    )
+
+    exportar = resultados.iloc[:max_exportacao]
+    tempos['linhas_exportadas'] = len(exportar)
+    for nome, gravar, extensao in (('exportar_pdf', motor.gravar_pdf, '.pdf'),
+                                   ('exportar_excel', motor.gravar_excel, '.xlsx'),
+                                   ('exportar_csv', motor.gravar_texto, '.csv')):
+        destino = pasta / f"exportacao_{linhas}{extensao}"
+        try:
+            tempos[nome] = cronometrar(lambda: gravar(exportar, destino), 1)
+        except ImportError as e:
+            tempos[nome] = {'ignorado': f"biblioteca ausente: {e.name}"}
+    return tempos
+
+def formatar_linhas(resultados):
+    """O mesmo trabalho que carregar_proxima_pagina faz antes de inserir na tabela"""
+    colunas = [motor.valores_para_exibicao(resultados, coluna) for coluna in motor.COLUNAS_RELATORIO]
+    return list(zip(*colunas))
+
+def versao():
+    """Commit atual do repositório, se houver"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- COMPARAÇÃO ---
+def comparar(atual, anterior, tolerancia):
+    """Mostra a variação de cada tempo em relação à execução anterior.
+
+    Retorna as operações que ficaram mais lentas que a tolerância.
+    """
+    piores = []
+    if atual.get('cardinalidades') != anterior.get('cardinalidades'):
+        print(f"Atenção: planilhas geradas com valores distintos diferentes "
+              f"(antes: {anterior.get('cardinalidades')}, agora: {atual.get('cardinalidades')})")
+    for linhas, tempos in atual['tamanhos'].items():
+        antes = anterior.get('tamanhos', {}).get(linhas, {})
+        print(f"\n{linhas} linhas (antes: {anterior.get('versao')}, agora: {atual.get('versao')})")
+        for operacao, valor in tempos.items():
+            if not isinstance(valor, dict) or 'minimo' not in valor or 'minimo' not in antes.get(operacao, {}):
+                continue
+            velho, novo = antes[operacao]['minimo'], valor['minimo']
+            razao = novo / velho if velho else float('inf')
+            marca = ''
+            if razao > 1 + tolerancia and novo - velho > 0.005:  # Ignora ruído de poucos milissegundos
+                marca = '  MAIS LENTO'
+                piores.append((linhas, operacao, razao))
+            print(f"  {operacao:<45} {velho:9.4f} s -> {novo:9.4f} s  ({razao:5.2f}x){marca}")
+    return piores
+
+def main():
+    parser = argparse.ArgumentParser(description="Desempenho do Consultador de Patrimônio")
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10000, 100000],
+                        help="tamanhos das planilhas geradas (ex.: 10000 100000 1000000)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="repetições de cada medição")
+    parser.add_argument('--max-exportacao', type=int, default=20000, help="linhas exportadas para PDF/Excel")
+    parser.add_argument('--saida', default='desempenho.json', help="arquivo JSON com os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior, para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="piora aceitável na comparação (0.2 = 20%%)")
+    parser.add_argument('--pasta', help="onde gerar as planilhas (padrão: pasta temporária, apagada no fim)")
+    parser.add_argument('--nomes', type=int, default=2000, help="nomes distintos na planilha gerada")
+    parser.add_argument('--tipos', type=int, default=40, help="tipos distintos")
+    parser.add_argument('--grupos', type=int, default=25, help="grupos encarregados distintos")
+    parser.add_argument('--locais', type=int, default=150, help="localizações distintas")
+    parser.add_argument('--semente', type=int, default=0, help="semente do gerador de valores aleatórios")
+    args = parser.parse_args()
+    cardinalidades = {'nomes': args.nomes, 'tipos': args.tipos, 'grupos': args.grupos,
+                      'locais': args.locais, 'semente': args.semente}
+
+    resultado = {
+        'versao': versao(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'cardinalidades': cardinalidades,
+        'tamanhos': {},
+    }
+
+    pasta = Path(args.pasta or tempfile.mkdtemp(prefix='desempenho_'))
+    pasta.mkdir(parents=True, exist_ok=True)
+    try:
+        for linhas in args.linhas:
+            print(f"Medindo {linhas} linhas...", file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):  # Mensagens de carga e backup do motor
+                resultado['tamanhos'][str(linhas)] = medir_tamanho(pasta, linhas, args.repeticoes,
+                                                                   args.max_exportacao, cardinalidades)
+    finally:
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+    for linhas, tempos in resultado['tamanhos'].items():
+        print(f"\n{linhas} linhas")
+        for operacao, valor in tempos.items():
+            if isinstance(valor, dict) and 'minimo' in valor:
+                print(f"  {operacao:<45} {valor['minimo']:9.4f} s (mediana {valor['mediana']:.4f} s)")
+            else:
+                print(f"  {operacao:<45} {valor}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            piores = comparar(resultado, json.load(f), args.tolerancia)
+        if piores:
+            print(f"\n{len(piores)} operações ficaram mais lentas que a tolerância de {args.tolerancia:.0%}.")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Mede o tempo de inicialização do Consultador de Patrimônio e confere o orçamento.
+
+Executa o Main.py com `python -X importtime`, em modo de medição (o programa
+fecha sozinho após a primeira carga da planilha), e mostra:
+
+- o tempo até a janela aparecer e até os dados estarem carregados;
+- os módulos importados na inicialização que mais pesam.
+
+Sai com código 1 se algum tempo passar do orçamento. Precisa de uma tela
+(a janela chega a ser aberta).
+
+Uso:
+    python medir_inicializacao.py [--janela 1.5] [--dados 3.0] [--modulos 15]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ORCAMENTO_JANELA = 1.5  # segundos até a janela principal aparecer
+ORCAMENTO_DADOS = 3.0  # segundos até a planilha estar carregada
+
+# Módulos que não devem ser carregados na inicialização, só ao exportar
+IMPORTACOES_ADIADAS = ['reportlab', 'openpyxl']
+
+_LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+_LINHA_TEMPO = re.compile(r'Inicialização \((\w+)\): ([\d.]+) s')
+
+def medir():
+    """Executa o programa uma vez.
+
+    Retorna os tempos por etapa, o tempo das importações de primeiro nível,
+    o conjunto de todos os módulos importados e o processo concluído.
+    """
+    ambiente = dict(os.environ, CONSULTADOR_MEDIR_INICIALIZACAO='1', PYTHONIOENCODING='utf-8')
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'Main.py'],
+        cwd=Path(__file__).parent,
+        env=ambiente,
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+    )
+
+    tempos = {etapa: float(valor) for etapa, valor in _LINHA_TEMPO.findall(processo.stdout)}
+
+    importacoes = {}
+    modulos = set()
+    for linha in processo.stderr.splitlines():
+        m = _LINHA_IMPORTTIME.match(linha)
+        if not m:
+            continue
+        modulos.add(m.group(4))
+        if len(m.group(3)) == 1:  # Módulos importados diretamente pelo programa
+            importacoes[m.group(4)] = int(m.group(2)) / 1e6
+    return tempos, importacoes, modulos, processo
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de inicialização do Consultador de Patrimônio")
+    parser.add_argument('--janela', type=float, default=ORCAMENTO_JANELA, help="orçamento até a janela (s)")
+    parser.add_argument('--dados', type=float, default=ORCAMENTO_DADOS, help="orçamento até os dados (s)")
+    parser.add_argument('--modulos', type=int, default=15, help="quantos módulos mais lentos listar")
+    args = parser.parse_args()
+
+    tempos, importacoes, modulos, processo = medir()
+    if 'dados' not in tempos:
+        print("O programa não informou os tempos de inicialização. Saída de erro:")
+        print(processo.stderr[-2000:])
+        return 2
+
+    print(f"Importações mais lentas (total {sum(importacoes.values()):.3f} s):")
+    for nome, segundos in sorted(importacoes.items(), key=lambda i: -i[1])[:args.modulos]:
+        print(f"  {segundos:8.3f} s  {nome}")
+
+    falhou = False
+    for etapa, orcamento in (('janela', args.janela), ('dados', args.dados)):
+        tempo = tempos.get(etapa, float('inf'))
+        situacao = "ok" if tempo <= orcamento else "ACIMA DO ORÇAMENTO"
+        falhou |= tempo > orcamento
+        print(f"{etapa:>6}: {tempo:.3f} s (orçamento {orcamento:.3f} s) {situacao}")
+
+    adiadas = sorted({nome.split('.')[0] for nome in modulos} & set(IMPORTACOES_ADIADAS))
+    if adiadas:
+        falhou = True
+        print(f"Importados na inicialização, mas deveriam ser adiados: {', '.join(adiadas)}")
+
+    return 1 if falhou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1722 @@
+"""Motor de consulta do Consultador de Patrimônio, sem dependência de interface.
+
+Reúne a leitura do Dados.csv (com cache e diário de edições), os índices de
+busca e as exportações. Pode ser usado tanto pela janela (Main.py) quanto
+por scripts e pela linha de comando (consultar.py).
+"""
+import heapq
+import os
+import re
+import tempfile
+import textwrap
+import time
+import unicodedata
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import backup
+import banco
+import cache_dados
+import consulta
+import diario
+import medicoes
+import varredura
+
+COLUNAS_FILTRO = ['Tipo', 'Grupo encarregado', 'Localização']
+# Colunas com poucos valores distintos, guardadas como categóricas
+COLUNAS_CATEGORICAS = ['Tipo', 'Grupo encarregado', 'Localização', 'Status', 'Fabricante']
+COLUNAS_DATA = ['Última atualização']  # Aceitam intervalos de datas na consulta
+FORMATO_DATA = '%d/%m/%Y %H:%M'
+ENCODING_CSV = 'ISO-8859-1'  # Codificação do Dados.csv
+COLUNA_ATUALIZACAO = 'Última atualização'  # Carimbada pelas edições em lote
+COLUNAS_RESUMO = ['Localização', 'Grupo encarregado', 'Tipo', 'Status']  # Dimensões do painel de resumo
+SEM_VALOR = '(vazio)'  # Como os itens sem valor aparecem no resumo
+COLUNAS_RELATORIO = ['Número de inventário', 'Nome', 'Tipo', 'Grupo encarregado', 'Localização']
+TAMANHO_LOTE = 10000  # Linhas por bloco ao escrever resultados em fluxo
+LOTE_EXPORTACAO = 2000  # Linhas por bloco nas exportações para arquivo (granularidade do cancelamento)
+INTERVALO_PROGRESSO = 500  # Linhas entre avisos de progresso (e checagens de cancelamento)
+BLOCO_BUSCA = 50000  # Linhas examinadas por vez na busca (granularidade do cancelamento)
+TAMANHO_CACHE_BUSCAS = 64  # Termos recentes cujos resultados ficam guardados
+# Busca aproximada (tolerante a erros de digitação)
+COLUNAS_APROXIMADA = ['Nome', 'Modelo', 'Fabricante', 'Localização']
+LIMITE_APROXIMADA = 100  # Quantos itens mais parecidos mostrar
+NOTA_MINIMA = 0.3  # Semelhança mínima (0 a 1) entre a palavra digitada e a do item
+PALAVRAS_SEMELHANTES = 20  # Palavras do índice consideradas para cada palavra digitada
+# Acima desta fração de linhas alteradas no arquivo, a recarga refaz tudo em vez de aplicar as diferenças
+LIMITE_ATUALIZACAO = 0.2
+# Importação de planilhas
+LOTE_IMPORTACAO = 50000  # Linhas da planilha importada lidas por vez (limita a memória usada)
+EXTENSOES_EXCEL = ('.xlsx', '.xlsm')
+# No SQLite cada edição sobrescreve o banco: backup antes dela, no máximo um a cada tantos segundos
+INTERVALO_BACKUP_EDICAO = 300
+
+# Estado derivado de uma leitura do CSV; trocado de uma só vez em BaseDados.aplicar
+Snapshot = namedtuple('Snapshot', ['dados', 'busca', 'inventarios', 'facetas', 'resumo', 'modificacao'])
+# Só as linhas que mudaram no arquivo (rótulo = posição), aplicadas em BaseDados.aplicar_atualizacao
+Atualizacao = namedtuple('Atualizacao', ['linhas', 'busca', 'geracao', 'modificacao'])
+
+def formatar_inventario(valor):
+    """Formata o número de inventário corretamente, removendo .0 se existir"""
+    try:
+        if pd.isna(valor):
+            return 'Não encontrado'
+        if isinstance(valor, (int, float)):
+            # Remove .0 de números inteiros
+            return str(int(valor)) if valor == int(valor) else str(valor)
+        # Se for string, tenta converter para número primeiro
+        try:
+            num = float(valor)
+            return str(int(num)) if num == int(num) else str(num)
+        except ValueError:
+            return str(valor)
+    except:
+        return 'Inválido'
+
+def codificavel(valor):
+    """Indica se o valor pode ser gravado no Dados.csv (ISO-8859-1)"""
+    try:
+        str(valor).encode(ENCODING_CSV)
+    except UnicodeEncodeError:
+        return False
+    return True
+
+def validar_codificacao(campos):
+    """Levanta ValueError se algum valor tem caracteres que o Dados.csv não aceita (ex.: '€', '–')"""
+    for coluna, valor in campos.items():
+        if isinstance(valor, str) and not codificavel(valor):
+            invalidos = ' '.join(dict.fromkeys(c for c in valor if not codificavel(c)))
+            raise ValueError(f"{coluna}: caracteres que não podem ser gravados no Dados.csv: {invalidos}")
+
+def valores_para_exibicao(dados, coluna):
+    """Valores de uma coluna prontos para exibição, com 'Não encontrado' nos vazios"""
+    if coluna not in dados.columns:
+        return ['Não encontrado'] * len(dados)
+    if coluna == 'Número de inventário':
+        return [formatar_inventario(v) for v in dados[coluna]]
+    valores = dados[coluna].astype(object)
+    return valores.where(valores.notna(), 'Não encontrado').tolist()
+
+# --- ÍNDICE DE BUSCA ---
+def normalizar_texto(valor):
+    """Converte para minúsculas e remove acentos (ex.: 'Sotão' -> 'sotao')"""
+    texto = unicodedata.normalize('NFKD', str(valor))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+def atende(texto, modo, valor):
+    """Compara um texto já normalizado com o valor de um termo da consulta"""
+    if modo == 'igual':
+        return texto == valor
+    if modo == 'prefixo':
+        return texto.startswith(valor)
+    return valor in texto
+
+def construir_indice_busca(dados):
+    """Monta, uma única vez por carga, o texto pesquisável de cada linha.
+
+    Todas as colunas são concatenadas e normalizadas, de modo que cada busca
+    se resume a um único str.contains vetorizado sobre esta coluna.
+    """
+    if dados.empty:
+        return pd.Series('', index=dados.index, dtype=object)
+
+    partes = []
+    for coluna in dados.columns:
+        if coluna == 'Número de inventário':
+            valores = dados[coluna].map(lambda v: '' if pd.isna(v) else formatar_inventario(v))
+        else:
+            valores = dados[coluna].astype(object).where(dados[coluna].notna(), '').astype(str)
+        partes.append(valores)
+
+    texto = partes[0].str.cat(partes[1:], sep=' | ')
+    return texto.map(normalizar_texto).astype(object)
+
+def textos_normalizados(serie):
+    """Texto normalizado de cada valor da coluna, por posição, como construir_indice_busca.
+
+    Cada valor distinto é normalizado uma única vez.
+    """
+    codigos, valores = pd.factorize(serie)
+    formatar = formatar_inventario if serie.name == 'Número de inventário' else str
+    normalizados = np.array([normalizar_texto(formatar(valor)) for valor in valores] + [''], dtype=object)
+    return pd.Series(normalizados[codigos], dtype=object)  # Código -1 (vazio) pega o '' do fim
+
+def agrupar_posicoes(textos):
+    """Dicionário valor -> posições (ordenadas) em que ele aparece"""
+    codigos, valores = pd.factorize(textos)
+    ordem = np.argsort(codigos, kind='stable')
+    limites = np.cumsum(np.bincount(codigos, minlength=len(valores)))[:-1]
+    return dict(zip(valores, np.split(ordem, limites)))
+
+# --- RESUMO ---
+class ResumoInventario:
+    """Contagens de itens por Localização × Grupo × Tipo × Status e data de atualização de cada item.
+
+    Montado junto com os dados e mantido a cada edição (só as linhas alteradas
+    mudam as contagens), para que o painel de resumo e suas exportações não
+    precisem percorrer o inventário.
+    """
+
+    def __init__(self, dados):
+        self.colunas = [coluna for coluna in COLUNAS_RESUMO if coluna in dados.columns]
+        self.contagens = {}  # (local, grupo, tipo, status) -> quantos itens
+        self._somar(dados, 1)
+        if COLUNA_ATUALIZACAO in dados.columns:
+            self.datas = self._datas(dados[COLUNA_ATUALIZACAO])
+        else:
+            self.datas = np.full(len(dados), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    @staticmethod
+    def _datas(valores):
+        return pd.to_datetime(pd.Series(valores, dtype=object), format=FORMATO_DATA, errors='coerce') \
+            .to_numpy(dtype='datetime64[ns]')
+
+    def _somar(self, linhas, sinal):
+        if not len(linhas) or not self.colunas:
+            return
+        chaves = pd.DataFrame({
+            coluna: linhas[coluna].astype(object).where(linhas[coluna].notna(), SEM_VALOR).astype(str)
+            for coluna in self.colunas
+        })
+        for chave, quantidade in chaves.value_counts(sort=False).items():
+            chave = chave if isinstance(chave, tuple) else (chave,)
+            total = self.contagens.get(chave, 0) + sinal * int(quantidade)
+            if total:
+                self.contagens[chave] = total
+            else:
+                self.contagens.pop(chave, None)
+
+    def atualizar(self, posicoes, antes, depois):
+        """Troca as linhas `antes` pelas `depois` (mesmas posições) nas contagens e nas datas"""
+        self._somar(antes, -1)
+        self._somar(depois, 1)
+        if COLUNA_ATUALIZACAO in depois.columns:
+            self.datas[posicoes] = self._datas(depois[COLUNA_ATUALIZACAO])
+
+    def tabela(self, colunas=None):
+        """Quantidade de itens por combinação das colunas pedidas (padrão: todas), da maior para a menor"""
+        colunas = self.colunas if colunas is None else [coluna for coluna in colunas if coluna in self.colunas]
+        if not self.contagens:
+            return pd.DataFrame(columns=colunas + ['Itens'])
+        tabela = pd.DataFrame(list(self.contagens), columns=self.colunas)
+        tabela['Itens'] = list(self.contagens.values())
+        if colunas:
+            tabela = tabela.groupby(colunas, sort=False)['Itens'].sum().reset_index()
+        else:
+            tabela = pd.DataFrame({'Itens': [tabela['Itens'].sum()]})
+        return tabela.sort_values(['Itens', *colunas], ascending=[False] + [True] * len(colunas), ignore_index=True)
+
+    def desatualizados(self, meses, agora=None):
+        """Posições dos itens sem atualização há `meses` meses (ou sem data), dos mais antigos aos sem data"""
+        limite = pd.Timestamp(agora or datetime.now()) - pd.DateOffset(months=meses)
+        posicoes = np.flatnonzero(~(self.datas >= limite.to_datetime64()))  # NaT também entra
+        return posicoes[np.argsort(self.datas[posicoes], kind='stable')]
+
+# --- CARREGAR DADOS ---
+class IndiceFacetas:
+    """Posições das linhas de cada valor das colunas de filtro.
+
+    Para cada coluna guarda o código do valor de cada linha (-1 = vazio) e,
+    para cada valor, o array ordenado das posições das linhas que o têm.
+    Uma combinação de filtros é resolvida intersectando esses arrays, e as
+    contagens por valor saem de um bincount dos códigos.
+    """
+
+    def __init__(self, dados, colunas=COLUNAS_FILTRO):
+        self.colunas = [coluna for coluna in colunas if coluna in dados.columns]
+        self.codigos = {}  # coluna -> código do valor de cada linha
+        self.valores = {}  # coluna -> lista de valores (o código é a posição na lista)
+        self.posicoes = {}  # coluna -> {valor: posições ordenadas das linhas}
+
+        for coluna in self.colunas:
+            serie = dados[coluna]
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                serie = serie.astype('category')
+            codigos = serie.cat.codes.to_numpy().astype(np.int64)
+            valores = list(serie.cat.categories)
+
+            ordem = np.argsort(codigos, kind='stable')
+            contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+            limites = np.cumsum(contagens) + int((codigos < 0).sum())
+            grupos = np.split(ordem, limites[:-1] if len(limites) else [])
+            if len(valores):
+                grupos[0] = grupos[0][codigos[grupos[0]] >= 0]  # Descarta os vazios do início
+
+            self.codigos[coluna] = codigos
+            self.valores[coluna] = valores
+            self.posicoes[coluna] = {valor: grupo for valor, grupo in zip(valores, grupos)}
+
+    def __len__(self):
+        return len(next(iter(self.codigos.values()), []))
+
+    def distintos(self, coluna):
+        """Valores presentes na coluna, em ordem alfabética"""
+        return sorted((v for v, p in self.posicoes.get(coluna, {}).items() if len(p)), key=str)
+
+    def posicoes_filtro(self, selecao):
+        """Posições (ordenadas) das linhas que atendem a todos os filtros de `selecao`.
+
+        `selecao` é um dicionário coluna -> valor; valores vazios são ignorados.
+        Retorna None quando nenhum filtro foi escolhido (todas as linhas).
+        """
+        escolhidos = [
+            self.posicoes.get(coluna, {}).get(valor, np.empty(0, dtype=np.int64))
+            for coluna, valor in selecao.items() if valor
+        ]
+        if not escolhidos:
+            return None
+
+        escolhidos.sort(key=len)  # Começa pelo menor conjunto
+        resultado = escolhidos[0]
+        for posicoes in escolhidos[1:]:
+            if not len(resultado):
+                break
+            resultado = np.intersect1d(resultado, posicoes, assume_unique=True)
+        return resultado
+
+    def contagens(self, coluna, selecao, dentre=None):
+        """Quantas linhas têm cada valor da coluna, considerando os filtros das outras colunas.
+
+        `dentre` (posições ordenadas, ex.: as encontradas pela busca textual)
+        limita a contagem a essas linhas.
+        """
+        outras = {c: v for c, v in selecao.items() if c != coluna}
+        posicoes = self.posicoes_filtro(outras)
+        if dentre is not None:
+            posicoes = dentre if posicoes is None else np.intersect1d(posicoes, dentre, assume_unique=True)
+        codigos = self.codigos.get(coluna, np.empty(0, dtype=np.int64))
+        if posicoes is not None:
+            codigos = codigos[posicoes]
+
+        valores = self.valores.get(coluna, [])
+        totais = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+        return {valor: int(n) for valor, n in sorted(zip(valores, totais), key=lambda i: str(i[0])) if n}
+
+    def atualizar_linha(self, posicao, coluna, valor):
+        """Move a linha `posicao` para o valor novo da coluna, sem reconstruir o índice"""
+        if coluna not in self.codigos:
+            return
+        codigos, valores, posicoes = self.codigos[coluna], self.valores[coluna], self.posicoes[coluna]
+
+        antigo = codigos[posicao]
+        if antigo >= 0:
+            lista = posicoes[valores[antigo]]
+            posicoes[valores[antigo]] = np.delete(lista, np.searchsorted(lista, posicao))
+
+        if pd.isna(valor):
+            codigos[posicao] = -1
+            return
+        if valor not in posicoes:
+            valores.append(valor)
+            posicoes[valor] = np.empty(0, dtype=np.int64)
+        codigos[posicao] = valores.index(valor)
+        lista = posicoes[valor]
+        posicoes[valor] = np.insert(lista, np.searchsorted(lista, posicao), posicao)
+
+    def atualizar_linhas(self, alteradas, coluna, valor):
+        """Move várias linhas (posições ordenadas) para o mesmo valor novo da coluna"""
+        if coluna not in self.codigos:
+            return
+        codigos, valores, posicoes = self.codigos[coluna], self.valores[coluna], self.posicoes[coluna]
+
+        for antigo in np.unique(codigos[alteradas]):
+            if antigo >= 0:
+                lista = posicoes[valores[antigo]]
+                posicoes[valores[antigo]] = np.setdiff1d(lista, alteradas, assume_unique=True)
+
+        if pd.isna(valor):
+            codigos[alteradas] = -1
+            return
+        if valor not in posicoes:
+            valores.append(valor)
+            posicoes[valor] = np.empty(0, dtype=np.int64)
+        codigos[alteradas] = valores.index(valor)
+        posicoes[valor] = np.union1d(posicoes[valor], alteradas)
+
+def trigramas(palavra):
+    """Trechos de 3 letras da palavra, com espaços nas pontas ('sala' -> '  s', ' sa', ...)"""
+    texto = f"  {palavra} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceTrigramas:
+    """Palavras distintas de algumas colunas, indexadas pelos seus trigramas.
+
+    Para cada palavra guarda as posições das linhas onde ela aparece e, para
+    cada trigrama, as palavras que o contêm. Uma palavra digitada com erro
+    só é comparada com as palavras que têm algum trigrama em comum com ela.
+
+    As palavras saem dos valores distintos de cada coluna (cada valor é
+    normalizado uma vez, não uma vez por linha), e os pares (palavra, linha)
+    ficam em um array ordenado de chaves palavra * linhas + posição. Uma
+    edição refaz só os pares das linhas editadas (atualizado).
+    """
+
+    def __init__(self, dados, colunas):
+        self.colunas = colunas
+        self.total = max(len(dados), 1)
+        self.numeros = {}  # Palavra -> número
+        self.palavras = []
+        self.tamanhos = np.empty(0, dtype=np.int64)  # Trigramas de cada palavra
+        self.por_trigrama = {}  # Trigrama -> números das palavras
+        self._ordenar(_ordenados_sem_repeticao(self._chaves(dados, np.arange(len(dados)))))
+
+    def linhas(self, numero):
+        """Posições das linhas em que a palavra aparece"""
+        return self.posicoes[self.inicios[numero]:self.inicios[numero + 1]]
+
+    def atualizado(self, dados, posicoes):
+        """Novo índice com as linhas de `posicoes` refeitas a partir de `dados`.
+
+        Este não é alterado: uma busca em andamento pode continuar usando-o.
+        """
+        novo = object.__new__(IndiceTrigramas)
+        novo.colunas, novo.total, novo.tamanhos = self.colunas, self.total, self.tamanhos
+        novo.numeros, novo.palavras, novo.por_trigrama = dict(self.numeros), list(self.palavras), dict(self.por_trigrama)
+        mantidas = self.chaves[~np.isin(self.posicoes, posicoes)]
+        novas = _ordenados_sem_repeticao(novo._chaves(dados, np.asarray(posicoes, dtype=np.int64)))
+        novo._ordenar(np.insert(mantidas, np.searchsorted(mantidas, novas), novas))  # Nenhuma nova está nas mantidas
+        return novo
+
+    def _ordenar(self, chaves):
+        self.chaves = chaves  # Ordenadas e sem repetição
+        self.posicoes = chaves % self.total
+        self.inicios = np.searchsorted(chaves // self.total, np.arange(len(self.palavras) + 1))
+        self.vivas = np.diff(self.inicios) > 0  # Palavras que ainda aparecem em alguma linha
+
+    def _chaves(self, dados, posicoes):
+        """Chaves (palavra * total + posição) das palavras de cada linha de `posicoes`"""
+        novas = len(self.palavras)
+        partes = [np.empty(0, dtype=np.int64)]
+        for coluna in self.colunas:
+            codigos, valores = pd.factorize(dados[coluna].iloc[posicoes])
+            listas = [self._numeros_do_valor(valor) for valor in valores]
+            quantas = np.fromiter(map(len, listas), dtype=np.int64, count=len(listas))
+            numeros = np.fromiter((n for lista in listas for n in lista), dtype=np.int64, count=int(quantas.sum()))
+            inicios = np.cumsum(quantas) - quantas
+
+            # Cada linha recebe as palavras do seu valor: inicios[código] + 0, 1, ..., quantas[código] - 1
+            preenchidas = codigos >= 0
+            codigos, linhas = codigos[preenchidas], posicoes[preenchidas]
+            por_linha = quantas[codigos]
+            deslocamentos = np.arange(por_linha.sum()) - np.repeat(np.cumsum(por_linha) - por_linha, por_linha)
+            palavras = numeros[np.repeat(inicios[codigos], por_linha) + deslocamentos]
+            partes.append(palavras * self.total + np.repeat(linhas, por_linha))
+        self._registrar_trigramas(novas)
+        return np.concatenate(partes)
+
+    def _numeros_do_valor(self, valor):
+        """Números das palavras do valor, acrescentando ao índice as que ainda não existem"""
+        numeros = []
+        for palavra in dict.fromkeys(re.findall(r'\w+', normalizar_texto(valor))):
+            numero = self.numeros.get(palavra)
+            if numero is None:
+                numero = self.numeros[palavra] = len(self.palavras)
+                self.palavras.append(palavra)
+            numeros.append(numero)
+        return numeros
+
+    def _registrar_trigramas(self, desde):
+        """Indexa pelos trigramas as palavras acrescentadas a partir do número `desde`"""
+        novas = self.palavras[desde:]
+        if not novas:
+            return
+        por_trigrama = {}
+        tamanhos = np.empty(len(novas), dtype=np.int64)
+        for deslocamento, palavra in enumerate(novas):
+            tris = trigramas(palavra)
+            tamanhos[deslocamento] = len(tris)
+            for tri in tris:
+                por_trigrama.setdefault(tri, []).append(desde + deslocamento)
+        self.tamanhos = np.concatenate([self.tamanhos, tamanhos])
+        for tri, numeros in por_trigrama.items():
+            anteriores = self.por_trigrama.get(tri)
+            numeros = np.array(numeros, dtype=np.int64)
+            self.por_trigrama[tri] = numeros if anteriores is None else np.concatenate([anteriores, numeros])
+
+    def semelhantes(self, palavra, limite=PALAVRAS_SEMELHANTES):
+        """[(nota, número da palavra)] das palavras do índice mais parecidas com `palavra`.
+
+        A nota é o coeficiente de Jaccard entre os trigramas (1 = iguais).
+        """
+        tris = trigramas(palavra)
+        listas = [self.por_trigrama[tri] for tri in tris if tri in self.por_trigrama]
+        if not listas:
+            return []
+        comuns = np.bincount(np.concatenate(listas), minlength=len(self.palavras))
+        candidatas = np.flatnonzero(comuns)
+        candidatas = candidatas[self.vivas[candidatas]]
+        notas = comuns[candidatas] / (len(tris) + self.tamanhos[candidatas] - comuns[candidatas])
+        boas = notas >= NOTA_MINIMA
+        return heapq.nlargest(limite, zip(notas[boas].tolist(), candidatas[boas].tolist()))
+
+def _ordenados_sem_repeticao(valores):
+    """np.unique por ordenação (o np.unique por hash é lento para inteiros grandes)"""
+    valores = np.sort(valores)
+    return valores[np.concatenate(([True], valores[1:] != valores[:-1]))] if len(valores) else valores
+
+def normalizar_inventarios(dados):
+    """Guarda o número de inventário como inteiro (1 em vez de 1.0).
+
+    Se algum valor não for um número inteiro, a coluna inteira passa a usar
+    a forma canônica em texto dada por formatar_inventario.
+    """
+    coluna = 'Número de inventário'
+    if coluna not in dados.columns:
+        return
+
+    preenchidos = dados[coluna].notna()
+    numeros = pd.to_numeric(dados[coluna], errors='coerce')
+    if numeros[preenchidos].notna().all() and (numeros[preenchidos] % 1 == 0).all():
+        dados[coluna] = numeros.astype('Int64')
+    else:
+        dados[coluna] = dados[coluna].map(lambda v: v if pd.isna(v) else formatar_inventario(v)).astype(object)
+
+def mapear_inventarios(dados):
+    """Dicionário número de inventário formatado -> rótulo da linha no DataFrame.
+
+    Em números repetidos, vale a primeira linha, como na busca original.
+    """
+    if 'Número de inventário' not in dados.columns:
+        return {}
+    chaves = dados['Número de inventário'].astype('string')
+    rotulos = pd.Series(dados.index, index=chaves.to_numpy(dtype=object, na_value=None))
+    rotulos = rotulos[chaves.notna().to_numpy() & ~chaves.duplicated().to_numpy()]
+    return rotulos.to_dict()
+
+def otimizar_tipos(dados):
+    """Converte as colunas de poucos valores distintos em categóricas.
+
+    Retorna a memória ocupada pelo DataFrame (em bytes) antes e depois.
+    """
+    antes = int(dados.memory_usage(deep=True).sum())
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in dados.columns and not isinstance(dados[coluna].dtype, pd.CategoricalDtype):
+            dados[coluna] = dados[coluna].astype('category')
+    return antes, int(dados.memory_usage(deep=True).sum())
+
+def relatorio_memoria(dados):
+    """Memória ocupada por coluna, em MB, para dimensionar as máquinas"""
+    uso = dados.memory_usage(deep=True, index=True) / 1e6
+    linhas = [f"{str(coluna):<25} {str(dados[coluna].dtype) if coluna in dados else '':<12} {mb:10.3f} MB"
+              for coluna, mb in uso.items()]
+    linhas.append(f"{'Total':<25} {'':<12} {uso.sum():10.3f} MB ({len(dados)} linhas)")
+    return '\n'.join(linhas)
+
+def atribuir(dados, rotulo, coluna, valor):
+    """dados.at[rotulo, coluna] = valor, incluindo o valor nas categorias se preciso"""
+    serie = dados[coluna] if coluna in dados.columns else None
+    if serie is not None and isinstance(serie.dtype, pd.CategoricalDtype) \
+            and pd.notna(valor) and valor not in serie.cat.categories:
+        dados[coluna] = serie.cat.add_categories([valor])
+    dados.at[rotulo, coluna] = valor
+
+def atribuir_em_lote(dados, rotulos, coluna, valores):
+    """dados.loc[rotulos, coluna] = valores em uma só atribuição, como atribuir().
+
+    `valores` é um valor só, para todas as linhas, ou um por linha.
+    """
+    serie = dados[coluna] if coluna in dados.columns else None
+    if serie is not None and isinstance(serie.dtype, pd.CategoricalDtype):
+        candidatos = pd.unique(np.atleast_1d(np.asarray(valores, dtype=object)))
+        novas = [v for v in candidatos if pd.notna(v) and v not in serie.cat.categories]
+        if novas:
+            dados[coluna] = serie.cat.add_categories(novas)
+    try:
+        dados.loc[rotulos, coluna] = valores
+    except TypeError:
+        # Valor que o tipo da coluna não comporta (ex.: texto numa coluna só de vazios)
+        dados[coluna] = dados[coluna].astype(object)
+        dados.loc[rotulos, coluna] = valores
+
+def reaplicar_diario(dados, entradas, posicoes):
+    """Aplica ao DataFrame as edições do diário que ainda não estão no CSV.
+
+    Retorna os rótulos das linhas alteradas.
+    """
+    alterados = set()
+    for entrada in entradas:
+        rotulo = posicoes.get(entrada['inventario'])
+        if rotulo is None:
+            print(f"Edição do diário ignorada, patrimônio não encontrado: {entrada['inventario']}")
+            continue
+        for coluna, valor in entrada['campos'].items():
+            atribuir(dados, rotulo, coluna, valor)
+        alterados.add(rotulo)
+    return sorted(alterados)
+
+def ler_planilha(caminho):
+    """Lê o CSV já tratado e o texto da busca, pelo cache binário quando o arquivo não mudou"""
+    chave = cache_dados.chave(caminho)
+    em_cache = cache_dados.ler(caminho, chave)
+    if em_cache is not None:
+        return em_cache
+
+    dados = ler_csv(caminho)
+    busca = construir_indice_busca(dados)
+    cache_dados.gravar(caminho, chave, dados, busca)
+    return dados, busca
+
+def ler_csv(caminho):
+    """Lê e trata o CSV, sem cache e sem montar o texto da busca"""
+    dados = pd.read_csv(caminho, encoding='ISO-8859-1', sep=';', on_bad_lines='skip')
+    normalizar_inventarios(dados)
+    antes, depois = otimizar_tipos(dados)
+    print(f"💾 Memória dos dados: {antes / 1e6:.2f} MB -> {depois / 1e6:.2f} MB")
+    return dados
+
+def comparar_dados(atuais, novos):
+    """Posições das linhas de `novos` que diferem de `atuais` ou foram acrescentadas ao fim.
+
+    As linhas são emparelhadas pelo número de inventário, na mesma ordem.
+    Retorna None quando isso não é possível (colunas diferentes, itens
+    removidos ou fora de ordem): aí é preciso recarregar tudo.
+    """
+    if list(atuais.columns) != list(novos.columns) or len(novos) < len(atuais):
+        return None
+
+    def textos(serie):
+        return serie.astype('string').fillna('\0').to_numpy(dtype=object)
+
+    def iguais(nome):
+        # Mesmo tipo e mesmos valores (o caso comum) dispensa a comparação como texto
+        return atuais[nome].dtype == comuns[nome].dtype and atuais[nome].equals(comuns[nome])
+
+    comuns = novos.iloc[:len(atuais)]
+    coluna = 'Número de inventário'
+    if coluna in atuais.columns and not iguais(coluna) \
+            and (textos(atuais[coluna]) != textos(comuns[coluna])).any():
+        return None
+
+    diferentes = np.zeros(len(atuais), dtype=bool)
+    for nome in atuais.columns:
+        if not iguais(nome):
+            diferentes |= textos(atuais[nome]) != textos(comuns[nome])
+    return np.concatenate([np.flatnonzero(diferentes), np.arange(len(atuais), len(novos))])
+
+# --- IMPORTAÇÃO ---
+def ler_em_blocos(caminho, tamanho=LOTE_IMPORTACAO):
+    """Lê um CSV (no formato do Dados.csv) ou uma planilha Excel em DataFrames de até `tamanho` linhas.
+
+    Todos os valores vêm como texto. Linhas malformadas do CSV são ignoradas,
+    como na carga do Dados.csv.
+    """
+    if Path(caminho).suffix.lower() in EXTENSOES_EXCEL:
+        yield from _ler_excel_em_blocos(caminho, tamanho)
+        return
+    with pd.read_csv(caminho, encoding='ISO-8859-1', sep=';', on_bad_lines='skip',
+                     dtype=str, chunksize=tamanho) as leitor:
+        yield from leitor
+
+def _ler_excel_em_blocos(caminho, tamanho):
+    # Importado só aqui: o openpyxl demora a carregar (modo read-only lê a planilha aos poucos)
+    from openpyxl import load_workbook
+
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = livro.active.iter_rows(values_only=True)
+        cabecalho = ['' if c is None else str(c).strip() for c in next(linhas, ())]
+        bloco = []
+        for linha in linhas:
+            linha = [_texto_celula(v) for v in linha[:len(cabecalho)]]
+            bloco.append(linha + [None] * (len(cabecalho) - len(linha)))
+            if len(bloco) == tamanho:
+                yield pd.DataFrame(bloco, columns=cabecalho, dtype=object)
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=cabecalho, dtype=object)
+    finally:
+        livro.close()
+
+def _texto_celula(valor):
+    """Valor de uma célula do Excel (ou da base) no formato em que estaria no CSV"""
+    if valor is None or pd.isna(valor):
+        return None
+    if isinstance(valor, datetime):
+        return valor.strftime(FORMATO_DATA)
+    if isinstance(valor, float) and valor == int(valor):
+        return str(int(valor))
+    return str(valor)
+
+def acrescentar_linhas(dados, linhas):
+    """Junta `linhas` ao fim de `dados` (rótulos seguindo a posição), mantendo as colunas categóricas.
+
+    As categorias que faltam são incluídas em `dados`, que é alterado.
+    """
+    linhas = linhas.reindex(columns=dados.columns)
+    linhas.index = pd.RangeIndex(len(dados), len(dados) + len(linhas))
+    for coluna in dados.columns:
+        if isinstance(dados[coluna].dtype, pd.CategoricalDtype):
+            categorias = dados[coluna].cat.categories
+            novas = [v for v in pd.unique(linhas[coluna].dropna()) if v not in categorias]
+            if novas:
+                dados[coluna] = dados[coluna].cat.add_categories(novas)
+            linhas[coluna] = pd.Categorical(linhas[coluna], dtype=dados[coluna].dtype)
+        else:
+            linhas[coluna] = linhas[coluna].astype(object)
+    return pd.concat([dados, linhas])
+
+def contar_linhas_planilha(caminho):
+    """Quantas linhas de dados a planilha tem (só para a barra de progresso; 0 se não souber)"""
+    if Path(caminho).suffix.lower() in EXTENSOES_EXCEL:
+        from openpyxl import load_workbook
+        livro = load_workbook(caminho, read_only=True)
+        try:
+            return max((livro.active.max_row or 1) - 1, 0)
+        finally:
+            livro.close()
+    with open(caminho, 'rb') as f:
+        return max(sum(bloco.count(b'\n') for bloco in iter(lambda: f.read(1 << 20), b'')) - 1, 0)
+
+def mapear_colunas(colunas, existentes):
+    """Coluna da planilha importada -> coluna da base, sem diferenciar acentos, maiúsculas e espaços"""
+    por_nome = {normalizar_texto(coluna).strip(): coluna for coluna in existentes}
+    return {
+        coluna: por_nome[normalizar_texto(coluna).strip()]
+        for coluna in colunas if normalizar_texto(coluna).strip() in por_nome
+    }
+
+# --- ARMAZENAMENTO ---
+# Os armazenamentos têm a mesma interface: ler os dados já tratados (com as
+# edições pendentes), gravar uma edição, regravar tudo e fazer backup.
+# BaseDados só conversa com eles, sem saber onde os dados estão guardados.
+class ArmazenamentoCSV:
+    """Dados.csv com diário de edições; o CSV só é regravado na compactação"""
+
+    nome = 'CSV'
+    grava_na_hora = False  # As edições ficam no diário até a compactação
+
+    def __init__(self, caminho_csv, pasta_backup=None):
+        self.caminho = Path(caminho_csv)
+        self.caminho_diario = diario.caminho_diario(self.caminho)
+        self.pasta_backup = Path(pasta_backup) if pasta_backup else self.caminho.parent / 'backups'
+
+    def versao(self):
+        """Identifica o conteúdo em disco (muda a cada gravação)"""
+        return os.path.getmtime(self.caminho)
+
+    def tamanho(self):
+        return os.path.getsize(self.caminho) + diario.tamanho(self.caminho_diario)
+
+    def travar(self, espera=diario.ESPERA_TRAVA):
+        """Impede outros programas de gravar no CSV e no diário enquanto o bloco roda"""
+        return diario.travar(self.caminho_diario, espera)
+
+    def ler(self, ate=None):
+        """Dados tratados e texto da busca, com as edições do diário (até `ate` bytes dele) reaplicadas"""
+        dados, busca = ler_planilha(self.caminho)
+        entradas = diario.ler_entradas(self.caminho_diario, ate)
+        alterados = reaplicar_diario(dados, entradas, mapear_inventarios(dados)) if entradas else []
+        if alterados:
+            busca.loc[alterados] = construir_indice_busca(dados.loc[alterados])
+        return dados, busca
+
+    def ler_tabela(self):
+        """Só os dados, lidos do arquivo (sem cache), com as edições do diário reaplicadas"""
+        dados = ler_csv(self.caminho)
+        reaplicar_diario(dados, diario.ler_entradas(self.caminho_diario), mapear_inventarios(dados))
+        return dados
+
+    def gravar_edicao(self, posicao, inventario, campos, texto):
+        """Acrescenta a edição ao diário. Retorna os bytes gravados"""
+        return diario.registrar(self.caminho_diario, inventario, campos)
+
+    def pendencias(self):
+        """Tamanho, em bytes, das edições do diário ainda não gravadas no CSV"""
+        return diario.tamanho(self.caminho_diario)
+
+    def criar_backup(self):
+        # O arquivo em disco ainda não contém as edições do diário
+        return backup.registrar(self.caminho, self.pasta_backup)
+
+    def gravar(self, dados, busca):
+        """Regrava o CSV inteiro, de forma atômica, e o cache binário"""
+        diario.salvar_csv_atomico(dados, self.caminho)
+        cache_dados.gravar(self.caminho, cache_dados.chave(self.caminho), dados, busca)
+
+    def gravar_lote(self, dados, busca, posicoes, campos):
+        """Regrava o CSV uma vez, com o diário e a edição em lote aplicados ao que está em disco.
+
+        Outro programa pode ter gravado o CSV ou o diário: as linhas de
+        `posicoes` em `dados` são achadas pelo número de inventário. Chamar
+        com a trava (travar). Retorna os dados gravados.
+        """
+        pendentes = self.pendencias()
+        atuais, busca_atual = self.ler(ate=pendentes)
+        coluna = 'Número de inventário'
+        unicos = atuais[coluna].astype('string').drop_duplicates()  # Repetido: vale a primeira linha, como em mapear_inventarios
+        encontrados = pd.Index(unicos.to_numpy()).get_indexer(dados[coluna].iloc[posicoes].astype('string').to_numpy())
+        rotulos = unicos.index[encontrados[encontrados >= 0]]
+        for coluna, valor in campos.items():
+            atribuir_em_lote(atuais, rotulos, coluna, valor)
+        busca_atual.loc[rotulos] = construir_indice_busca(atuais.loc[rotulos])
+        self.gravar(atuais, busca_atual)
+        self.descartar_pendencias(pendentes)
+        return atuais
+
+    def descartar_pendencias(self, posicao):
+        """Tira do diário as edições já gravadas no CSV. Chamar com a trava (travar)"""
+        diario.descartar_ate(self.caminho_diario, posicao)
+
+    def buscar_texto(self, termo, cancelado=None):
+        return None  # Sem índice em disco: a busca percorre o texto em memória
+
+class ArmazenamentoSQLite:
+    """Banco SQLite (ver banco.py): cada edição é um UPDATE de uma linha"""
+
+    nome = 'SQLite'
+    grava_na_hora = True  # Não há diário nem compactação
+
+    def __init__(self, caminho_banco, pasta_backup=None):
+        self.caminho = Path(caminho_banco)
+        self.pasta_backup = Path(pasta_backup) if pasta_backup else self.caminho.parent / 'backups'
+
+    def versao(self):
+        return os.path.getmtime(self.caminho)
+
+    def tamanho(self):
+        return os.path.getsize(self.caminho)
+
+    def travar(self, espera=None):
+        return nullcontext()  # O próprio SQLite cuida das gravações concorrentes
+
+    def ler(self):
+        dados, busca = banco.ler(self.caminho)
+        normalizar_inventarios(dados)
+        otimizar_tipos(dados)
+        if busca is None:
+            busca = construir_indice_busca(dados)
+        busca.index = dados.index
+        return dados, busca
+
+    def ler_tabela(self):
+        dados, _ = banco.ler(self.caminho, com_busca=False)
+        normalizar_inventarios(dados)
+        otimizar_tipos(dados)
+        return dados
+
+    def gravar_edicao(self, posicao, inventario, campos, texto):
+        banco.atualizar(self.caminho, posicao, campos, texto)
+
+    def pendencias(self):
+        return 0
+
+    def criar_backup(self):
+        """Guarda o conteúdo do banco, no formato do Dados.csv, na pasta de backups"""
+        dados, _ = banco.ler(self.caminho)
+        normalizar_inventarios(dados)
+        fd, temporario = tempfile.mkstemp(prefix=f".{self.caminho.stem}.", suffix='.csv', dir=self.caminho.parent)
+        os.close(fd)
+        try:
+            diario.salvar_csv_atomico(dados, temporario)
+            return backup.registrar(temporario, self.pasta_backup)
+        finally:
+            os.remove(temporario)
+
+    def gravar(self, dados, busca):
+        """Recria o banco com os dados (substituído de uma só vez)"""
+        banco.criar(self.caminho, dados, busca)
+
+    def gravar_lote(self, dados, busca, posicoes, campos):
+        """Um UPDATE por linha, todos na mesma transação. Retorna os dados gravados"""
+        banco.atualizar_lote(self.caminho, posicoes, campos, busca.iloc[posicoes].tolist())
+        return dados
+
+    def descartar_pendencias(self, posicao):
+        pass
+
+    def buscar_texto(self, termo, cancelado=None):
+        """Posições encontradas pelo índice FTS5, ou None se o termo é curto demais para ele"""
+        try:
+            return banco.buscar(self.caminho, termo, cancelado)
+        except banco.BuscaInterrompida:
+            raise OperacaoCancelada() from None
+
+def abrir_armazenamento(caminho_csv, pasta_backup=None):
+    """O banco SQLite ao lado do CSV, se existir (python banco.py importar); senão o próprio CSV"""
+    caminho_banco = banco.caminho_banco(caminho_csv)
+    if caminho_banco.exists():
+        return ArmazenamentoSQLite(caminho_banco, pasta_backup)
+    return ArmazenamentoCSV(caminho_csv, pasta_backup)
+
+def montar_snapshot(armazenamento):
+    """Lê os dados do armazenamento e calcula tudo o que deriva deles"""
+    with medicoes.medir('carga') as medicao:
+        modificacao = armazenamento.versao()  # Antes da leitura: se mudar durante, recarrega de novo
+        dados, busca = armazenamento.ler()
+        medicao.linhas = len(dados)
+        medicao.bytes = armazenamento.tamanho()
+        return Snapshot(dados, busca, mapear_inventarios(dados), IndiceFacetas(dados), ResumoInventario(dados), modificacao)
+
+# --- BASE DE DADOS ---
+class BaseDados:
+    """Inventário carregado (do CSV com diário de edições, ou do SQLite) e seus índices.
+
+    Os métodos que alteram o estado devem ser chamados sempre da mesma
+    thread. montar_snapshot e gravar_compactacao não tocam no estado e
+    podem rodar em uma thread auxiliar.
+    """
+
+    def __init__(self, caminho_csv, pasta_backup=None, armazenamento=None):
+        self.caminho_csv = Path(caminho_csv)
+        self.armazenamento = armazenamento or abrir_armazenamento(self.caminho_csv, pasta_backup)
+
+        self.dados = pd.DataFrame()
+        self.busca = pd.Series(dtype=object)  # Texto normalizado de cada linha, usado pela busca
+        self.inventarios = {}  # Número de inventário formatado -> rótulo da linha em dados
+        self.facetas = IndiceFacetas(self.dados)  # Linhas de cada valor das colunas de filtro
+        self.resumo = ResumoInventario(self.dados)  # Contagens do painel de resumo
+        self.modificacao = None  # Versão do armazenamento correspondente aos dados em memória
+        self.buscas = OrderedDict()  # Termo normalizado -> posições encontradas (LRU)
+        self.geracao = 0  # Muda sempre que os dados mudam; invalida as buscas em andamento
+        self.indices = {}  # Índices da consulta por campo, montados sob demanda
+        self.ultimo_backup = None  # time.monotonic() do último criar_backup
+
+    @property
+    def carregado(self):
+        return self.modificacao is not None
+
+    def mudou(self):
+        """Indica se os dados em disco são diferentes dos carregados"""
+        return self.armazenamento.versao() != self.modificacao
+
+    def montar_snapshot(self):
+        return montar_snapshot(self.armazenamento)
+
+    def montar_atualizacao(self):
+        """Relê os dados em disco e os compara, pelo número de inventário, com os da memória.
+
+        Retorna uma Atualizacao só com as linhas alteradas ou acrescentadas ao
+        fim, ou um Snapshot completo quando a comparação não é possível (itens
+        removidos ou reordenados, colunas diferentes) ou quando mudou tanto que
+        refazer tudo sai mais barato. Roda fora da thread da interface.
+        """
+        if not self.carregado:
+            return self.montar_snapshot()
+        with medicoes.medir('atualizacao') as medicao:
+            geracao, atuais = self.geracao, self.dados
+            modificacao = self.armazenamento.versao()  # Antes da leitura, como em montar_snapshot
+            novos = self.armazenamento.ler_tabela()
+            medicao.bytes = self.armazenamento.tamanho()
+
+            posicoes = comparar_dados(atuais, novos)
+            if posicoes is None or len(posicoes) > LIMITE_ATUALIZACAO * len(novos):
+                medicao.linhas = len(novos)
+                return Snapshot(novos, construir_indice_busca(novos), mapear_inventarios(novos),
+                                IndiceFacetas(novos), ResumoInventario(novos), modificacao)
+
+            linhas = novos.iloc[posicoes]
+            medicao.linhas = len(linhas)
+            return Atualizacao(linhas, construir_indice_busca(linhas), geracao, modificacao)
+
+    def aplicar_atualizacao(self, atualizacao):
+        """Aplica aos dados e aos índices em memória só as linhas que mudaram em disco.
+
+        Retorna False, sem mudar nada, se os dados em memória foram alterados
+        depois da comparação (a atualização precisa ser montada de novo).
+        """
+        if atualizacao.geracao != self.geracao:
+            return False
+
+        linhas, total = atualizacao.linhas, len(self.dados)
+        alteradas = linhas[linhas.index < total]
+        mudadas = []  # Colunas com algum valor diferente nas linhas alteradas
+        if len(alteradas):
+            posicoes = alteradas.index.to_numpy()
+            antes = self.dados.loc[alteradas.index, self._colunas_resumo()]
+            for coluna, valores in alteradas.items():
+                if valores.astype('string').equals(self.dados.loc[alteradas.index, coluna].astype('string')):
+                    continue  # Coluna sem mudança nestas linhas
+                mudadas.append(coluna)
+                atribuir_em_lote(self.dados, alteradas.index, coluna, valores.to_numpy(dtype=object))
+                if coluna not in self.facetas.codigos:
+                    continue
+                # Índice de facetas movido em bloco, um grupo por valor novo
+                vazios = valores.isna().to_numpy()
+                if vazios.any():
+                    self.facetas.atualizar_linhas(posicoes[vazios], coluna, None)
+                for valor, grupo in pd.Series(posicoes[~vazios]).groupby(valores[~vazios].to_numpy(dtype=object)):
+                    self.facetas.atualizar_linhas(grupo.to_numpy(), coluna, valor)
+            self.busca.loc[alteradas.index] = atualizacao.busca.loc[alteradas.index]
+            self.resumo.atualizar(posicoes, antes, self.dados.loc[alteradas.index, self._colunas_resumo()])
+
+        acrescentadas = linhas[linhas.index >= total]
+        if len(acrescentadas):
+            self.dados = pd.concat([self.dados, acrescentadas])
+            normalizar_inventarios(self.dados)
+            otimizar_tipos(self.dados)
+            self.busca = pd.concat([self.busca, atualizacao.busca.loc[acrescentadas.index]])
+            self.facetas = IndiceFacetas(self.dados)
+            self.resumo = ResumoInventario(self.dados)
+            self.inventarios = mapear_inventarios(self.dados)  # Nas linhas alteradas o número não muda
+        self.modificacao = atualizacao.modificacao
+        if len(acrescentadas):
+            self.invalidar_buscas()
+        else:
+            self.invalidar_buscas(alteradas.index.to_numpy(), mudadas)
+        return True
+
+    def _colunas_resumo(self):
+        return [coluna for coluna in COLUNAS_RESUMO + [COLUNA_ATUALIZACAO] if coluna in self.dados.columns]
+
+    def aplicar(self, snapshot):
+        """Troca de uma só vez os dados e seus índices"""
+        self.dados, self.busca, self.inventarios, self.facetas, self.resumo, self.modificacao = snapshot
+        self.invalidar_buscas()
+
+    def invalidar_buscas(self, posicoes=None, colunas=None):
+        """Esquece as buscas guardadas e ajusta os índices da consulta aos dados.
+
+        Sem argumentos (dados trocados por inteiro) os índices são descartados.
+        Depois de uma edição, com as posições e as colunas editadas, só os
+        índices dessas colunas mudam, e só nessas linhas.
+        """
+        self.buscas.clear()
+        self.geracao += 1
+        if posicoes is None:
+            self.indices = {}  # Novo dicionário: uma busca em andamento fica com o antigo
+            return
+
+        posicoes = np.asarray(posicoes, dtype=np.int64)
+        indices = {}  # Idem; índices atualizados são objetos novos, os antigos não mudam
+        for chave, indice in self.indices.items():
+            if chave == 'compartilhado':
+                continue  # Cópia do texto de todas as colunas: refeita na próxima busca paralela
+            if chave == ('trigramas',):
+                if set(colunas) & set(indice.colunas):
+                    indice = indice.atualizado(self.dados, posicoes)
+            elif chave[0] == 'texto':
+                if chave[1] in colunas:
+                    indice = indice.copy()
+                    indice.iloc[posicoes] = textos_normalizados(self.dados[chave[1]].iloc[posicoes]).to_numpy()
+            elif chave[1] in colunas:
+                continue  # Igualdade e ordem: baratos de refazer a partir do texto
+            indices[chave] = indice
+        self.indices = indices
+
+    def carregar(self):
+        """Recarrega de forma síncrona se o arquivo mudou. Retorna True se recarregou"""
+        if self.carregado and not self.mudou():
+            return False
+        self.aplicar(self.montar_snapshot())
+        return True
+
+    # --- Consultas ---
+    # As máscaras são arrays booleanos alinhados a self.dados; combiná-las não
+    # copia o DataFrame, que só é fatiado uma vez, no final.
+    def planejar_busca(self, termo):
+        """Prepara a busca de um termo aproveitando as buscas anteriores.
+
+        Retorna (chave, posições já conhecidas ou None, candidatas). Se algum
+        termo em cache está contido no novo (ex.: "cade" -> "cadei"), só as
+        linhas encontradas por ele precisam ser examinadas; candidatas é None
+        quando é preciso percorrer todas. Consultas com campos e operadores
+        (ver consulta.py) são validadas aqui e levantam ErroConsulta.
+        """
+        simples = consulta.e_simples(termo, self.e_campo)
+        chave = normalizar_texto(termo.strip()) if simples else termo.strip()
+        if not simples:
+            self.compilar_consulta(chave)
+        if chave in self.buscas:
+            self.buscas.move_to_end(chave)
+            return chave, self.buscas[chave], None
+
+        candidatas = None
+        if simples:
+            for anterior, posicoes in self.buscas.items():
+                if anterior in chave and consulta.e_simples(anterior, self.e_campo) \
+                        and (candidatas is None or len(posicoes) < len(candidatas)):
+                    candidatas = posicoes
+        return chave, None, candidatas
+
+    def posicoes_busca(self, termo, candidatas=None, cancelado=None):
+        """Posições das linhas que atendem à chave devolvida por planejar_busca.
+
+        Não altera o estado, então pode rodar em uma thread auxiliar; o texto
+        é examinado em blocos e cancelado() é consultado entre eles.
+        """
+        simples = consulta.e_simples(termo, self.e_campo)
+        with medicoes.medir('busca' if simples else 'consulta') as medicao:
+            if simples:
+                # Pelo índice em disco (SQLite) quando há um; senão percorrendo o texto,
+                # em vários processos se o inventário for muito grande
+                posicoes = None
+                if candidatas is None:
+                    posicoes = self.armazenamento.buscar_texto(termo, cancelado)
+                    if posicoes is None and varredura.vale_a_pena(len(self.busca)):
+                        posicoes = self.varredura_paralela(termo, cancelado)
+                if posicoes is None:
+                    teste = lambda textos: textos.str.contains(termo, regex=False)
+                    posicoes = self.percorrer(self.busca, candidatas, teste, cancelado)
+            else:
+                posicoes = self.avaliar(self.compilar_consulta(termo), candidatas, cancelado)
+            medicao.linhas = len(posicoes)
+            return posicoes
+
+    def percorrer(self, textos, candidatas, teste, cancelado=None):
+        """Posições (dentre as candidatas) em que teste(bloco de textos) dá True"""
+        if candidatas is None:
+            candidatas = np.arange(len(textos))
+
+        encontradas = []
+        for inicio in range(0, len(candidatas), BLOCO_BUSCA):
+            acompanhar(inicio, len(candidatas), cancelado=cancelado)
+            bloco = candidatas[inicio:inicio + BLOCO_BUSCA]
+            achou = teste(textos.iloc[bloco]).to_numpy(dtype=bool)
+            encontradas.append(bloco[achou])
+        return np.concatenate(encontradas) if encontradas else np.empty(0, dtype=np.int64)
+
+    def varredura_paralela(self, termo, cancelado=None):
+        """Posições das linhas que contêm o termo, procuradas em vários processos (None se não der)"""
+        compartilhado = self._indice('compartilhado', lambda: varredura.TextoCompartilhado(self.busca))
+        try:
+            return varredura.procurar(compartilhado, termo, cancelado)
+        except varredura.BuscaInterrompida:
+            raise OperacaoCancelada() from None
+        except Exception as e:
+            # Pool que não pôde ser criado ou processo que morreu: fica a busca simples
+            print(f"Busca paralela indisponível ({e}); usando a busca simples.")
+            return None
+
+    def guardar_busca(self, termo, posicoes, geracao):
+        """Guarda o resultado no cache, se os dados não mudaram desde que a busca começou"""
+        if geracao != self.geracao:
+            return
+        self.buscas[termo] = posicoes
+        self.buscas.move_to_end(termo)
+        while len(self.buscas) > TAMANHO_CACHE_BUSCAS:
+            self.buscas.popitem(last=False)
+
+    def mascara_busca(self, termo):
+        """Linhas cujo texto (sem acentos, em minúsculas) contém o termo"""
+        termo, posicoes, candidatas = self.planejar_busca(termo)
+        if posicoes is None:
+            posicoes = self.posicoes_busca(termo, candidatas)
+            self.guardar_busca(termo, posicoes, self.geracao)
+        mascara = np.zeros(len(self.dados), dtype=bool)
+        mascara[posicoes] = True
+        return mascara
+
+    def mascara_filtros(self, tipo='', grupo='', local=''):
+        """Linhas com os valores escolhidos em Tipo, Grupo encarregado e Localização"""
+        selecao = {'Tipo': tipo, 'Grupo encarregado': grupo, 'Localização': local}
+        with medicoes.medir('filtro') as medicao:
+            posicoes = self.facetas.posicoes_filtro(selecao)
+            if posicoes is None:
+                medicao.linhas = len(self.dados)
+                return np.ones(len(self.dados), dtype=bool)
+            mascara = np.zeros(len(self.dados), dtype=bool)
+            mascara[posicoes] = True
+            medicao.linhas = len(posicoes)
+            return mascara
+
+    # --- Consultas com campos (consulta.py) ---
+    # A árvore da consulta é avaliada como conjuntos de posições. Termos que
+    # têm índice (facetas, categorias, igualdade, intervalos) saem direto
+    # dele; os demais percorrem o texto, mas só das linhas que sobraram
+    # depois dos termos indexados.
+    def compilar_consulta(self, texto):
+        """Analisa o texto, resolve os campos e normaliza os valores"""
+        return self._compilar(consulta.analisar(texto, self.e_campo))
+
+    def _compilar(self, no):
+        if no[0] in ('e', 'ou'):
+            return (no[0], [self._compilar(filho) for filho in no[1]])
+        if no[0] == 'nao':
+            return ('nao', self._compilar(no[1]))
+
+        coluna = None if no[1] is None else self.resolver_campo(no[1])
+        if no[0] == 'intervalo':
+            return ('intervalo', coluna, *self._limites(coluna, no[2], no[3]))
+        _, _, modo, valor = no
+        if coluna in COLUNAS_DATA and modo == 'igual':
+            return ('intervalo', coluna, *self._limites(coluna, valor, valor))
+        return ('termo', coluna, modo, normalizar_texto(valor))
+
+    def resolver_campo(self, nome):
+        """Coluna correspondente ao nome de campo usado na consulta"""
+        nome = normalizar_texto(nome)
+        colunas = {normalizar_texto(coluna): coluna for coluna in self.dados.columns}
+        if nome in consulta.APELIDOS and consulta.APELIDOS[nome] in self.dados.columns:
+            return consulta.APELIDOS[nome]
+        if nome in colunas:
+            return colunas[nome]
+        parecidas = [coluna for normalizada, coluna in colunas.items() if normalizada.startswith(nome)]
+        if len(parecidas) == 1:
+            return parecidas[0]
+        raise consulta.ErroConsulta(f"Campo desconhecido: {nome}")
+
+    def e_campo(self, nome):
+        """Indica se o nome corresponde a algum campo (ver resolver_campo)"""
+        try:
+            self.resolver_campo(nome)
+        except consulta.ErroConsulta:
+            return False
+        return True
+
+    def _limites(self, coluna, inicio, fim):
+        """Extremos do intervalo (o fim é exclusivo), em datas ou números conforme a coluna"""
+        if coluna in COLUNAS_DATA:
+            inicio = np.datetime64(consulta.interpretar_data(inicio)) if inicio else None
+            fim = np.datetime64(consulta.interpretar_data(fim)) + np.timedelta64(1, 'D') if fim else None
+            return inicio, fim
+        try:
+            inicio = float(inicio) if inicio else None
+            fim = np.nextafter(float(fim), np.inf) if fim else None
+        except ValueError:
+            raise consulta.ErroConsulta(f"Intervalo inválido em {coluna}: use números ou datas") from None
+        return inicio, fim
+
+    def _indice(self, chave, construir):
+        indices = self.indices  # Referência local: invalidar_buscas troca o dicionário
+        if chave not in indices:
+            indices[chave] = construir()
+        return indices[chave]
+
+    def textos_coluna(self, coluna):
+        """Texto normalizado de cada linha da coluna, montado na primeira consulta que o usa"""
+        return self._indice(('texto', coluna), lambda: textos_normalizados(self.dados[coluna]))
+
+    def _ordem(self, coluna):
+        """Posições das linhas em ordem crescente do valor e os valores ordenados"""
+        def construir():
+            serie = self.dados[coluna]
+            if coluna in COLUNAS_DATA:
+                valores = pd.to_datetime(serie, format=FORMATO_DATA, errors='coerce')
+                outros = valores.isna() & serie.notna()
+                if outros.any():  # Datas gravadas em outro formato
+                    valores[outros] = pd.to_datetime(serie[outros], dayfirst=True, format='mixed', errors='coerce')
+            else:
+                valores = pd.to_numeric(serie, errors='coerce').astype(float)
+            valores = valores.to_numpy()
+            preenchidas = np.flatnonzero(~pd.isna(valores))
+            ordem = preenchidas[np.argsort(valores[preenchidas], kind='stable')]
+            return ordem, valores[ordem]
+        return self._indice(('ordem', coluna), construir)
+
+    def _custo(self, no):
+        """0 se o nó é resolvido só com índices, 1 se precisa percorrer texto"""
+        if no[0] in ('e', 'ou'):
+            return max(self._custo(filho) for filho in no[1])
+        if no[0] == 'nao':
+            return self._custo(no[1])
+        if no[0] == 'intervalo':
+            return 0
+        _, coluna, modo, _ = no
+        if coluna is None:
+            return 1
+        categorica = isinstance(self.dados[coluna].dtype, pd.CategoricalDtype)
+        return 0 if categorica or coluna in self.facetas.posicoes or modo == 'igual' else 1
+
+    def avaliar(self, no, candidatas=None, cancelado=None):
+        """Posições ordenadas das linhas (dentre as candidatas) que atendem ao nó compilado"""
+        tipo = no[0]
+        if tipo == 'e':
+            for filho in sorted(no[1], key=self._custo):  # Índices primeiro, varreduras no que sobrar
+                candidatas = self.avaliar(filho, candidatas, cancelado)
+                if not len(candidatas):
+                    break
+            return candidatas
+
+        if tipo == 'ou':
+            restantes = np.arange(len(self.dados)) if candidatas is None else candidatas
+            encontradas = np.empty(0, dtype=np.int64)
+            for filho in sorted(no[1], key=self._custo):
+                achadas = self.avaliar(filho, restantes, cancelado)
+                encontradas = np.union1d(encontradas, achadas)
+                restantes = np.setdiff1d(restantes, achadas, assume_unique=True)
+            return encontradas
+
+        if tipo == 'nao':
+            todas = np.arange(len(self.dados)) if candidatas is None else candidatas
+            return np.setdiff1d(todas, self.avaliar(no[1], candidatas, cancelado), assume_unique=True)
+
+        if self._custo(no) == 0:
+            posicoes = self._posicoes_indexadas(no)
+            return posicoes if candidatas is None else np.intersect1d(candidatas, posicoes, assume_unique=True)
+
+        _, coluna, modo, valor = no
+        textos = self.busca if coluna is None else self.textos_coluna(coluna)
+        if modo == 'prefixo':
+            # Sem campo, o prefixo vale para qualquer palavra da linha
+            padrao = (r'(?<!\w)' if coluna is None else '^') + re.escape(valor)
+            teste = lambda bloco: bloco.str.contains(padrao, regex=True)
+        else:
+            teste = lambda bloco: bloco.str.contains(valor, regex=False)
+        return self.percorrer(textos, candidatas, teste, cancelado)
+
+    def _posicoes_indexadas(self, no):
+        if no[0] == 'intervalo':
+            _, coluna, inicio, fim = no
+            ordem, valores = self._ordem(coluna)
+            de = 0 if inicio is None else np.searchsorted(valores, inicio, side='left')
+            ate = len(valores) if fim is None else np.searchsorted(valores, fim, side='left')
+            return np.sort(ordem[de:ate])
+
+        _, coluna, modo, valor = no
+        if coluna in self.facetas.posicoes:
+            grupos = [posicoes for nome, posicoes in self.facetas.posicoes[coluna].items()
+                      if atende(normalizar_texto(nome), modo, valor)]
+            return np.sort(np.concatenate(grupos)) if grupos else np.empty(0, dtype=np.int64)
+
+        serie = self.dados[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = [codigo for codigo, nome in enumerate(serie.cat.categories)
+                       if atende(normalizar_texto(nome), modo, valor)]
+            return np.flatnonzero(np.isin(serie.cat.codes.to_numpy(), codigos))
+
+        textos = self.textos_coluna(coluna)
+        iguais = self._indice(('igual', coluna), lambda: agrupar_posicoes(textos))
+        return np.asarray(iguais.get(valor, np.empty(0, dtype=np.int64)), dtype=np.int64)
+
+    # --- Busca aproximada ---
+    def posicoes_aproximadas(self, termo, limite=LIMITE_APROXIMADA, cancelado=None):
+        """Posições dos itens mais parecidos com o termo, da maior para a menor nota, e as notas.
+
+        Cada palavra digitada vale a nota da palavra mais parecida do item
+        (em COLUNAS_APROXIMADA); a nota do item é a média entre elas. Só os
+        `limite` melhores são mantidos, com um heap de tamanho limitado.
+        Não altera o estado e pode rodar em uma thread auxiliar.
+        """
+        palavras = re.findall(r'\w+', normalizar_texto(termo))
+        colunas = [coluna for coluna in COLUNAS_APROXIMADA if coluna in self.dados.columns]
+        if not palavras or not colunas:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        with medicoes.medir('busca_aproximada') as medicao:
+            indice = self._indice(('trigramas',), lambda: IndiceTrigramas(self.dados, colunas))
+
+            notas = np.zeros(len(self.dados))
+            for feitas, palavra in enumerate(palavras):
+                acompanhar(feitas, len(palavras), cancelado=cancelado)
+                melhor = np.zeros(len(self.dados))
+                for nota, numero in indice.semelhantes(palavra):
+                    linhas = indice.linhas(numero)
+                    melhor[linhas] = np.maximum(melhor[linhas], nota)
+                notas += melhor
+            notas /= len(palavras)
+
+            # Empate: vale a ordem original da planilha
+            melhores = heapq.nlargest(limite, np.flatnonzero(notas).tolist(), key=lambda i: (notas[i], -i))
+            posicoes = np.array(melhores, dtype=np.int64)
+            medicao.linhas = len(posicoes)
+            return posicoes, notas[posicoes]
+
+    def buscar_aproximado(self, termo, limite=LIMITE_APROXIMADA):
+        """Itens mais parecidos com o termo, do mais para o menos parecido"""
+        return self.dados.iloc[self.posicoes_aproximadas(termo, limite)[0]]
+
+    def buscar(self, termo):
+        return self.dados[self.mascara_busca(termo)]
+
+    def filtrar(self, tipo='', grupo='', local=''):
+        return self.dados[self.mascara_filtros(tipo, grupo, local)]
+
+    def consultar(self, termo='', tipo='', grupo='', local=''):
+        """Combina a busca textual com os filtros (todas as condições valem)"""
+        mascara = self.mascara_filtros(tipo, grupo, local)
+        if termo and termo.strip():
+            mascara &= self.mascara_busca(termo)
+        return self.dados[mascara]
+
+    def contar(self, coluna, termo='', tipo='', grupo='', local=''):
+        """Contagens por valor da coluna de filtro entre os itens que consultar() devolveria,
+        sem contar o filtro da própria coluna"""
+        selecao = {'Tipo': tipo, 'Grupo encarregado': grupo, 'Localização': local}
+        dentre = np.flatnonzero(self.mascara_busca(termo)) if termo and termo.strip() else None
+        return self.facetas.contagens(coluna, selecao, dentre)
+
+    def localizar(self, inventario):
+        """Rótulo da linha com o número de inventário (formatado), ou None"""
+        return self.inventarios.get(inventario)
+
+    # --- Edições ---
+    def editar(self, rotulo, inventario, campos):
+        """Grava a edição (no diário ou no banco) e a aplica na hora aos dados e aos índices em memória"""
+        validar_codificacao(campos)  # Antes do diário: um valor que o CSV não aceita travaria a compactação
+        with medicoes.medir('edicao', linhas=1) as medicao:
+            posicao = self.dados.index.get_loc(rotulo)
+            linha = self.dados.loc[[rotulo]].astype(object)
+            for coluna, valor in campos.items():
+                linha[coluna] = valor
+            texto = construir_indice_busca(linha).iloc[0]
+
+            if self.armazenamento.grava_na_hora and (
+                    self.ultimo_backup is None or time.monotonic() - self.ultimo_backup > INTERVALO_BACKUP_EDICAO):
+                # Sem diário, o UPDATE sobrescreve o banco; no CSV, o backup fica para a compactação
+                self.criar_backup()
+
+            # Primeiro em disco, para sobreviver a uma queda
+            medicao.bytes = self.armazenamento.gravar_edicao(posicao, inventario, campos, texto)
+
+            antes = self.dados.loc[[rotulo], self._colunas_resumo()]
+            for coluna, valor in campos.items():
+                atribuir(self.dados, rotulo, coluna, valor)
+            self.busca.at[rotulo] = texto
+            self.resumo.atualizar([posicao], antes, self.dados.loc[[rotulo], self._colunas_resumo()])
+            if 'Número de inventário' in campos:
+                self.inventarios.pop(inventario, None)
+                self.inventarios.setdefault(formatar_inventario(self.dados.at[rotulo, 'Número de inventário']), rotulo)
+            for coluna, valor in campos.items():
+                self.facetas.atualizar_linha(posicao, coluna, valor)
+            self.invalidar_buscas([posicao], list(campos))
+            if self.armazenamento.grava_na_hora:
+                self.modificacao = self.armazenamento.versao()  # O disco já corresponde à memória
+
+    def editar_em_lote(self, rotulos, campos):
+        """Aplica os mesmos valores a várias linhas, com um só backup e uma só gravação.
+
+        Carimba a Última atualização das linhas. Retorna quantas foram alteradas.
+        """
+        if 'Número de inventário' in campos:
+            raise ValueError("O número de inventário não pode ser editado em lote.")
+        validar_codificacao(campos)
+        rotulos = pd.Index(rotulos).unique()
+        posicoes = np.sort(self.dados.index.get_indexer(rotulos))
+        if (posicoes < 0).any():
+            raise KeyError("Há itens que não estão mais na base de dados.")
+        if not len(posicoes):
+            return 0
+        rotulos = self.dados.index[posicoes]
+        campos = {**campos, COLUNA_ATUALIZACAO: datetime.now().strftime(FORMATO_DATA)}
+
+        with medicoes.medir('edicao_lote', linhas=len(posicoes)) as medicao:
+            # Alterações em cópias: a memória só muda depois que o disco foi gravado
+            dados, busca = self.dados.copy(), self.busca.copy()
+            for coluna, valor in campos.items():
+                atribuir_em_lote(dados, rotulos, coluna, valor)
+            busca.loc[rotulos] = construir_indice_busca(dados.loc[rotulos])
+
+            # Chamada da thread da interface: uma tentativa curta, sem esperar uma compactação inteira
+            with self.armazenamento.travar(diario.ESPERA_EDICAO):
+                self.criar_backup()
+                gravados = self.armazenamento.gravar_lote(dados, busca, posicoes, campos)
+                versao = self._versao_gravada(dados, gravados)
+            medicao.bytes = os.path.getsize(self.armazenamento.caminho)
+
+            antes = self.dados.loc[rotulos, self._colunas_resumo()]
+            self.dados, self.busca = dados, busca
+            self.resumo.atualizar(posicoes, antes, self.dados.loc[rotulos, self._colunas_resumo()])
+            for coluna, valor in campos.items():
+                self.facetas.atualizar_linhas(posicoes, coluna, valor)
+            self.invalidar_buscas(posicoes, list(campos))
+            if versao is not None:
+                self.modificacao = versao  # Senão o disco tem também edições de outro programa: recarregar
+        return len(posicoes)
+
+    def mesclar_planilha(self, caminho, progresso=None, cancelado=None, tamanho=LOTE_IMPORTACAO):
+        """Insere ou atualiza, pelo número de inventário, os itens de outra planilha (CSV ou Excel).
+
+        A planilha é lida em blocos de `tamanho` linhas. Itens que já existem
+        recebem os valores preenchidos na planilha (células vazias não apagam
+        nada); os novos vão para o fim a cada bloco; linhas sem número de
+        inventário, ou com caracteres que o Dados.csv não aceita, são
+        rejeitadas. Só contam como atualizados os itens em que algum valor
+        muda; se nada mudar, nada é gravado. O resultado é gravado uma única
+        vez, depois de um backup.
+
+        Não mexe nos dados em memória: retorna (snapshot, resumo), e quem chama
+        troca os dados com aplicar(snapshot). Se outro programa gravou os dados
+        durante a importação, nada é gravado e levanta RuntimeError.
+        """
+        coluna = 'Número de inventário'
+        total = contar_linhas_planilha(caminho)
+        resumo = {'lidas': 0, 'inseridos': 0, 'atualizados': 0, 'rejeitados': 0, 'ignoradas': []}
+        alterados_por_outro = ("Os dados foram alterados por outro programa durante a importação. "
+                               "Importe a planilha de novo.")
+
+        with medicoes.medir('importacao') as medicao:
+            # Os dados em memória têm de ser os do disco; depois, basta conferir que a versão
+            # do arquivo e o tamanho do diário não mudaram, sem guardar uma cópia para comparar
+            geracao, inventarios = self.geracao, self.inventarios
+            estado = (self.armazenamento.versao(), self.pendencias())
+            if not self._iguais(self.dados, self.armazenamento.ler_tabela()) \
+                    or (self.armazenamento.versao(), self.pendencias()) != estado:
+                raise RuntimeError(alterados_por_outro)
+
+            dados = self.dados.copy()
+            inicio_novos = len(dados)
+            chaves_novas = {}  # Número formatado -> rótulo dos itens acrescentados pela planilha
+            # Numa base só de números inteiros, um número em texto é erro de digitação da planilha
+            numerica = pd.api.types.is_integer_dtype(dados[coluna]) if coluna in dados.columns else False
+            atualizados = []
+
+            for bloco in ler_em_blocos(caminho, tamanho):
+                resumo['lidas'] += len(bloco)
+                colunas = mapear_colunas(bloco.columns, dados.columns)
+                if coluna not in colunas.values():
+                    raise ValueError(f"A planilha não tem a coluna {coluna}.")
+                resumo['ignoradas'] = [str(c) for c in bloco.columns if c not in colunas]
+                bloco = bloco[list(colunas)].rename(columns=colunas)
+                bloco = bloco.apply(lambda serie: serie.str.strip()).replace('', None)
+
+                # O número formatado é a chave do dicionário de inventários (o índice hash da base)
+                chaves = bloco[coluna].map(lambda v: None if pd.isna(v) else formatar_inventario(v))
+                validas = chaves.notna() & (chaves != 'Inválido')
+                validas &= bloco.apply(lambda serie: serie.map(codificavel, na_action='ignore')).fillna(True).all(axis=1)
+                if numerica:
+                    validas &= chaves.str.fullmatch(r'-?\d+').fillna(False).astype(bool)
+                resumo['rejeitados'] += int((~validas).sum())
+                bloco = bloco[validas].assign(**{coluna: chaves[validas]})
+                # Número repetido no bloco: vale o último valor preenchido de cada coluna
+                bloco = bloco.groupby(coluna, sort=False).last().reset_index()
+
+                # Itens da base ou acrescentados por um bloco anterior são atualizados
+                rotulos = bloco[coluna].map(inventarios).fillna(bloco[coluna].map(chaves_novas))
+                existentes = rotulos.notna().to_numpy()
+                if existentes.any():
+                    rotulos = pd.Index(rotulos[existentes].astype(np.int64))
+                    for nome, valores in bloco[existentes].drop(columns=coluna).items():
+                        # Só o que muda de fato: célula vazia ou valor igual ao da base não conta
+                        valores = valores.to_numpy(dtype=object)
+                        atuais = np.array([_texto_celula(v) for v in dados.loc[rotulos, nome]], dtype=object)
+                        mudou = pd.notna(valores) & (valores != atuais)
+                        if mudou.any():
+                            atribuir_em_lote(dados, rotulos[mudou], nome, valores[mudou])
+                            atualizados.append(rotulos[mudou].to_numpy())
+
+                # Os novos entram já neste bloco: a memória não guarda a planilha inteira até o fim
+                novos = bloco[~existentes]
+                if len(novos):
+                    dados = acrescentar_linhas(dados, novos)
+                    chaves_novas.update(zip(novos[coluna], range(len(dados) - len(novos), len(dados))))
+                acompanhar(resumo['lidas'], total, progresso, cancelado)
+
+            alterados = np.unique(np.concatenate(atualizados)) if atualizados else np.empty(0, dtype=np.int64)
+            resumo['atualizados'] = int((alterados < inicio_novos).sum())
+            resumo['inseridos'] = len(dados) - inicio_novos
+            if resumo['inseridos']:
+                normalizar_inventarios(dados)
+                otimizar_tipos(dados)
+            busca = self.busca.reindex(dados.index) if resumo['inseridos'] else self.busca.copy()
+            tocados = np.union1d(alterados, np.arange(inicio_novos, len(dados)))
+            if len(tocados):
+                busca.loc[tocados] = construir_indice_busca(dados.loc[tocados])
+
+            if resumo['inseridos'] or resumo['atualizados']:
+                acompanhar(resumo['lidas'], total, progresso, cancelado)  # Última chance de cancelar
+                with self.armazenamento.travar():
+                    pendentes = self.pendencias()  # Vão para o arquivo junto com a importação
+                    if (self.armazenamento.versao(), pendentes) != estado or self.geracao != geracao:
+                        raise RuntimeError(alterados_por_outro)
+                    self.criar_backup()
+                    self.armazenamento.gravar(dados, busca)
+                    self.armazenamento.descartar_pendencias(pendentes)
+            medicao.linhas = resumo['lidas']
+            medicao.bytes = os.path.getsize(caminho)
+
+        snapshot = Snapshot(dados, busca, mapear_inventarios(dados), IndiceFacetas(dados),
+                            ResumoInventario(dados), self.armazenamento.versao())
+        return snapshot, resumo
+
+    def pendencias(self):
+        """Tamanho, em bytes, das edições ainda não gravadas no arquivo de dados"""
+        return self.armazenamento.pendencias()
+
+    def criar_backup(self):
+        """Guarda o estado atual dos dados em disco antes de eles serem sobrescritos"""
+        self.ultimo_backup = time.monotonic()
+        try:
+            with medicoes.medir('backup') as medicao:
+                caminho = self.armazenamento.criar_backup()
+                medicao.bytes = caminho.stat().st_size if caminho else 0
+            if caminho:
+                print(f"Backup criado: {caminho}")
+            else:
+                print("Backup ignorado: conteúdo idêntico ao último backup.")
+        except Exception as e:
+            print(f"Erro ao criar backup: {e}")
+
+    # --- Compactação do diário ---
+    # O diário é compartilhado por todos os programas abertos sobre o mesmo
+    # CSV. A compactação relê o CSV em disco e reaplica o diário, sob a trava,
+    # em vez de gravar os dados em memória, que podem não ter as edições dos
+    # outros programas; depois descarta só as entradas que aplicou.
+    def preparar_compactacao(self):
+        """Cópia dos dados em memória, para conferir o que a compactação gravou (ou None se não há o que gravar)"""
+        if self.pendencias() == 0 or not self.carregado:
+            return None
+        return self.dados.copy()
+
+    def gravar_compactacao(self, dados):
+        """Faz o backup do CSV e o regrava com as edições do diário.
+
+        Retorna a versão gravada se ela corresponde a `dados` (os dados em
+        memória), ou None se o disco ficou diferente (com edições de outros
+        programas) e é preciso recarregar.
+        """
+        with self.armazenamento.travar():
+            posicao = self.pendencias()
+            if posicao == 0:
+                return None  # Outro programa já compactou
+            gravados, busca = self.armazenamento.ler(ate=posicao)
+            self.criar_backup()
+            with medicoes.medir('gravacao', linhas=len(gravados)) as medicao:
+                self.armazenamento.gravar(gravados, busca)
+                medicao.bytes = os.path.getsize(self.armazenamento.caminho)
+            self.armazenamento.descartar_pendencias(posicao)
+            return self._versao_gravada(dados, gravados)
+
+    def concluir_compactacao(self, versao):
+        """Marca os dados em memória como correspondentes ao arquivo gravado, se for o caso"""
+        if versao is not None:
+            self.modificacao = versao  # Não recarregar o que acabou de ser gravado
+        # Senão a versão antiga fica e o vigia (ou mudou()) traz as edições dos outros programas
+
+    def compactar(self):
+        """Grava de forma síncrona as edições pendentes no arquivo de dados"""
+        if self.pendencias() and self.carregado:
+            self.concluir_compactacao(self.gravar_compactacao(self.dados))
+
+    def _versao_gravada(self, esperados, gravados):
+        """Versão do arquivo recém-gravado (chamar com a trava) se ele tem os dados esperados; senão None"""
+        if gravados is esperados or self._iguais(esperados, gravados):
+            return self.armazenamento.versao()
+        return None
+
+    @staticmethod
+    def _iguais(dados, outros):
+        posicoes = comparar_dados(dados, outros)
+        return posicoes is not None and len(posicoes) == 0
+
+# --- EXPORTAÇÕES ---
+class OperacaoCancelada(Exception):
+    """A busca ou exportação foi interrompida a pedido do usuário"""
+
+def acompanhar(feitos, total, progresso=None, cancelado=None):
+    """Informa o progresso e interrompe a operação se o usuário cancelou"""
+    if cancelado is not None and cancelado():
+        raise OperacaoCancelada()
+    if progresso is not None:
+        progresso(feitos, total)
+
+def gravar_excel(resultados, caminho, progresso=None, cancelado=None, lote=LOTE_EXPORTACAO, nome_folha="Resultados"):
+    """Grava a planilha Excel bloco a bloco, com o openpyxl em modo write-only.
+
+    Nesse modo as linhas vão direto para o arquivo, então a memória usada
+    não cresce com o número de itens.
+    """
+    with medicoes.medir('exportacao_excel', linhas=len(resultados)) as medicao:
+        # Importado só aqui para não pesar na inicialização do programa
+        from openpyxl import Workbook
+
+        total = len(resultados)
+        livro = Workbook(write_only=True)
+        folha = livro.create_sheet(nome_folha)
+        folha.append([str(coluna) for coluna in resultados.columns])
+
+        for inicio in range(0, total, lote):
+            acompanhar(inicio, total, progresso, cancelado)
+            bloco = resultados.iloc[inicio:inicio + lote].astype(object)
+            bloco = bloco.where(bloco.notna(), None)
+            for linha in bloco.itertuples(index=False, name=None):
+                folha.append(linha)
+
+        temporario = Path(str(caminho) + '.tmp')
+        try:
+            livro.save(temporario)
+            diario.copiar_permissoes(temporario, caminho)
+            os.replace(temporario, caminho)
+        finally:
+            if temporario.exists():
+                temporario.unlink()
+        acompanhar(total, total, progresso)
+        medicao.bytes = os.path.getsize(caminho)
+
+def linhas_relatorio(resultados, lote=TAMANHO_LOTE):
+    """Gera o texto de cada item do relatório, formatando um bloco de linhas por vez"""
+    for inicio in range(0, len(resultados), lote):
+        bloco = resultados.iloc[inicio:inicio + lote]
+        colunas = [valores_para_exibicao(bloco, coluna) for coluna in COLUNAS_RELATORIO]
+        for inventario, nome, tipo, grupo, local in zip(*colunas):
+            yield f"Patrimônio: {inventario} | Nome: {nome} | Tipo: {tipo} | Grupo: {grupo} | Local: {local}"
+
+def linhas_resumo(tabela):
+    """Texto de cada linha de uma tabela do resumo (ResumoInventario.tabela)"""
+    colunas = [coluna for coluna in tabela.columns if coluna != 'Itens']
+    for linha in tabela.itertuples(index=False, name=None):
+        grupos = ' | '.join(f"{coluna}: {valor}" for coluna, valor in zip(colunas, linha))
+        yield f"{grupos} | Itens: {linha[-1]}" if grupos else f"Itens: {linha[-1]}"
+
+def gravar_pdf(resultados, caminho, progresso=None, cancelado=None,
+               formatar=linhas_relatorio, titulo="Relatório de Patrimônio"):
+    """Gera o relatório em PDF com uma linha por item (ou por linha do resumo, com formatar=linhas_resumo).
+
+    progresso(feitos, total) é chamado periodicamente; se cancelado() retornar
+    True, a geração é interrompida com OperacaoCancelada e nenhum arquivo é gravado.
+    """
+    with medicoes.medir('exportacao_pdf', linhas=len(resultados)) as medicao:
+        # Importado só aqui para não pesar na inicialização do programa
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
+        total = len(resultados)
+        temporario = Path(str(caminho) + '.tmp')
+        c = canvas.Canvas(str(temporario), pagesize=A4)
+        width, height = A4
+        y = height - 40
+        c.setFont("Helvetica", 9)
+
+        # Cabeçalho
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(40, y, f"{titulo} - " + datetime.now().strftime("%d/%m/%Y %H:%M"))
+        y -= 20
+        c.setFont("Helvetica", 9)
+        c.line(40, y, width-40, y)
+        y -= 20
+
+        for feitos, linha in enumerate(formatar(resultados)):
+            if feitos % INTERVALO_PROGRESSO == 0:
+                acompanhar(feitos, total, progresso, cancelado)
+
+            for sublinha in textwrap.wrap(linha, width=110) if len(linha) > 110 else [linha]:
+                c.drawString(40, y, sublinha)
+                y -= 15
+
+            y -= 10  # Espaço entre itens
+
+            if y < 60:  # Nova página se necessário
+                c.showPage()
+                y = height - 40
+                c.setFont("Helvetica", 9)
+
+        c.save()
+        diario.copiar_permissoes(temporario, caminho)
+        os.replace(temporario, caminho)
+        acompanhar(total, total, progresso)
+        medicao.bytes = os.path.getsize(caminho)
+
+def escrever_em_fluxo(resultados, saida, formato='csv', lote=TAMANHO_LOTE, progresso=None, cancelado=None):
+    """Escreve os resultados em blocos, como CSV (formato do Dados.csv) ou JSON Lines"""
+    for inicio in range(0, len(resultados), lote):
+        acompanhar(inicio, len(resultados), progresso, cancelado)
+        bloco = resultados.iloc[inicio:inicio + lote]
+        if formato == 'jsonl':
+            texto = bloco.to_json(orient='records', lines=True, force_ascii=False, date_format='iso')
+            saida.write(texto if texto.endswith('\n') else texto + '\n')
+        else:
+            bloco.to_csv(saida, sep=';', index=False, header=inicio == 0)
+        saida.flush()
+
+    if formato != 'jsonl' and resultados.empty:
+        resultados.to_csv(saida, sep=';', index=False)
+
+def gravar_texto(resultados, caminho, formato=None, progresso=None, cancelado=None):
+    """Exporta para CSV (separado por ';', ISO-8859-1, como o Dados.csv) ou JSON Lines (UTF-8).
+
+    Sem `formato`, ele é deduzido da extensão (.jsonl/.json ou CSV).
+    """
+    if formato is None:
+        formato = 'jsonl' if str(caminho).lower().endswith(('.jsonl', '.json')) else 'csv'
+    encoding = 'utf-8' if formato == 'jsonl' else 'ISO-8859-1'
+
+    with medicoes.medir(f'exportacao_{formato}', linhas=len(resultados)) as medicao:
+        diario.gravar_atomico(
+            caminho,
+            lambda f: escrever_em_fluxo(resultados, f, formato, LOTE_EXPORTACAO, progresso, cancelado),
+            encoding
+        )
+        acompanhar(len(resultados), len(resultados), progresso)
+        medicao.bytes = os.path.getsize(caminho)
@@ -0,0 +1,108 @@
+import gzip
+from datetime import datetime, timedelta
+
+import pytest
+
+import backup
+
+CABECALHO = 'Número de inventário;Nome;Localização\n'
+
+@pytest.fixture(autouse=True)
+def cache_limpo(monkeypatch):
+    monkeypatch.setattr(backup, '_cache', {'base': None, 'linhas': None, 'ultimo': None, 'hash': None})
+
+def gravar_csv(caminho, linhas):
+    caminho.write_bytes((CABECALHO + ''.join(linhas)).encode(backup.ENCODING))
+    return caminho.read_bytes().decode(backup.ENCODING)
+
+def itens(n, nome='Cadeira'):
+    return [f'{i};{nome} {i};Sotão\n' for i in range(1, n + 1)]
+
+def test_base_depois_delta_e_reconstrucao(tmp_path):
+    csv, pasta = tmp_path / 'Dados.csv', tmp_path / 'backups'
+    agora = datetime(2025, 5, 5, 14, 12, 18)
+
+    original = gravar_csv(csv, itens(20))
+    base = backup.registrar(csv, pasta, agora)
+    assert base.name == 'backup_20250505_141218.csv.gz'
+
+    linhas = itens(20)
+    linhas[3] = '4;Mesa;Sala 2\n'
+    editado = gravar_csv(csv, linhas + ['21;Armário;Sotão\n'])
+    delta = backup.registrar(csv, pasta, agora + timedelta(minutes=1))
+    assert delta.name == 'backup_20250505_141318.delta.gz'
+
+    assert backup.reconstruir(base) == original
+    assert backup.reconstruir(delta) == editado
+    assert [tipo for _, _, tipo in backup.listar(pasta)] == ['base', 'delta']
+
+def test_conteudo_igual_nao_grava(tmp_path):
+    csv, pasta = tmp_path / 'Dados.csv', tmp_path / 'backups'
+    gravar_csv(csv, itens(5))
+    assert backup.registrar(csv, pasta, datetime(2025, 1, 1, 8)) is not None
+    assert backup.registrar(csv, pasta, datetime(2025, 1, 1, 9)) is None
+    assert len(backup.listar(pasta)) == 1
+
+def test_mudanca_grande_vira_nova_base(tmp_path):
+    csv, pasta = tmp_path / 'Dados.csv', tmp_path / 'backups'
+    gravar_csv(csv, itens(10))
+    backup.registrar(csv, pasta, datetime(2025, 1, 1, 8))
+    gravar_csv(csv, itens(10, nome='Mesa'))
+    assert backup.registrar(csv, pasta, datetime(2025, 1, 1, 9)).name.endswith(backup.EXT_BASE)
+
+def test_mesmo_segundo_ganha_numero(tmp_path):
+    csv, pasta = tmp_path / 'Dados.csv', tmp_path / 'backups'
+    agora = datetime(2025, 5, 5, 14, 12, 18)
+    textos = []
+    for i in range(3):
+        textos.append(gravar_csv(csv, itens(20)[:-1] + [f'20;Versão {i};Sotão\n']))
+        backup.registrar(csv, pasta, agora)
+
+    nomes = [caminho.name for _, caminho, _ in backup.listar(pasta)]
+    assert nomes == [
+        'backup_20250505_141218.csv.gz',
+        'backup_20250505_141218_2.delta.gz',
+        'backup_20250505_141218_3.delta.gz',
+    ]
+
+    destino = tmp_path / 'restaurado.csv'
+    backup.restaurar(pasta, '20250505_141218_2', destino)
+    assert destino.read_bytes().decode(backup.ENCODING) == textos[1]
+    backup.restaurar(pasta, '20250505_141218', destino)  # Sem número: o último do segundo
+    assert destino.read_bytes().decode(backup.ENCODING) == textos[2]
+
+def test_restaurar_usa_o_backup_anterior_ao_instante(tmp_path):
+    csv, pasta = tmp_path / 'Dados.csv', tmp_path / 'backups'
+    primeiro = gravar_csv(csv, itens(10))
+    backup.registrar(csv, pasta, datetime(2025, 3, 1, 10))
+    gravar_csv(csv, itens(11))
+    backup.registrar(csv, pasta, datetime(2025, 3, 2, 10))
+
+    destino = tmp_path / 'Dados.csv'
+    destino.chmod(0o640)
+    data, _ = backup.restaurar(pasta, datetime(2025, 3, 1, 23), destino)
+    assert data == datetime(2025, 3, 1, 10)
+    assert destino.read_bytes().decode(backup.ENCODING) == primeiro
+    assert destino.stat().st_mode & 0o777 == 0o640
+
+    with pytest.raises(ValueError):
+        backup.restaurar(pasta, datetime(2025, 2, 1), destino)
+    with pytest.raises(ValueError):
+        backup.restaurar(pasta, '2025-03-01', destino)
+
+def test_retencao_apaga_cadeias_antigas_e_mantem_as_legadas(tmp_path):
+    pasta = tmp_path / 'backups'
+    pasta.mkdir()
+    legado = pasta / 'backup_20240101_080000.csv'
+    legado.write_bytes(CABECALHO.encode(backup.ENCODING))
+    inicio = datetime(2024, 2, 1)
+    for dia in range(4):
+        nome = f"backup_{inicio + timedelta(days=dia):%Y%m%d_%H%M%S}.csv.gz"
+        (pasta / nome).write_bytes(gzip.compress(CABECALHO.encode(backup.ENCODING)))
+
+    apagados = backup.aplicar_retencao(pasta, agora=datetime(2025, 1, 1), manter=2)
+    assert [caminho.name for caminho in apagados] == ['backup_20240201_000000.csv.gz', 'backup_20240202_000000.csv.gz']
+    assert legado.exists()
+    assert len(backup.listar(pasta)) == 3
+
+    assert backup.aplicar_retencao(pasta, agora=datetime(2025, 1, 1), manter=1) == [pasta / 'backup_20240203_000000.csv.gz']
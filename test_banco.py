@@ -0,0 +1,39 @@
+import backup
+import banco
+import motor
+
+CABECALHO = 'Nome;Número de inventário;Status;Fabricante;Grupo encarregado;Localização;Tipo;Modelo;Última atualização\n'
+
+def abrir_banco(tmp_path):
+    caminho_csv = tmp_path / 'Dados.csv'
+    linhas = [f'Item {i};{i}.0;Ativo;;A;Casa;Carro;;25/03/2025 09:20\n' for i in range(1, 11)]
+    caminho_csv.write_bytes((CABECALHO + ''.join(linhas)).encode(motor.ENCODING_CSV))
+    dados = motor.ler_csv(caminho_csv)
+    banco.criar(banco.caminho_banco(caminho_csv), dados, motor.construir_indice_busca(dados))
+
+    base = motor.BaseDados(caminho_csv, pasta_backup=tmp_path / 'backups')
+    assert isinstance(base.armazenamento, motor.ArmazenamentoSQLite)
+    base.carregar()
+    return base
+
+def test_edicao_no_banco_faz_backup_antes(tmp_path):
+    base = abrir_banco(tmp_path)
+    base.editar(base.inventarios['3'], '3', {'Nome': 'Cadeira'})
+
+    backups = backup.listar(tmp_path / 'backups')
+    assert len(backups) == 1
+    texto = backup.reconstruir(backups[0][1])
+    assert 'Item 3;' in texto and 'Cadeira' not in texto
+
+    base.editar(base.inventarios['4'], '4', {'Nome': 'Mesa'})  # Dentro do intervalo: sem novo backup
+    assert len(backup.listar(tmp_path / 'backups')) == 1
+
+def test_backup_volta_depois_do_intervalo(tmp_path, monkeypatch):
+    base = abrir_banco(tmp_path)
+    base.editar(base.inventarios['3'], '3', {'Nome': 'Cadeira'})
+    monkeypatch.setattr(motor, 'INTERVALO_BACKUP_EDICAO', -1)
+    base.editar(base.inventarios['4'], '4', {'Nome': 'Mesa'})
+
+    backups = backup.listar(tmp_path / 'backups')
+    assert len(backups) == 2
+    assert 'Cadeira' in backup.reconstruir(backups[-1][1])
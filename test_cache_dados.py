@@ -0,0 +1,47 @@
+import json
+import pickle
+
+import pandas as pd
+
+import cache_dados
+import motor
+
+CABECALHO = 'Nome;Número de inventário;Status;Fabricante;Grupo encarregado;Localização;Tipo;Modelo;Última atualização\n'
+
+def gravar_csv(caminho):
+    linhas = [f'Cadeira {i};{i}.0;Ativo;;A;Sotão;Carro;;25/03/2025 09:20\n' for i in range(1, 6)]
+    linhas.append('Mesa;6.0;;;;;;;\n')
+    caminho.write_bytes((CABECALHO + ''.join(linhas)).encode(motor.ENCODING_CSV))
+
+def test_cache_npz_devolve_os_mesmos_dados(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_dados, '_feather', lambda: None)
+    caminho = tmp_path / 'Dados.csv'
+    gravar_csv(caminho)
+
+    dados, busca = motor.ler_planilha(caminho)
+    _, caminho_chave = cache_dados.caminhos(caminho)
+    assert json.loads(caminho_chave.read_text(encoding='utf-8'))['formato'] == 'npz'
+
+    em_cache = cache_dados.ler(caminho, cache_dados.chave(caminho))
+    assert em_cache is not None
+    pd.testing.assert_frame_equal(em_cache[0], dados)
+    assert em_cache[1].tolist() == busca.tolist()
+
+def test_cache_em_pickle_nunca_e_lido(tmp_path):
+    caminho = tmp_path / 'Dados.csv'
+    gravar_csv(caminho)
+    caminho_dados, caminho_chave = cache_dados.caminhos(caminho)
+    caminho_dados.write_bytes(pickle.dumps(pd.DataFrame({cache_dados.COLUNA_BUSCA: ['x']})))
+    caminho_chave.write_text(json.dumps(dict(cache_dados.chave(caminho), formato='pickle')), encoding='utf-8')
+
+    assert cache_dados.ler(caminho, cache_dados.chave(caminho)) is None
+
+def test_cache_de_outro_csv_e_ignorado(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_dados, '_feather', lambda: None)
+    caminho = tmp_path / 'Dados.csv'
+    gravar_csv(caminho)
+    motor.ler_planilha(caminho)
+
+    with open(caminho, 'ab') as f:
+        f.write('Armário;7.0;;;;;;;\n'.encode(motor.ENCODING_CSV))
+    assert cache_dados.ler(caminho, cache_dados.chave(caminho)) is None
@@ -0,0 +1,72 @@
+import pytest
+
+import consulta
+from consulta import ErroConsulta, analisar
+
+CAMPOS = {'nome', 'tipo', 'local', 'status', 'atualizacao', 'inventario'}
+
+def e_campo(nome):
+    return nome.lower() in CAMPOS
+
+def test_texto_simples():
+    assert analisar('cadeira') == ('termo', None, 'contem', 'cadeira')
+    assert consulta.e_simples('cadeira azul')
+
+def test_campos_lado_a_lado_valem_todos():
+    assert analisar('local:"sala 2" tipo:carro', e_campo) == ('e', [
+        ('termo', 'local', 'igual', 'sala 2'),
+        ('termo', 'tipo', 'igual', 'carro'),
+    ])
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('nome:cad*', ('termo', 'nome', 'prefixo', 'cad')),
+    ('nome:*cad*', ('termo', 'nome', 'contem', 'cad')),
+    ('cad*', ('termo', None, 'prefixo', 'cad')),
+    ('*ola*', ('termo', None, 'contem', 'ola')),
+    ('"cadeira azul"', ('termo', None, 'contem', 'cadeira azul')),
+])
+def test_curingas_e_frases(texto, esperado):
+    assert analisar(texto, e_campo) == esperado
+
+def test_intervalos():
+    assert analisar('atualizacao:01/01/2025..31/03/2025', e_campo) == \
+        ('intervalo', 'atualizacao', '01/01/2025', '31/03/2025')
+    assert analisar('inventario:100..', e_campo) == ('intervalo', 'inventario', '100', '')
+
+def test_operadores_e_parenteses():
+    assert analisar('tipo:carro OR NOT tipo:moto', e_campo) == ('ou', [
+        ('termo', 'tipo', 'igual', 'carro'),
+        ('nao', ('termo', 'tipo', 'igual', 'moto')),
+    ])
+    assert analisar('(a OR b) AND c') == ('e', [
+        ('ou', [('termo', None, 'contem', 'a'), ('termo', None, 'contem', 'b')]),
+        ('termo', None, 'contem', 'c'),
+    ])
+
+def test_operadores_so_em_maiusculas():
+    assert analisar('carro or moto') == ('e', [
+        ('termo', None, 'contem', 'carro'),
+        ('termo', None, 'contem', 'or'),
+        ('termo', None, 'contem', 'moto'),
+    ])
+
+def test_dois_pontos_fora_de_campo_e_texto():
+    assert consulta.e_simples('25/03/2025 09:20', e_campo)
+    assert not consulta.e_simples('local:sala 09:20', e_campo)
+    assert analisar('local:sala 09:20', e_campo) == ('e', [
+        ('termo', 'local', 'igual', 'sala'),
+        ('termo', None, 'contem', '09:20'),
+    ])
+
+@pytest.mark.parametrize('texto', [
+    '', '"cadeira', '(tipo:carro', 'tipo:carro)', 'tipo:carro OR', 'nome:', 'nome:*', '*', 'AND cadeira',
+])
+def test_sintaxe_invalida(texto):
+    with pytest.raises(ErroConsulta):
+        analisar(texto, e_campo)
+
+def test_datas():
+    assert consulta.interpretar_data('31/03/2025').day == 31
+    assert consulta.interpretar_data('2025-03-31').month == 3
+    with pytest.raises(ErroConsulta):
+        consulta.interpretar_data('31/13/2025')
@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+import diario
+import motor
+
+CABECALHO = 'Nome;Número de inventário;Status;Fabricante;Grupo encarregado;Localização;Tipo;Modelo;Última atualização\n'
+
+@pytest.fixture
+def caminho_csv(tmp_path):
+    caminho = tmp_path / 'Dados.csv'
+    linhas = [f'Item {i};{i}.0;Ativo;;A;Casa;Carro;;25/03/2025 09:20\n' for i in range(1, 11)]
+    caminho.write_bytes((CABECALHO + ''.join(linhas)).encode(motor.ENCODING_CSV))
+    return caminho
+
+def abrir(caminho_csv):
+    base = motor.BaseDados(caminho_csv, pasta_backup=caminho_csv.parent / 'backups')
+    base.carregar()
+    return base
+
+def editar(base, inventario, **campos):
+    base.editar(base.inventarios[inventario], inventario, campos)
+
+def nomes(caminho_csv):
+    base = abrir(caminho_csv)
+    return {inventario: base.dados.at[rotulo, 'Nome'] for inventario, rotulo in base.inventarios.items()}
+
+def test_compactacao_grava_as_edicoes_do_diario(caminho_csv):
+    base = abrir(caminho_csv)
+    editar(base, '3', Nome='Cadeira')
+    assert base.pendencias() > 0
+
+    base.compactar()
+    assert base.pendencias() == 0
+    assert not base.mudou()  # O que acabou de gravar não precisa ser recarregado
+    assert nomes(caminho_csv)['3'] == 'Cadeira'
+
+def test_compactacao_mantem_edicoes_de_outra_instancia(caminho_csv):
+    a, b = abrir(caminho_csv), abrir(caminho_csv)
+    editar(a, '3', Nome='Editado por A')
+    editar(b, '4', Nome='Editado por B')
+
+    a.compactar()
+    assert a.pendencias() == 0
+    assert a.mudou()  # O arquivo tem a edição de B, que A ainda não carregou
+    assert nomes(caminho_csv)['3'] == 'Editado por A'
+    assert nomes(caminho_csv)['4'] == 'Editado por B'
+
+    b.compactar()  # Nada pendente: A já gravou tudo
+    assert nomes(caminho_csv)['4'] == 'Editado por B'
+
+def test_edicao_em_lote_mantem_o_diario_de_outra_instancia(caminho_csv):
+    a, b = abrir(caminho_csv), abrir(caminho_csv)
+    editar(b, '7', Nome='Editado por B')
+    a.editar_em_lote([a.inventarios[i] for i in ('1', '2')], {'Localização': 'Sotão'})
+
+    c = abrir(caminho_csv)
+    assert c.dados.at[c.inventarios['7'], 'Nome'] == 'Editado por B'
+    assert c.dados.loc[[c.inventarios['1'], c.inventarios['2']], 'Localização'].tolist() == ['Sotão', 'Sotão']
+
+def test_valor_fora_do_iso_8859_1_nao_entra_no_diario(caminho_csv):
+    base = abrir(caminho_csv)
+    with pytest.raises(ValueError):
+        editar(base, '3', Nome='Cadeira €')
+    assert base.pendencias() == 0
+
+def test_trava_nao_e_reentrante(tmp_path):
+    caminho = tmp_path / 'Dados.csv.diario'
+    with diario.travar(caminho):
+        with pytest.raises(TimeoutError):
+            with diario.travar(caminho, espera=0.1):
+                pass
+    with diario.travar(caminho, espera=0.1):
+        pass
+
+def test_edicao_nao_espera_a_trava_inteira(tmp_path):
+    caminho = tmp_path / 'Dados.csv.diario'
+    with diario.travar(caminho):
+        inicio = time.monotonic()
+        with pytest.raises(TimeoutError):
+            diario.registrar(caminho, '1', {'Nome': 'Cadeira'})
+        assert time.monotonic() - inicio < diario.ESPERA_TRAVA / 2
+    assert diario.registrar(caminho, '1', {'Nome': 'Cadeira'}) > 0
+
+def test_trava_em_uso_e_renovada(tmp_path, monkeypatch):
+    monkeypatch.setattr(diario, 'RENOVAR_TRAVA', 0.05)
+    caminho = tmp_path / 'Dados.csv.diario'
+    trava = tmp_path / ('Dados.csv.diario' + diario.SUFIXO_TRAVA)
+    with diario.travar(caminho):
+        os.utime(trava, (time.time() - 1000, time.time() - 1000))  # Como se a gravação levasse muito tempo
+        time.sleep(0.3)
+        assert time.time() - os.path.getmtime(trava) < diario.TRAVA_VENCIDA
+    assert not trava.exists()
@@ -0,0 +1,245 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import motor
+
+CABECALHO = 'Nome;Número de inventário;Status;Fabricante;Grupo encarregado;Localização;Tipo;Modelo;Última atualização\n'
+
+def gravar_csv(caminho, linhas):
+    caminho.write_bytes((CABECALHO + ''.join(linhas)).encode(motor.ENCODING_CSV))
+    return caminho
+
+@pytest.fixture
+def base(tmp_path):
+    linhas = [f'Item {i};{i}.0;Ativo;;{"AB"[i % 2]};{["Casa", "Sotão", "Jardim"][i % 3]};Carro;;25/03/2025 09:20\n'
+              for i in range(1, 13)]
+    base = motor.BaseDados(gravar_csv(tmp_path / 'Dados.csv', linhas), pasta_backup=tmp_path / 'backups')
+    base.carregar()
+    return base
+
+def recarregada(base):
+    nova = motor.BaseDados(base.caminho_csv, pasta_backup=base.armazenamento.pasta_backup)
+    nova.carregar()
+    return nova
+
+# --- Importação de planilhas ---
+def test_importacao_em_blocos(base, tmp_path):
+    planilha = gravar_csv(tmp_path / 'planilha.csv', [
+        'Item 1;1;;;;Sotão;;;\n',           # Igual ao da base: não conta
+        'Mesa;2;;;;Porão;;;\n',             # Atualizado, com categoria nova
+        'Armário;20;Ativo;;A;Garagem;Moto;;\n',
+        ';20;;;;Sótão;;;\n',                # Mesmo item novo, em outro bloco: atualiza o acrescentado
+        'Sem número;;;;;;;;\n',
+        'Cadeira;22;;;;Casa;;;\n',
+    ])
+    snapshot, resumo = base.mesclar_planilha(planilha, tamanho=2)
+
+    assert (resumo['lidas'], resumo['inseridos'], resumo['atualizados'], resumo['rejeitados']) == (6, 2, 1, 1)
+    dados = snapshot.dados
+    assert len(dados) == 14
+    assert dados.at[snapshot.inventarios['2'], 'Nome'] == 'Mesa'
+    assert dados.at[snapshot.inventarios['20'], 'Localização'] == 'Sótão'
+    assert dados.at[snapshot.inventarios['20'], 'Tipo'] == 'Moto'
+    assert isinstance(dados['Localização'].dtype, pd.CategoricalDtype)
+    assert snapshot.busca.loc[snapshot.inventarios['22']] == motor.construir_indice_busca(dados.loc[[13]]).iloc[0]
+
+    gravada = recarregada(base)
+    pd.testing.assert_frame_equal(gravada.dados, dados, check_dtype=False)
+    assert gravada.busca.tolist() == snapshot.busca.tolist()
+
+def test_importacao_sem_mudancas_nao_grava(base, tmp_path):
+    versao = base.armazenamento.versao()
+    planilha = gravar_csv(tmp_path / 'planilha.csv', ['Item 1;1;;;;Sotão;;;\n'])
+    _, resumo = base.mesclar_planilha(planilha)
+    assert (resumo['inseridos'], resumo['atualizados']) == (0, 0)
+    assert base.armazenamento.versao() == versao
+
+def test_importacao_recusa_dados_desatualizados(base, tmp_path):
+    outra = recarregada(base)
+    outra.editar(outra.inventarios['5'], '5', {'Nome': 'Editado por outro programa'})
+    planilha = gravar_csv(tmp_path / 'planilha.csv', ['Cadeira;30;;;;Casa;;;\n'])
+    with pytest.raises(RuntimeError):
+        base.mesclar_planilha(planilha)
+
+# --- Índice de facetas ---
+def test_facetas_posicoes_e_contagens(base):
+    facetas = base.facetas
+    # Item i está na posição i - 1: Localização Casa para i % 3 == 0, grupo A para i par
+    assert facetas.posicoes['Localização']['Casa'].tolist() == [2, 5, 8, 11]
+    assert facetas.posicoes['Grupo encarregado']['A'].tolist() == [1, 3, 5, 7, 9, 11]
+    assert facetas.contagens('Localização', {}) == {'Casa': 4, 'Jardim': 4, 'Sotão': 4}
+    # As contagens de uma coluna levam em conta os filtros das outras, não o dela
+    selecao = {'Grupo encarregado': 'A', 'Localização': 'Casa'}
+    assert facetas.contagens('Localização', selecao) == {'Casa': 2, 'Jardim': 2, 'Sotão': 2}
+    assert facetas.contagens('Grupo encarregado', selecao) == {'A': 2, 'B': 2}
+    assert facetas.posicoes_filtro(selecao).tolist() == [5, 11]
+    assert facetas.posicoes_filtro({'Tipo': ''}) is None
+
+def test_facetas_com_busca_textual(base):
+    base.editar(base.inventarios['1'], '1', {'Nome': 'Cadeira azul'})
+    base.editar(base.inventarios['6'], '6', {'Nome': 'Cadeira verde'})
+    assert base.contar('Localização') == {'Casa': 4, 'Jardim': 4, 'Sotão': 4}
+    assert base.contar('Localização', 'cadeira') == {'Casa': 1, 'Sotão': 1}
+    assert base.contar('Localização', 'cadeira', grupo='A') == {'Casa': 1}
+    assert base.contar('Grupo encarregado', 'cadeira', local='Sotão') == {'B': 1}
+    assert len(base.consultar('cadeira', local='Sotão')) == 1
+
+def test_facetas_seguem_as_edicoes(base):
+    base.editar(base.inventarios['3'], '3', {'Localização': 'Porão'})
+    base.editar_em_lote([base.inventarios[i] for i in ('6', '9')], {'Localização': 'Sotão'})
+
+    novo = motor.IndiceFacetas(base.dados)
+    for coluna in novo.colunas:
+        assert base.facetas.contagens(coluna, {}) == novo.contagens(coluna, {})
+        for valor, posicoes in novo.posicoes[coluna].items():
+            assert base.facetas.posicoes[coluna][valor].tolist() == posicoes.tolist()
+
+# --- Busca aproximada ---
+@pytest.fixture
+def base_nomes(tmp_path):
+    nomes = ['Cadeira giratória', 'Mesa de reunião', 'Armário de aço', 'Cadeado', 'Janela basculante',
+             'Cadeira fixa', 'Notebook', 'Bebedouro', 'Caderno', 'Estante']
+    linhas = [f'{nome};{i};Ativo;;A;Sala {i};Móvel;;\n' for i, nome in enumerate(nomes, 1)]
+    base = motor.BaseDados(gravar_csv(tmp_path / 'Dados.csv', linhas), pasta_backup=tmp_path / 'backups')
+    base.carregar()
+    return base
+
+def nomes_aproximados(base, termo):
+    posicoes, _ = base.posicoes_aproximadas(termo)
+    return base.dados['Nome'].iloc[posicoes].tolist()
+
+@pytest.mark.parametrize('termo, esperado', [
+    ('cadiera', 'Cadeira'),
+    ('armaro', 'Armário de aço'),
+    ('jnela', 'Janela basculante'),
+    ('bebedoro', 'Bebedouro'),
+    ('notbook', 'Notebook'),
+])
+def test_aproximada_tolera_erros_de_digitacao(base_nomes, termo, esperado):
+    assert nomes_aproximados(base_nomes, termo)[0].startswith(esperado)
+
+def test_aproximada_ordena_pela_semelhanca(base_nomes):
+    posicoes, notas = base_nomes.posicoes_aproximadas('cadeira giratoria')
+    nomes = base_nomes.dados['Nome'].iloc[posicoes].tolist()
+    assert nomes[:2] == ['Cadeira giratória', 'Cadeira fixa']
+    assert notas[0] == pytest.approx(1.0)
+    assert list(notas) == sorted(notas, reverse=True)
+    assert 'Estante' not in nomes
+
+def test_aproximada_acompanha_as_edicoes(base_nomes):
+    base_nomes.posicoes_aproximadas('mesa')  # Monta o índice antes das edições
+    base_nomes.editar(base_nomes.inventarios['2'], '2', {'Nome': 'Poltrona'})
+    base_nomes.editar_em_lote([base_nomes.inventarios['7']], {'Localização': 'Depósito central'})
+    assert ('trigramas',) in base_nomes.indices  # Atualizado nas linhas editadas, não descartado
+
+    assert 'Poltrona' in nomes_aproximados(base_nomes, 'potrona')
+    assert 'Mesa de reunião' not in nomes_aproximados(base_nomes, 'mesa')
+    assert nomes_aproximados(base_nomes, 'deposito') == ['Notebook']
+
+    editado = [base_nomes.posicoes_aproximadas(t) for t in ('potrona', 'mesa', 'cadera', 'deposito')]
+    base_nomes.invalidar_buscas()  # Índice refeito do zero
+    refeito = [base_nomes.posicoes_aproximadas(t) for t in ('potrona', 'mesa', 'cadera', 'deposito')]
+    for (p1, n1), (p2, n2) in zip(editado, refeito):
+        assert p1.tolist() == p2.tolist()
+        assert n1 == pytest.approx(n2)
+
+# --- Atualização pelas diferenças ---
+def reescrever(base, mudar):
+    """Regrava o Dados.csv como outro programa faria, com mudar(dados) aplicado"""
+    dados = mudar(motor.ler_csv(base.caminho_csv).astype(object))
+    motor.diario.salvar_csv_atomico(dados, base.caminho_csv)
+
+def conferir_igual_a_recarga(base):
+    nova = recarregada(base)
+    pd.testing.assert_frame_equal(base.dados, nova.dados, check_dtype=False, check_categorical=False)
+    assert base.busca.tolist() == nova.busca.tolist()
+    assert base.inventarios == nova.inventarios
+    for coluna in nova.facetas.colunas:
+        assert base.facetas.contagens(coluna, {}) == nova.facetas.contagens(coluna, {})
+    for termo in ('item 1', 'porao', 'local:sotao', 'nome:armario*'):
+        assert base.buscar(termo).index.tolist() == nova.buscar(termo).index.tolist()
+    assert base.posicoes_aproximadas('armaro')[0].tolist() == nova.posicoes_aproximadas('armaro')[0].tolist()
+
+def test_comparar_dados():
+    atuais = pd.DataFrame({'Número de inventário': [1, 2, 3], 'Nome': ['a', 'b', 'c']})
+    alterado = atuais.assign(Nome=['a', 'B', 'c'])
+    assert motor.comparar_dados(atuais, alterado).tolist() == [1]
+    acrescentado = pd.concat([alterado, pd.DataFrame({'Número de inventário': [4], 'Nome': ['d']})],
+                             ignore_index=True)
+    assert motor.comparar_dados(atuais, acrescentado).tolist() == [1, 3]
+    assert motor.comparar_dados(atuais, atuais.iloc[:2]) is None  # Removido
+    assert motor.comparar_dados(atuais, atuais.iloc[[0, 2, 1]].reset_index(drop=True)) is None  # Fora de ordem
+    assert motor.comparar_dados(atuais, atuais.assign(Tipo='x')) is None  # Outra coluna
+    assert len(motor.comparar_dados(atuais, atuais.copy())) == 0
+
+def test_atualizacao_com_linhas_alteradas_e_acrescentadas(base, monkeypatch):
+    monkeypatch.setattr(motor, 'LIMITE_ATUALIZACAO', 0.5)  # Base pequena: 3 de 13 linhas ainda é uma atualização
+    for termo in ('item 1', 'local:sotao', 'nome:armario*'):
+        base.buscar(termo)  # Índices montados antes da mudança
+    base.posicoes_aproximadas('item')
+
+    def mudar(dados):
+        dados.loc[2, 'Localização'] = 'Porão'
+        dados.loc[4, 'Nome'] = 'Armário'
+        novo = dados.iloc[[0]].assign(**{'Número de inventário': 99, 'Nome': 'Armário novo'})
+        return pd.concat([dados, novo], ignore_index=True)
+    reescrever(base, mudar)
+
+    assert base.mudou()
+    atualizacao = base.montar_atualizacao()
+    assert isinstance(atualizacao, motor.Atualizacao)
+    assert atualizacao.linhas.index.tolist() == [2, 4, 12]
+    assert base.aplicar_atualizacao(atualizacao)
+    assert not base.mudou()
+    conferir_igual_a_recarga(base)
+
+def test_atualizacao_com_linhas_removidas_recarrega_tudo(base):
+    reescrever(base, lambda dados: dados.drop(index=[3, 7]).reset_index(drop=True))
+    snapshot = base.montar_atualizacao()
+    assert isinstance(snapshot, motor.Snapshot)
+    base.aplicar(snapshot)
+    assert len(base.dados) == 10
+    conferir_igual_a_recarga(base)
+
+def test_atualizacao_descartada_se_a_memoria_mudou(base):
+    reescrever(base, lambda dados: dados.assign(Nome=dados['Nome'].where(dados.index != 0, 'Mesa')))
+    atualizacao = base.montar_atualizacao()
+    base.editar(base.inventarios['5'], '5', {'Nome': 'Cadeira'})
+    assert not base.aplicar_atualizacao(atualizacao)
+
+# --- Resumo ---
+def conferir_resumo(base):
+    novo = motor.ResumoInventario(base.dados)
+    assert base.resumo.contagens == novo.contagens
+    np.testing.assert_array_equal(base.resumo.datas, novo.datas)
+    pd.testing.assert_frame_equal(base.resumo.tabela(), novo.tabela())
+    pd.testing.assert_frame_equal(base.resumo.tabela(['Localização']), novo.tabela(['Localização']))
+    agora = datetime(2025, 12, 31)
+    assert base.resumo.desatualizados(6, agora).tolist() == novo.desatualizados(6, agora).tolist()
+
+def test_resumo_acompanha_edicao(base):
+    base.editar(base.inventarios['3'], '3', {'Localização': 'Porão', 'Status': None})
+    base.editar(base.inventarios['4'], '4', {'Tipo': 'Moto', 'Última atualização': '01/12/2025 10:00'})
+    conferir_resumo(base)
+    assert base.resumo.tabela(['Localização']).set_index('Localização').at['Porão', 'Itens'] == 1
+
+def test_resumo_acompanha_edicao_em_lote(base):
+    base.editar_em_lote([base.inventarios[i] for i in ('1', '2', '5')], {'Status': 'Baixado', 'Localização': 'Casa'})
+    conferir_resumo(base)
+    assert len(base.resumo.desatualizados(1)) == 9  # As editadas em lote foram carimbadas agora
+
+def test_resumo_acompanha_atualizacao_pelas_diferencas(base, monkeypatch):
+    monkeypatch.setattr(motor, 'LIMITE_ATUALIZACAO', 0.5)
+    def mudar(dados):
+        dados.loc[0, 'Localização'] = 'Porão'
+        dados.loc[6, 'Status'] = None
+        dados.loc[9, 'Última atualização'] = '02/01/2025 08:00'
+        return dados
+    reescrever(base, mudar)
+    atualizacao = base.montar_atualizacao()
+    assert isinstance(atualizacao, motor.Atualizacao)
+    assert base.aplicar_atualizacao(atualizacao)
+    conferir_resumo(base)
@@ -0,0 +1,66 @@
+import os
+import sys
+import threading
+
+import pytest
+
+import vigia
+
+ESPERA = 5  # Segundos; o aviso costuma chegar bem antes
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = tmp_path / 'Dados.csv'
+    caminho.write_text('a;b\n1;2\n')
+    return caminho
+
+def vigiar(caminho):
+    mudou = threading.Event()
+    observador = vigia.Vigia([caminho], mudou.set, intervalo=0.05).iniciar()
+    return observador, mudou
+
+def test_sem_inotify_compara_o_stat(arquivo, monkeypatch):
+    monkeypatch.setattr(vigia, '_abrir_inotify', lambda pastas: None)
+    observador, mudou = vigiar(arquivo)
+    try:
+        assert observador.modo == 'stat'
+        assert not mudou.wait(0.3)  # Nada mudou
+
+        with open(arquivo, 'a') as f:
+            f.write('3;4\n')
+        assert mudou.wait(ESPERA)
+    finally:
+        observador.parar()
+
+def test_stat_ve_mudanca_so_de_data(arquivo, monkeypatch):
+    # Como numa pasta de rede: outra máquina grava e só o mtime denuncia
+    monkeypatch.setattr(vigia, '_abrir_inotify', lambda pastas: None)
+    observador, mudou = vigiar(arquivo)
+    try:
+        info = os.stat(arquivo)
+        os.utime(arquivo, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+        assert mudou.wait(ESPERA)
+    finally:
+        observador.parar()
+
+def test_stat_ve_arquivo_substituido(arquivo, monkeypatch):
+    monkeypatch.setattr(vigia, '_abrir_inotify', lambda pastas: None)
+    observador, mudou = vigiar(arquivo)
+    try:
+        temporario = arquivo.with_name('.Dados.csv.tmp')
+        temporario.write_text('a;b\n1;2\n')  # Mesmo conteúdo e tamanho, outro inode
+        os.replace(temporario, arquivo)
+        assert mudou.wait(ESPERA)
+    finally:
+        observador.parar()
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify só existe no Linux")
+def test_inotify_e_stat_juntos(arquivo):
+    observador, mudou = vigiar(arquivo)
+    try:
+        assert observador.modo == 'inotify + stat'
+        with open(arquivo, 'a') as f:
+            f.write('3;4\n')
+        assert mudou.wait(ESPERA)
+    finally:
+        observador.parar()
@@ -0,0 +1,138 @@
+"""Busca por trecho de texto em vários processos, para inventários muito grandes.
+
+O texto normalizado de todas as linhas (BaseDados.busca) é copiado uma vez
+para um bloco de memória compartilhada (SharedMemory, um mmap): primeiro a
+posição, em bytes, do início de cada linha (int64), depois os textos em
+UTF-8 separados por '\\n'. Os processos do pool abrem o bloco pelo nome, sem
+receber os dados por pickle, e cada um procura o trecho em uma faixa de
+linhas. As posições encontradas voltam em ordem e as faixas são juntadas
+na ordem original.
+
+Os processos são criados com fork (só no Linux) ou, no executável
+gerado pelo PyInstaller, com spawn (o Main.py chama freeze_support). Fora
+disso, rodando o Main.py direto no Windows ou no macOS, o spawn executaria
+a interface de novo em cada processo: a busca paralela fica desligada e o
+motor usa a busca simples.
+
+CONSULTADOR_PROCESSOS define quantos processos usar (padrão: um por núcleo;
+0 ou 1 desliga a busca paralela).
+"""
+import multiprocessing
+import os
+import sys
+import weakref
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from multiprocessing import shared_memory
+
+import numpy as np
+
+PROCESSOS = int(os.environ.get('CONSULTADOR_PROCESSOS', os.cpu_count() or 1))
+MIN_LINHAS = 200000  # Abaixo disso a busca simples termina antes de o trabalho ser distribuído
+FAIXAS_POR_PROCESSO = 4  # Faixas menores equilibram a carga e deixam o cancelamento mais rápido
+INTERVALO_CANCELAMENTO = 0.05  # Segundos entre as checagens de cancelado() enquanto espera as faixas
+
+_pool = None
+_abertos = {}  # Nos processos do pool: nome do bloco -> SharedMemory já aberta
+
+class BuscaInterrompida(Exception):
+    """A busca foi interrompida porque cancelado() retornou True"""
+
+def _contexto():
+    if getattr(sys, 'frozen', False):
+        return multiprocessing.get_context('spawn')
+    if sys.platform.startswith('linux'):
+        # No macOS o fork de um processo com várias threads (o Tk) não é seguro
+        return multiprocessing.get_context('fork')
+    return None
+
+def vale_a_pena(linhas):
+    """Indica se a busca em `linhas` linhas deve ser feita em paralelo"""
+    return PROCESSOS > 1 and linhas >= MIN_LINHAS and _contexto() is not None
+
+class TextoCompartilhado:
+    """Textos de uma Series copiados para a memória compartilhada; o bloco é liberado com o objeto"""
+
+    def __init__(self, textos):
+        textos = textos.tolist()
+        texto = '\n'.join(textos)
+        dados = texto.encode('utf-8')
+        if len(dados) == len(texto):
+            # Só ASCII (o caso comum, o texto já vem sem acentos): 1 byte por caractere
+            tamanhos = np.fromiter(map(len, textos), dtype=np.int64, count=len(textos))
+        else:
+            tamanhos = np.fromiter((len(t.encode('utf-8')) for t in textos), dtype=np.int64, count=len(textos))
+        inicios = np.zeros(len(textos) + 1, dtype=np.int64)
+        np.cumsum(tamanhos + 1, out=inicios[1:])
+
+        self.linhas = len(textos)
+        self.memoria = shared_memory.SharedMemory(create=True, size=max(inicios.nbytes + len(dados), 1))
+        self.memoria.buf[:inicios.nbytes] = inicios.tobytes()
+        self.memoria.buf[inicios.nbytes:inicios.nbytes + len(dados)] = dados
+        self.nome = self.memoria.name
+        weakref.finalize(self, _liberar, self.memoria)
+
+def _liberar(memoria):
+    memoria.close()
+    memoria.unlink()
+
+def procurar(compartilhado, termo, cancelado=None):
+    """Posições (ordenadas) das linhas que contêm `termo`, procuradas pelos processos do pool"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(PROCESSOS, mp_context=_contexto())
+
+    limites = np.linspace(0, compartilhado.linhas, PROCESSOS * FAIXAS_POR_PROCESSO + 1).astype(np.int64)
+    futuros = [
+        _pool.submit(_procurar_faixa, compartilhado.nome, compartilhado.linhas, int(inicio), int(fim), termo.encode('utf-8'))
+        for inicio, fim in zip(limites[:-1], limites[1:]) if fim > inicio
+    ]
+    partes = []
+    try:
+        for futuro in futuros:  # Na ordem das faixas: o resultado já sai na ordem das linhas
+            while True:
+                if cancelado is not None and cancelado():
+                    raise BuscaInterrompida()
+                try:
+                    partes.append(futuro.result(timeout=INTERVALO_CANCELAMENTO))
+                    break
+                except TimeoutError:
+                    pass
+    except BaseException:
+        for futuro in futuros:
+            futuro.cancel()
+        if not isinstance(sys.exc_info()[1], BuscaInterrompida):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None  # Um pool quebrado é recriado na próxima busca
+        raise
+    return np.concatenate(partes) if partes else np.empty(0, dtype=np.int64)
+
+def _procurar_faixa(nome, linhas, inicio, fim, termo):
+    """Roda nos processos do pool: posições, entre inicio e fim, das linhas que contêm o termo"""
+    memoria = _abrir(nome)
+    inicios = np.ndarray((linhas + 1,), dtype=np.int64, buffer=memoria.buf)
+    deslocamento = inicios.nbytes
+    primeiro, ultimo = int(inicios[inicio]), int(inicios[fim])
+    trecho = bytes(memoria.buf[deslocamento + primeiro:deslocamento + ultimo])
+
+    relativos = inicios[inicio:fim + 1] - primeiro
+    achados = []
+    posicao = trecho.find(termo)
+    while posicao >= 0:
+        # Uma linha conta uma vez: segue para o início da próxima. O texto de uma
+        # célula pode ter '\n' (células de várias linhas no CSV), por isso o início
+        # vem de `inicios` e não da próxima quebra de linha
+        linha = int(np.searchsorted(relativos, posicao, side='right')) - 1
+        achados.append(linha + inicio)
+        if linha + 1 >= len(relativos) - 1:
+            break
+        posicao = trecho.find(termo, int(relativos[linha + 1]))
+    return np.asarray(achados, dtype=np.int64)
+
+def _abrir(nome):
+    memoria = _abertos.get(nome)
+    if memoria is None:
+        for antigo in list(_abertos):  # O bloco anterior foi substituído: os dados mudaram
+            _abertos.pop(antigo).close()
+        memoria = shared_memory.SharedMemory(name=nome)
+        _abertos[nome] = memoria
+    return memoria
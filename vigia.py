@@ -0,0 +1,114 @@
+"""Aviso de alteração dos arquivos de dados por outros programas.
+
+No Linux usa o inotify (chamado pela libc, sem dependências): a pasta do
+arquivo é vigiada e o aviso chega assim que o arquivo é fechado depois de
+gravado, ou substituído (os.replace). Em todos os sistemas também compara
+de tempos em tempos o mtime, o tamanho e o inode do arquivo (os.stat), o
+que custa quase nada: é o único aviso quando não há inotify e a rede de
+segurança quando há, já que o inotify não vê gravações feitas por outras
+máquinas em pastas de rede (CIFS/NFS), onde o Dados.csv costuma ficar.
+
+O aviso é dado chamando ao_mudar() na thread do vigia; quem usa o tkinter
+deve só marcar algo ali (ex.: um threading.Event) e agir na thread da
+interface.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+
+INTERVALO_STAT = 2.0  # Segundos entre as comparações do modo sem inotify
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENTOS = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENTO = struct.Struct('iIII')  # wd, mask, cookie, len (seguido do nome)
+
+class Vigia:
+    """Chama ao_mudar() quando algum dos arquivos é gravado ou substituído"""
+
+    def __init__(self, caminhos, ao_mudar, intervalo=INTERVALO_STAT):
+        self.caminhos = [Path(caminho).resolve() for caminho in caminhos]
+        self.ao_mudar = ao_mudar
+        self.intervalo = intervalo
+        self.modo = None  # 'inotify + stat' ou 'stat', definido em iniciar()
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        fd = _abrir_inotify({caminho.parent for caminho in self.caminhos})
+        if fd is None:
+            self.modo = 'stat'
+        else:
+            self.modo = 'inotify + stat'
+            threading.Thread(target=self._ler_inotify, args=(fd,), daemon=True).start()
+        # Assinaturas tiradas já aqui: uma gravação logo depois de iniciar() não passa despercebida
+        anteriores = [_assinatura(caminho) for caminho in self.caminhos]
+        threading.Thread(target=self._comparar_stat, args=(anteriores,), daemon=True).start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def _ler_inotify(self, fd):
+        nomes = {caminho.name for caminho in self.caminhos}
+        try:
+            while not self._parar.is_set():
+                prontos, _, _ = select.select([fd], [], [], 1.0)  # Timeout para perceber parar()
+                if not prontos:
+                    continue
+                try:
+                    eventos = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                if nomes & set(_nomes_eventos(eventos)):
+                    self.ao_mudar()
+        finally:
+            os.close(fd)
+
+    def _comparar_stat(self, anteriores):
+        while not self._parar.wait(self.intervalo):
+            atuais = [_assinatura(caminho) for caminho in self.caminhos]
+            if atuais != anteriores:
+                anteriores = atuais
+                self.ao_mudar()
+
+def _abrir_inotify(pastas):
+    """Descritor do inotify vigiando as pastas, ou None se não houver inotify"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for pasta in pastas:
+        if libc.inotify_add_watch(fd, os.fsencode(pasta), EVENTOS) < 0:
+            os.close(fd)
+            return None
+    return fd
+
+def _nomes_eventos(eventos):
+    """Nomes dos arquivos nos eventos lidos do inotify"""
+    posicao = 0
+    while posicao + _EVENTO.size <= len(eventos):
+        _, _, _, tamanho = _EVENTO.unpack_from(eventos, posicao)
+        inicio = posicao + _EVENTO.size
+        yield os.fsdecode(eventos[inicio:inicio + tamanho].rstrip(b'\0'))
+        posicao = inicio + tamanho
+
+def _assinatura(caminho):
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return estado.st_mtime_ns, estado.st_size, estado.st_ino